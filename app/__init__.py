@@ -4,9 +4,6 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from flask_login import LoginManager, login_required
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
 from .models import db, User
 from .api.user_routes import user_routes
 from .api.auth_routes import auth_routes
@@ -22,6 +19,7 @@ from .api.stage_routes import stage_routes
 from .api.rack_routes import rack_routes
 from .api.pallet_routes import pallet_routes  # Import the pallet_routes blueprint
 from .seeds import seed_commands
+from .services.changes import recorded_versions
 from .config import Config
 
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
@@ -58,26 +56,6 @@ Migrate(app, db)
 # Application Security
 CORS(app)
 
-# Google Drive API setup
-SCOPES = ['https://www.googleapis.com/auth/drive.file']
-private_key = os.getenv("GOOGLE_CLOUD_PRIVATE_KEY")
-if private_key is None:
-    raise RuntimeError("GOOGLE_CLOUD_PRIVATE_KEY environment variable is not set")
-SERVICE_ACCOUNT_INFO = {
-    "type": os.getenv("GOOGLE_CLOUD_TYPE"),
-    "project_id": os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
-    "private_key_id": os.getenv("GOOGLE_CLOUD_PRIVATE_KEY_ID"),
-    "private_key": private_key.replace("\\n", "\n"),
-    "client_email": os.getenv("GOOGLE_CLOUD_CLIENT_EMAIL"),
-    "client_id": os.getenv("GOOGLE_CLOUD_CLIENT_ID"),
-    "auth_uri": os.getenv("GOOGLE_CLOUD_AUTH_URI"),
-    "token_uri": os.getenv("GOOGLE_CLOUD_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("GOOGLE_CLOUD_AUTH_PROVIDER_X509_CERT_URL"),
-    "client_x509_cert_url": os.getenv("GOOGLE_CLOUD_CLIENT_X509_CERT_URL")
-}
-credentials = service_account.Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=SCOPES)
-drive_service = build('drive', 'v3', credentials=credentials)
-
 @app.before_request
 def https_redirect():
     if os.environ.get('FLASK_ENV') == 'production':
@@ -97,6 +75,15 @@ def inject_csrf_token(response):
         httponly=True)
     return response
 
+@app.after_request
+def report_warehouse_versions(response):
+    # "<warehouse id>:<version>" for each warehouse this request changed,
+    # the point to follow /api/warehouse/<id>/changes from
+    versions = recorded_versions()
+    if versions and response.status_code < 400:
+        response.headers['X-Warehouse-Version'] = ', '.join(f'{warehouse_id}:{version}' for warehouse_id, version in versions.items())
+    return response
+
 @app.route("/api/docs")
 @login_required
 def api_help():
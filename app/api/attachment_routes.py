@@ -1,12 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, send_file
 from app.models import db, Vault, Attachment
 import os
 from dotenv import load_dotenv
-import boto3
-import botocore
-import uuid
-from werkzeug.utils import secure_filename
 from app.forms import EditVaultForm
+from app.services.storage import LocalStorage, get_storage
 
 load_dotenv()
 
@@ -21,6 +18,35 @@ def get_all_vault_attachments(vaultId):
     return { attachment.id : attachment.to_dict() for attachment in attachments }
 
 
+@attachment_routes.route('/files/<string:digest>')
+def get_attachment_file(digest):
+    """
+    Serves a file stored by the local storage backend
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage) or not digest.isalnum():
+        return {'errors': 'File not found'}, 404
+
+    path = storage.path_for(digest)
+    if not os.path.exists(path):
+        return {'errors': 'File not found'}, 404
+
+    return send_file(path)
+
+
+@attachment_routes.route('/<int:attachmentId>/status')
+def get_attachment_status(attachmentId):
+    """
+    Upload status of an attachment: pending until its file has been
+    stored, then ready (with file_url set) or failed
+    """
+    attachment = Attachment.query.get(attachmentId)
+    if not attachment:
+        return {'errors': 'Attachment not found'}, 404
+
+    return {'id': attachment.id, 'status': attachment.status, 'file_url': attachment.file_url}
+
+
 @attachment_routes.route('/<int:vaultId>/<int:attachmentId>', methods=['DELETE'])
 def delete_attachment(vaultId, attachmentId):
     vault = Vault.query.get(vaultId)
@@ -30,15 +56,13 @@ def delete_attachment(vaultId, attachmentId):
     attachment_unique_name = form.data['attachment_to_delete']
 
     if attachment_unique_name:
-        # Perform the logic to delete the attachment (e.g., remove from database or storage)
-        aws_access_key_id = os.getenv('AWS_ACCESS_KEY')
-        aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        s3_bucket_name = os.getenv('AWS_BUCKET_NAME')
-        
-        # Delete the file from AWS S3
-        s3 = boto3.client('s3', aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
-        s3_key = f'attachments/{attachment_unique_name}'
-        s3.delete_object(Bucket=s3_bucket_name, Key=s3_key)
+        # Delete the file from storage, unless another attachment shares it
+        # (content-addressed backends store identical files once)
+        if attachment.file_url and Attachment.query.filter(
+            Attachment.file_url == attachment.file_url,
+            Attachment.id != attachment.id
+        ).count() == 0:
+            get_storage().delete(attachment.file_url, attachment_unique_name)
         
         # Remove the attachment from the database
         vault.attachments.remove(attachment)
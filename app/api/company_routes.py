@@ -1,10 +1,28 @@
 from flask import Blueprint, jsonify
+from sqlalchemy.orm import selectinload
 from app.models import db, Company
+from app.services.pagination import list_args, name_prefix, paginate, with_cursor
 
 company_routes = Blueprint('companies', __name__)
 
 @company_routes.route('/')
 def get_all_companies():
-    companies = Company.query.all()
-    print("🌺", { company.id : company.to_dict() for company in companies })
-    return { company.id : company.to_dict() for company in companies }
+    """
+    Query for all companies and returns them in a dictionary of company
+    dictionaries by id. Optional filter: name (prefix); see ListArgs for
+    limit, after and fields.
+    """
+    try:
+        args = list_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    companies = Company.query
+    if args.args.get('name'):
+        companies = companies.filter(name_prefix(Company.name, args.args['name']))
+    for key, relationship in Company.RELATED_IDS.items():
+        if args.wants(key):
+            companies = companies.options(selectinload(getattr(Company, relationship)).load_only('id'))
+
+    companies, next_cursor = paginate(companies, Company.id, args)
+    return with_cursor({ company.id : company.to_dict(args.fields) for company in companies }, next_cursor)
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
-from app.models import Customer, Field, Warehouse, db
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from app.models import Customer, Field, Pallet, Rack, Shelf, Vault, Warehouse, db
 from app.forms import CustomerForm
+from app.services.pagination import list_args, name_prefix, paginate, with_cursor
+from app.services.versions import make_etag, not_modified, table_versions, tag
 
 customers_routes = Blueprint('customers', __name__)
 
@@ -18,10 +22,40 @@ def validation_errors_to_error_messages(validation_errors):
 @customers_routes.route('/')
 def all_customers():
     """
-    Query for all customers and returns them in a list of customer dictionaries
+    Query for all customers and returns them in a dictionary of customer
+    dictionaries by id. Optional filters: name (prefix), company and
+    warehouse; see ListArgs for limit, after and fields.
     """
-    customers = Customer.query.all()
-    return {customer.id : customer.to_dict() for customer in customers}
+    try:
+        args = list_args()
+        company_id = args.integer('company')
+        warehouse_id = args.integer('warehouse')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = make_etag('customers', *table_versions('customers', 'vaults', 'pallets'))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    customers = Customer.query
+    if args.args.get('name'):
+        customers = customers.filter(name_prefix(Customer.name, args.args['name']))
+    if company_id is not None:
+        customers = customers.filter(Customer.vaults.any(Vault.company_id == company_id))
+    if warehouse_id is not None:
+        customers = customers.filter(or_(
+            Customer.vaults.any(Vault.field.has(Field.warehouse_id == warehouse_id)),
+            Customer.pallets.any(Pallet.shelf.has(Shelf.rack.has(Rack.warehouse_id == warehouse_id))),
+        ))
+    # the id lists are loaded for the whole page at once
+    if args.wants('vaults'):
+        customers = customers.options(selectinload(Customer.vaults).load_only('id'))
+    if args.wants('pallets'):
+        customers = customers.options(selectinload(Customer.pallets).load_only('id'))
+
+    customers, next_cursor = paginate(customers, Customer.id, args)
+    return with_cursor(tag({customer.id : customer.to_dict(args.fields) for customer in customers}, etag), next_cursor)
     
 
 @customers_routes.route('/', methods=['POST'])
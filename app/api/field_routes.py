@@ -1,9 +1,20 @@
 from flask import Blueprint, jsonify, request
-from app.models import db, Field, Vault, Warehouse
+from app.models import db, Field, Vault, Warehouse, WarehouseChange
 from app.forms import EditFieldForm, PostFieldForm
+from app.services import changes, grid
 
 field_routes = Blueprint('fields', __name__)
 
+
+def field_dicts(fields):
+    """
+    Dictionaries for a list of fields, with their vaults loaded in one
+    query instead of one per field
+    """
+    vaults_by_field = Vault.by_field([field.id for field in fields])
+    return [field.to_dict(vaults=vaults_by_field.get(field.id, [])) for field in fields]
+
+
 # @field_routes.route('/<int:field_id>', methods=['PATCH'])
 # def update_field_type(field_id):
 #     form = EditFieldForm()
@@ -71,16 +82,16 @@ field_routes = Blueprint('fields', __name__)
 
 @field_routes.route('/<int:field_id>', methods=['PATCH'])
 def update_field_type(field_id):
-    data = request.get_json()
     field = Field.query.get(field_id)
-    new_type = data.get('type', field.type)
-    bottom_field_name = data.get('field2')
-    warehouse_id = data.get('warehouseId')
     
     if not field:
         return jsonify({"error": "Field not found"}), 404    
     
-    bottom_field = Field.query.filter_by(name=bottom_field_name, warehouse_id=warehouse_id).first()
+    # the bottom half of a couchbox is the field directly below, found
+    # through the (warehouse_id, col, row) index
+    bottom_field = None
+    if field.row is not None and field.col is not None:
+        bottom_field = Field.query.filter_by(warehouse_id=field.warehouse_id, col=field.col, row=field.row + 1).first()
     if not bottom_field:
         return jsonify({"error": "Bottom field not found"}), 404
 
@@ -98,6 +109,7 @@ def update_field_type(field_id):
     else:
         return jsonify({"error": "Invalid type change"}), 400
     
+    changes.fields_changed(field, bottom_field)
     db.session.commit()
 
     return jsonify({"field1": field.to_dict(), "field2": bottom_field.to_dict()})
@@ -113,6 +125,7 @@ def set_field_full(field_id):
         return jsonify({"error": "Field not found"}), 404
 
     field.full = is_full
+    changes.fields_changed(field)
     db.session.commit()
 
     return jsonify(field.to_dict())
@@ -123,85 +136,38 @@ def add_field():
     form = PostFieldForm()
     form['csrf_token'].data = request.cookies['csrf_token']
 
-    def update_char(name, increment):
-        if 'A' <= name[0] <= 'Z':
-            char_num = ord(name[0])
-            name = chr(char_num+increment)+name[1:]
-            return name
-
     try:
         if form.validate_on_submit():
             warehouse_id = form.data['warehouse_id']
             direction = form.data['direction']
-            opperation = form.data['opperation']
-            warehouse_cols = form.data['warehouse_cols']
-            warehouse_rows = form.data['warehouse_rows']
             count = form.data['count']
-            res = []
-            fields = Field.query.filter_by(warehouse_id=warehouse_id)
             warehouse = Warehouse.query.get(warehouse_id)
 
+            if direction not in ('left', 'right', 'bottom'):
+                return jsonify(message="direction not specified")
+
+            try:
+                new_rows, new_cols = grid.grow(warehouse, direction, count)
+            except grid.GridSizeError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
+
+            field_grid = warehouse.field_grid()
             if direction == 'left':
-                new_warehouse_cols_count = warehouse.cols + count
-                warehouse.cols = new_warehouse_cols_count
-
-                for field in fields:
-                    new_name = update_char(field.name, count)
-                    field.name = new_name
-                    res.append(field.to_dict())
-                for i in range(1, count+1):
-                    col_char = chr(64+i)
-                    for j in range(1, warehouse_rows+1):
-                        name = f"{col_char}{j}"
-                        print(name)
-                        new_field = Field(name=name, warehouse=warehouse)
-                        db.session.add(new_field)
-                        db.session.commit()
-                        res.append(new_field.to_dict())
-
-                db.session.commit()
-
-                return jsonify({ 'fields': res, 'warehouseId': warehouse_id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': new_warehouse_cols_count })
-
-            if direction == 'right':
-                new_warehouse_cols_count = warehouse.cols + count 
-                warehouse.cols = new_warehouse_cols_count 
-
-                largest_field_name_letter = max([field.name for field in fields])
-                largest_field_name_letter_as_number = ord(largest_field_name_letter[0])
-
-                for i in range(1, count+1):
-                    col_char = chr(largest_field_name_letter_as_number+i)
-                    for j in range(1, warehouse_rows+1):
-                        name = f"{col_char}{j}"
-                        print(name)
-                        new_field = Field(name=name, warehouse=warehouse)
-                        db.session.add(new_field)
-                        db.session.commit()
-                        res.append(new_field.to_dict())
-
-                return jsonify({ 'fields': res, 'warehouseId': warehouse_id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': new_warehouse_cols_count })
-            
-            elif direction == 'bottom':
-                letters = sorted(set([field.name[0] for field in fields]))
-
-                for letter in letters:
-                    for i in range(1, count+1):                        
-                        new_field = Field(name=f"{letter}{warehouse.rows + i}", warehouse=warehouse)
-                        db.session.add(new_field)
-                        db.session.commit()
-                        res.append(new_field.to_dict())
-
-                new_warehouse_row_count = warehouse.rows + count
-                warehouse.rows = new_warehouse_row_count
-                db.session.commit()        
-
-                return jsonify({ 'fields': res, 'warehouseId': warehouse_id, 'newWarehouseRowsCount': new_warehouse_row_count, 'newWarehouseColsCount': warehouse.cols })
-            
+                # every existing field was renamed, so send the whole grid
+                # back and have other clients reload it
+                new_fields = list(field_grid)
+                changes.record(warehouse.id, reset=True)
             else:
-                return jsonify(message="direction not specified")
+                new_fields = field_grid.block(new_rows, new_cols)
+                changes.record(warehouse.id, upserted=[(WarehouseChange.WAREHOUSE, warehouse.id)] + [(WarehouseChange.FIELD, field.id) for field in new_fields])
+            res = field_dicts(new_fields)
+            db.session.commit()
+
+            return jsonify({ 'fields': res, 'warehouseId': warehouse_id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': warehouse.cols })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @field_routes.route('/', methods=['DELETE'])
@@ -209,114 +175,35 @@ def delete_field():
     form = PostFieldForm()
     form['csrf_token'].data = request.cookies['csrf_token']
 
-    def check_for_vaults(fieldsList):
-        for field in fieldsList:
-            vaults = field.vaults.all()
-            if vaults:
-                field_dict = field.to_dict()
-                return True
-        return False
-
     try:
         if form.validate_on_submit():
             warehouse_id = form.data['warehouse_id']
             direction = form.data['direction']
-            opperation = form.data['opperation']
-            warehouse_cols = form.data['warehouse_cols']
-            warehouse_rows = form.data['warehouse_rows']
             count = form.data['count']
-            fields_list = []
-            fields = Field.query.filter_by(warehouse_id=warehouse_id)
             warehouse = Warehouse.query.get(warehouse_id)
 
-            if direction == 'left':
-                new_warehouse_cols_count = warehouse.cols - count
-                warehouse.cols = new_warehouse_cols_count # decreasing warehouse cols by count
-                # for count, for each iteration, find smallest letter, then delete all fields with that letter
-                for i in range(1, count+1):
-                    smallest_field_name_letter = min([field.name for field in fields])[0]
-                    all_fields_with_that_letter = Field.query.filter(Field.name.like(f'{smallest_field_name_letter}%')).all()
-
-                    vaults_exist = check_for_vaults(all_fields_with_that_letter)
-                    if vaults_exist:
-                        return jsonify({'error': 'Cannot delete fields while vaults are present in fields.'}), 400  # Return error response
-                        
-                    for field in all_fields_with_that_letter:
-                        db.session.delete(field)
-                        db.session.commit()
-
-                for i in range(1, count+1):
-                    new_fields = Field.query.filter_by(warehouse_id=warehouse_id)
-                    for field in new_fields:
-                        new_field_name = f"{chr(ord(field.name[0]) - 1)}{field.name[1:]}"
-                        field.name = new_field_name
-                        db.session.commit()
-                        
-                return jsonify({ 'fields': [field.to_dict() for field in new_fields], 'warehouseId': warehouse.id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': new_warehouse_cols_count }), 200
-
-
-            elif direction == 'right':
-                for i in range(1, count + 1):
-                    # Find the field with the smallest first letter of its name
-                    smallest_field_name_letter = max([field.name for field in fields])[0]
-                                        
-                    all_fields_with_that_letter = Field.query.filter(
-                        Field.name.like(f'{smallest_field_name_letter}%'),
-                        Field.warehouse_id == warehouse_id  # Ensure warehouse matches
-                    ).all()
-                    
-                    # Convert generator expression to a list to print values
-                    vaults_exist = check_for_vaults(all_fields_with_that_letter)
-                    
-                    if (vaults_exist):
-                        return jsonify({'error': 'Cannot delete fields while vaults are present in fields.'}), 400  # Return error response
-                    
-                    for field in all_fields_with_that_letter:
-                        db.session.delete(field)
-
-                new_warehouse_cols_count = warehouse.cols - count
-                warehouse.cols = new_warehouse_cols_count
-
-                db.session.commit()
-                
-                fields_after_deletion = Field.query.filter_by(warehouse_id=warehouse_id).all()
-                fields_list = [field.to_dict() for field in fields_after_deletion]
-
-                return jsonify({ 'fields': fields_list, 'warehouseId': warehouse.id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': new_warehouse_cols_count }), 200
-
-            elif direction == 'bottom':
-                letters = sorted(set([field.name[0] for field in fields]))
-                fields_list = []
-                
-                for letter in letters:
-                    for i in range(warehouse.rows-count+1, warehouse.rows+1):                        
-                        field_to_delete = Field.query.filter_by(name=f"{letter}{i}", warehouse=warehouse).first()
-                        fields_list.append(field_to_delete)
-
-                vaults_exist = check_for_vaults(fields_list)
-                
-                if vaults_exist:
-                    return jsonify({'error': 'Cannot delete fields while vaults are present in fields.'}), 400  # Return error response
+            if direction not in ('left', 'right', 'bottom'):
+                return jsonify(message="direction not specified")
 
-                for field in fields_list:
-                    db.session.delete(field)
-                    db.session.commit()                            
+            try:
+                grid.shrink(warehouse, direction, count)
+            except grid.GridSizeError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
+            except grid.FieldsOccupiedError:
+                db.session.rollback()
+                return jsonify({'error': 'Cannot delete fields while vaults are present in fields.'}), 400
 
-                new_warehouse_row_count = warehouse.rows - count
-                warehouse.rows = new_warehouse_row_count
-                db.session.commit()
-                
-                fields_after_deletion = Field.query.filter_by(warehouse_id=warehouse_id).all()
-                fields_list_dicts = [field.to_dict() for field in fields_after_deletion]
+            changes.record(warehouse.id, reset=True)
+            db.session.commit()
 
-                return jsonify({ 'fields': fields_list_dicts, 'warehouseId': warehouse.id, 'newWarehouseRowsCount': new_warehouse_row_count, 'newWarehouseColsCount': warehouse.cols }), 200
+            return jsonify({ 'fields': field_dicts(list(warehouse.field_grid())), 'warehouseId': warehouse.id, 'newWarehouseRowsCount': warehouse.rows, 'newWarehouseColsCount': warehouse.cols }), 200
 
-            else:
-                return jsonify(message="direction not specified")
         else:
             return jsonify(message="method or opperation are not correct")
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
     
     
@@ -330,6 +217,7 @@ def toggle_field_full(id):
         if form.validate_on_submit():
             field1 = Field.query.get(id)
             field1.full = not(field1.full)
+            changes.fields_changed(field1)
             db.session.commit()
             return jsonify(field1.to_dict())
 
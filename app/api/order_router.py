@@ -1,14 +1,44 @@
 from flask import Blueprint, jsonify, request, Flask
-from app.models import db, Order
+from sqlalchemy.orm import selectinload
+from app.models import db, Field, Order, Vault
 from flask_cors import CORS, cross_origin
+from app.services.pagination import list_args, name_prefix, paginate, with_cursor
+from app.services.versions import make_etag, not_modified, table_versions, tag
 
 order_routes = Blueprint('orders', __name__)
 
 @order_routes.route('/')
 @cross_origin()
 def get_all_rows():
-    orders = Order.query.all()
-    return { order.id: order.to_dict() for order in orders }
+    """
+    Query for all orders and returns them in a dictionary of order
+    dictionaries by id. Optional filters: name (prefix), company and
+    warehouse; see ListArgs for limit, after and fields.
+    """
+    try:
+        args = list_args()
+        company_id = args.integer('company')
+        warehouse_id = args.integer('warehouse')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = make_etag('orders', *table_versions('orders', 'vaults'))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    orders = Order.query
+    if args.args.get('name'):
+        orders = orders.filter(name_prefix(Order.name, args.args['name']))
+    if company_id is not None:
+        orders = orders.filter(Order.company_id == company_id)
+    if warehouse_id is not None:
+        orders = orders.filter(Order.order_vaults.any(Vault.field.has(Field.warehouse_id == warehouse_id)))
+    if args.wants('vaults'):
+        orders = orders.options(selectinload(Order.order_vaults).load_only('id'))
+
+    orders, next_cursor = paginate(orders, Order.id, args)
+    return with_cursor(tag({ order.id: order.to_dict(args.fields) for order in orders }, etag), next_cursor)
 
 @order_routes.route('/<int:id>')
 def get_order(id):
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from app.models import Customer, Pallet, Shelf, db
+from app.services import changes, slots
 
 pallet_routes = Blueprint('pallets', __name__)
 
@@ -18,11 +19,14 @@ def add_pallet_to_shelf(shelf_id):
     if not customer_name or not pallet_number:
         return jsonify({'error': 'Customer name and pallet number are required'}), 400
 
-    shelf = Shelf.query.get(shelf_id)
-    if not shelf:
+    try:
+        # the leftmost free spot, checked against the shelf's bitmap under a lock
+        shelf, slot_index = slots.reserve(shelf_id, 1)
+    except slots.ShelfNotFoundError:
+        db.session.rollback()
         return jsonify({'error': 'Shelf not found'}), 404
-
-    if len(shelf.pallets) >= shelf.capacity:
+    except slots.NoRoomError:
+        db.session.rollback()
         return jsonify({'error': 'Shelf capacity exceeded'}), 400
 
     try:
@@ -32,9 +36,12 @@ def add_pallet_to_shelf(shelf_id):
             customer_name=customer_name,
             pallet_number=pallet_number,
             notes=notes,
-            shelf_id=shelf_id
+            shelf_id=shelf_id,
+            shelf_spots=1,
+            slot_index=slot_index,
         )
         db.session.add(new_pallet)
+        changes.shelf_changed(shelf_id)
         db.session.commit()
         return jsonify(shelf.to_dict()), 201  # Return updated shelf with all pallets
     except Exception as e:
@@ -63,6 +70,7 @@ def edit_pallet(pallet_id):
         pallet.pallet_number = data.get('pallet_number', pallet.pallet_number)
         pallet.notes = data.get('notes', pallet.notes)
         pallet.weight = data.get('weight', pallet.weight)
+        changes.shelf_changed(pallet.shelf_id)
         db.session.commit()
         return jsonify(pallet.to_dict()), 200
     except Exception as e:
@@ -82,6 +90,7 @@ def delete_pallet(pallet_id):
            db.session.delete(customer)
          
         db.session.delete(pallet)
+        changes.shelf_changed(pallet.shelf_id)
         db.session.commit()
         return jsonify({'message': 'Pallet deleted successfully'}), 200
     except Exception as e:
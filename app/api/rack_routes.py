@@ -1,16 +1,47 @@
 from flask import Blueprint, jsonify, request
 from app.models import Rack, Shelf, Warehouse, db, Pallet
 from app.models.customer import Customer 
+from app.services import changes, slots
+from app.services.versions import make_etag, not_modified, table_versions, tag
 
 rack_routes = Blueprint('racks', __name__)
 
 
+def optional_int(value, name, minimum=0):
+    """
+    An optional whole number from request JSON; ValueError if it is
+    anything else or below minimum
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ValueError(f'{name} must be a whole number of at least {minimum}')
+    return value
+
+
+def placement_error(e):
+    """
+    Response for a slot allocator error
+    """
+    if isinstance(e, slots.ShelfNotFoundError):
+        return jsonify({'error': 'Shelf not found'}), 404
+    if isinstance(e, slots.SlotConflictError):
+        return jsonify({'error': 'Pallet overlaps another pallet or runs past the end of the shelf'}), 409
+    return jsonify({'error': 'No room for a pallet of that size'}), 409
+
+
 @rack_routes.route('/warehouse/<int:warehouse_id>', methods=['GET'])
 def get_racks_for_warehouse(warehouse_id):
     try:
+        version = db.session.query(Warehouse.version).filter(Warehouse.id == warehouse_id).scalar()
+        etag = make_etag('racks', warehouse_id, version, *table_versions('pallets'))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
         racks = Rack.query.filter_by(warehouse_id=warehouse_id).all()
         response = [rack.to_dict() for rack in racks]
-        return jsonify(response), 200
+        return tag((jsonify(response), 200), etag)
     except Exception as e:
         return jsonify({'error': 'Failed to fetch racks', 'details': str(e)}), 500
 
@@ -78,6 +109,7 @@ def add_rack_to_warehouse(warehouse_id):
             new_rack.shelves.append(new_shelf)  # Append directly to the rack's shelves relationship
             db.session.add(new_shelf)
 
+        changes.rack_changed(new_rack)
         db.session.commit()
 
     except Exception as e:
@@ -118,6 +150,7 @@ def update_rack_position(warehouse_id, rack_id):
         return jsonify({'error': 'Invalid position data', 'details': str(e)}), 400
 
     try:
+        changes.rack_changed(rack)
         db.session.commit()
         return jsonify({'message': 'Rack position updated successfully', 'rack': rack.to_dict()}), 200
     except Exception as e:
@@ -139,6 +172,17 @@ def add_pallet_to_shelf(shelf_id):
         return jsonify({'error': 'Missing required fields'}), 400
 
     try:
+        shelf_spots = optional_int(shelf_spots, 'shelf_spots', 1) or 1
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        try:
+            shelf, slot_index = slots.reserve(shelf_id, shelf_spots)
+        except (slots.ShelfNotFoundError, slots.NoRoomError) as e:
+            db.session.rollback()
+            return placement_error(e)
+
         new_pallet = Pallet(
             name=f"Pallet-{shelf_id}-{pallet_number}",
             weight=weight,
@@ -147,8 +191,10 @@ def add_pallet_to_shelf(shelf_id):
             pallet_number=pallet_number,
             notes=notes,
             shelf_spots=shelf_spots,
+            slot_index=slot_index,
         )
         db.session.add(new_pallet)
+        changes.shelf_changed(shelf_id)
         db.session.commit()
         return jsonify(new_pallet.to_dict()), 201
     except Exception as e:
@@ -171,6 +217,12 @@ def create_pallet():
     if not shelf_id or not customer_name or not name:
         return jsonify({'error': 'Missing required fields'}), 400
 
+    try:
+        shelf_spots = optional_int(shelf_spots, 'shelf_spots', 1) or 1
+        slot_index = optional_int(slot_index, 'slot_index')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     customer_name = customer_name.upper()  # Ensure uppercase
 
     # --- Begin: Ensure customer exists ---
@@ -184,6 +236,13 @@ def create_pallet():
     # --- End: Ensure customer exists ---
 
     try:
+        # without a slot_index the pallet goes in the leftmost gap that fits
+        try:
+            shelf, slot_index = slots.reserve(shelf_id, shelf_spots, slot_index)
+        except (slots.ShelfNotFoundError, slots.SlotConflictError, slots.NoRoomError) as e:
+            db.session.rollback()
+            return placement_error(e)
+
         new_pallet = Pallet(
             name=name,  # Use provided name
             weight=weight,
@@ -196,6 +255,7 @@ def create_pallet():
             customer_id=customer.id,  # Associate with customer
         )
         db.session.add(new_pallet)
+        changes.shelf_changed(shelf_id)
         db.session.commit()
         return jsonify(new_pallet.to_dict()), 201
     except Exception as e:
@@ -203,12 +263,69 @@ def create_pallet():
         return jsonify({'error': str(e)}), 500
 
 
+@rack_routes.route('/<int:warehouse_id>/auto-place', methods=['POST'])
+def auto_place_pallet(warehouse_id):
+    """
+    Create a pallet on whichever shelf of the warehouse, or of rack_id,
+    has room for it. strategy is "first" (leftmost gap on the first shelf
+    with room) or "best" (the tightest gap on the fullest shelf with room).
+    """
+    data = request.get_json()
+    customer_name = data.get('customer_name')
+    name = data.get('name')
+    strategy = data.get('strategy', slots.FIRST_FIT)
+
+    if not customer_name or not name:
+        return jsonify({'error': 'Missing required fields'}), 400
+    if strategy not in slots.STRATEGIES:
+        return jsonify({'error': f"strategy must be one of {', '.join(slots.STRATEGIES)}"}), 400
+
+    try:
+        shelf_spots = optional_int(data.get('shelf_spots'), 'shelf_spots', 1) or 1
+        rack_id = optional_int(data.get('rack_id'), 'rack_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not db.session.query(Warehouse.id).filter(Warehouse.id == warehouse_id).scalar():
+        return jsonify({'error': 'Warehouse not found'}), 404
+
+    customer_name = customer_name.upper()
+
+    try:
+        try:
+            shelf, slot_index = slots.auto_place(warehouse_id, shelf_spots, rack_id, strategy)
+        except slots.NoRoomError as e:
+            db.session.rollback()
+            return placement_error(e)
+
+        customer = Customer.get_or_create(customer_name)
+        new_pallet = Pallet(
+            name=name,
+            weight=data.get('weight', 0),
+            shelf_id=shelf.id,
+            customer_name=customer_name,
+            customer=customer,
+            pallet_number=data.get('pallet_number'),
+            notes=data.get('notes'),
+            shelf_spots=shelf_spots,
+            slot_index=slot_index,
+        )
+        db.session.add(new_pallet)
+        changes.shelf_changed(shelf.id)
+        db.session.commit()
+        return jsonify({**new_pallet.to_dict(), 'rackId': shelf.rack_id}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @rack_routes.route('/<int:warehouse_id>/rack/<int:rack_id>/delete', methods=['DELETE'])
 def delete_rack(warehouse_id, rack_id):
     rack = Rack.query.filter_by(id=rack_id, warehouse_id=warehouse_id).first()
     if not rack:
         return jsonify({'error': 'Rack not found'}), 404
     try:
+        changes.rack_changed(rack, deleted=True)
         db.session.delete(rack)
         db.session.commit()
         return jsonify({'message': 'Rack deleted successfully'}), 200
@@ -230,7 +347,21 @@ def edit_pallet(id):
     pallet.pallet_number = data.get('pallet_number', pallet.pallet_number)
     pallet.notes = data.get('notes', pallet.notes)
     pallet.weight = data.get('weight', pallet.weight)
-    pallet.shelf_spots = data.get('pallet_spaces', pallet.shelf_spots)
+
+    if data.get('pallet_spaces') is not None:
+        try:
+            shelf_spots = optional_int(data['pallet_spaces'], 'pallet_spaces', 1)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        # a placed pallet can only grow into free spots to its right
+        if pallet.slot_index is not None and shelf_spots != pallet.shelf_spots:
+            try:
+                slots.reserve(pallet.shelf_id, shelf_spots, pallet.slot_index, exclude_pallet_id=pallet.id)
+            except (slots.ShelfNotFoundError, slots.SlotConflictError) as e:
+                db.session.rollback()
+                return placement_error(e)
+        pallet.shelf_spots = shelf_spots
 
     # Update customer_id if customer_name is changed
     if 'customer_name' in data:
@@ -245,6 +376,7 @@ def edit_pallet(id):
         pallet.customer_id = customer.id
 
     try:
+        changes.shelf_changed(pallet.shelf_id)
         db.session.commit()
         return jsonify(pallet.to_dict()), 200
     except Exception as e:
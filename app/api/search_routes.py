@@ -1,39 +1,64 @@
 from flask import Blueprint, jsonify, request
-from flask_login import login_required
-from app.models import Customer, Order, Field, Vault, Warehouse, db
+from flask_login import login_required, current_user
+from app.models import Warehouse, db
+from app.services import search
 
 search_routes = Blueprint('search', __name__)
 
+# most hits a type-ahead request can ask for
+MAX_SEARCH_RESULTS = 50
+
+
+@search_routes.route('/')
+@login_required
+def type_ahead():
+    """
+    Type-ahead search of customer, order and vault names and pallet
+    numbers containing ?q=, within the user's company. Optional: type
+    (comma separated), warehouse and limit. Each hit lists where it is:
+    warehouse and field, or warehouse, rack, shelf and slot.
+    """
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
+
+    types = [type for type in request.args.get('type', '').split(',') if type] or None
+    if types and any(type not in search.SEARCHABLE for type in types):
+        return jsonify({'error': f"type must be one of {', '.join(search.SEARCHABLE)}"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 20))
+        warehouse_id = int(request.args['warehouse']) if request.args.get('warehouse') else None
+    except ValueError:
+        return jsonify({'error': 'limit and warehouse must be integers'}), 400
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        return jsonify({'error': f'limit must be between 1 and {MAX_SEARCH_RESULTS}'}), 400
+
+    if warehouse_id is not None:
+        warehouse = db.session.query(Warehouse.company_id).filter(Warehouse.id == warehouse_id).first()
+        if not warehouse or warehouse.company_id != current_user.company_id:
+            return jsonify({'error': 'Warehouse not found'}), 404
+
+    results = search.search(text, types, company_id=current_user.company_id, warehouse_id=warehouse_id, limit=limit)
+    return jsonify({'query': text, 'results': results})
+
 
 @search_routes.route('/<string:type>/<int:id>')
 @login_required
 def search_warehouse(id, type):
-    if request.method == 'GET':
-        if (type == "customer"):
-            customer = Customer.query.get(id)
-
-            if customer:
-                customer_vaults = [vault.to_dict() for vault in customer.vaults]
-                fields_containing_searched_customer = []
-                for vault in customer_vaults:
-                    field_id = vault['field_id']
-                    if field_id != None:
-                        field = Field.query.get(field_id)
-                        fields_containing_searched_customer.append(field.id)
-            return fields_containing_searched_customer
-
-        if (type == "order"):
-            order = Order.query.get(id)
-            if order:
-                fields_containing_searched_order = []    
-                for vault in order.order_vaults:
-                    # vault = Vault.query.get(vault_id)
-
-                    field_id = vault.field_id
-                    if field_id != None:
-                        fields_containing_searched_order.append(field_id)
-                    
-            return fields_containing_searched_order
-
+    """
+    Where a customer's or order's vaults are, and a customer's pallets:
+    distinct field ids plus hit counts per field and per shelf slot,
+    grouped by warehouse, within the user's company
+    """
+    if type not in ('customer', 'order'):
         return jsonify({'error': 'Item not found'}), 404
-    
+
+    warehouses = search.location_counts(type, id, company_id=current_user.company_id)
+    return jsonify({
+        'type': type,
+        'id': id,
+        'fieldIds': [field['fieldId'] for warehouse in warehouses for field in warehouse['fields']],
+        'count': sum(warehouse['count'] for warehouse in warehouses),
+        'warehouses': warehouses,
+    })
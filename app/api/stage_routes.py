@@ -1,24 +1,30 @@
 from flask import Blueprint, request, jsonify
+from flask_login import current_user, login_required
 from app.models import Vault, Field, db
 from sqlalchemy import and_
+from app.services import changes, lookup
+from app.services.pagination import list_args, paginate, with_cursor
+from app.services.versions import make_etag, not_modified, table_versions, tag
+from app.api.vault_routes import filter_vaults
 
 stage_routes = Blueprint('stage', __name__)
 
 @stage_routes.route('/vaults/<int:vault_id>', methods=['POST'])
 def stage_vault(vault_id):
     try:
-        vault = Vault.query.get(vault_id)
+        vault = lookup.get(Vault, vault_id)
         
         if not vault:
             return jsonify({"error": "Vault not found"}), 404
         
-        field = Field.query.get(vault.field_id)
+        field = lookup.get(Field, vault.field_id)
         field.full = False
         db.session.commit()
         
         old_field_id = vault.field_id
         vault.field_id = None
         vault.position = None
+        changes.fields_changed(field)
         db.session.commit()
 
         response_data = vault.to_dict()
@@ -30,24 +36,60 @@ def stage_vault(vault_id):
         return jsonify({"error": str(e)}), 500
 
 
-@stage_routes.route('/vaults', methods=['GET'])
-def get_all_staged_vaults():
+# to_dict() keys that read related rows; a staged vault has no field, so
+# its warehouse_id is None without loading anything
+STAGED_LOADS = {'customer_name', 'order_name', 'attachments'}
+
+
+def staged_vaults_response(company_id):
+    """
+    A company's staged vaults as a list of vault dictionaries, one page at
+    a time if ?limit= is given. The query is a range scan of the partial
+    index on (company_id, id) where field_id IS NULL.
+    """
     try:
-        staged_vaults = Vault.query.filter(
+        args = list_args()
+        loads = STAGED_LOADS if args.fields is None else args.fields & STAGED_LOADS
+        staged_vaults = filter_vaults(Vault.query_with_details(loads).filter(
             Vault.field_id == None
-        ).all()
-        return jsonify([vault.to_dict() for vault in staged_vaults]), 200
+        ), args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    staged_vaults = staged_vaults.filter(Vault.company_id == company_id)
+
+    try:
+        etag = make_etag('stage', company_id, *table_versions('vaults', 'customers', 'orders', 'attachments'))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        staged_vaults, next_cursor = paginate(staged_vaults, Vault.id, args)
+        return with_cursor(tag((jsonify([vault.to_dict(args.fields) for vault in staged_vaults]), 200), etag), next_cursor)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500        
-
-
-# @stage_routes.route('/vaults/<int:company_id>', methods=['GET'])
-# def get_all_staged_vaults(company_id):
-#     try:
-#         staged_vaults = Vault.query.filter(
-#             Vault.field_id == None,
-#             Vault.company_id == company_id
-#         ).all()
-#         return jsonify([vault.to_dict() for vault in staged_vaults]), 200
-#     except Exception as e:
-#         return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+@stage_routes.route('/vaults', methods=['GET'])
+@login_required
+def get_all_staged_vaults():
+    """
+    Vaults that are not in any field, only the signed-in user's company's.
+    Optional filter: customer (name prefix); see ListArgs for limit, after
+    and fields.
+    """
+    if current_user.company_id is None:
+        return jsonify({"error": "User does not belong to a company"}), 403
+    return staged_vaults_response(current_user.company_id)
+
+
+@stage_routes.route('/vaults/<int:company_id>', methods=['GET'])
+@login_required
+def get_company_staged_vaults(company_id):
+    """
+    A company's vaults that are not in any field, same arguments as above.
+    Only the signed-in user's own company can be read.
+    """
+    if company_id != current_user.company_id:
+        return jsonify({"error": "Company not found"}), 404
+    return staged_vaults_response(company_id)
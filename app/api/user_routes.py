@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify
 from flask_login import login_required
+from sqlalchemy.orm import joinedload
 from app.models import User
+from app.services.pagination import list_args, paginate, with_cursor
 
 user_routes = Blueprint('users', __name__)
 
@@ -9,10 +11,23 @@ user_routes = Blueprint('users', __name__)
 @login_required
 def users():
     """
-    Query for all users and returns them in a list of user dictionaries
+    Query for all users and returns them in a list of user dictionaries.
+    Optional filter: company; see ListArgs for limit, after and fields.
     """
-    users = User.query.all()
-    return [user.to_dict() for user in users]
+    try:
+        args = list_args()
+        company_id = args.integer('company')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    users = User.query
+    if company_id is not None:
+        users = users.filter(User.company_id == company_id)
+    if args.wants('company'):
+        users = users.options(joinedload(User.company))
+
+    users, next_cursor = paginate(users, User.id, args)
+    return with_cursor(jsonify([user.to_dict(args.fields) for user in users]), next_cursor)
 
 
 @user_routes.route('/<int:id>')
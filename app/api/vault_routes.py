@@ -1,19 +1,23 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_login import login_required
 from app.models import Customer, Vault, Field, Order, Attachment, Warehouse, db
 from app.forms import VaultForm, EditVaultForm
+from app.services.capacity import add_vault_to_field, FieldFullError, FieldNotFoundError
+from app.services.uploads import queue_attachment
+from app.services import changes, lookup
+from app.services.pagination import list_args, name_prefix, paginate, with_cursor
 from werkzeug.utils import secure_filename
 import os
 from dotenv import load_dotenv
 import uuid
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
 
 load_dotenv()
 
 vault_routes = Blueprint('vaults', __name__)
 
+# rows fetched per round trip when streaming the vault export
+EXPORT_BATCH_SIZE = 500
+
 def validation_errors_to_error_messages(validation_errors):
     """
     Simple function that turns the WTForms validation errors into a simple list
@@ -24,28 +28,58 @@ def validation_errors_to_error_messages(validation_errors):
             errorMessages.append(f'{field} : {error}')
     return errorMessages
 
-# Google Drive API setup
-SCOPES = ['https://www.googleapis.com/auth/drive.file']
-SERVICE_ACCOUNT_INFO = {
-    "type": os.getenv("GOOGLE_CLOUD_TYPE"),
-    "project_id": os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
-    "private_key_id": os.getenv("GOOGLE_CLOUD_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("GOOGLE_CLOUD_PRIVATE_KEY").replace("\\n", "\n"),
-    "client_email": os.getenv("GOOGLE_CLOUD_CLIENT_EMAIL"),
-    "client_id": os.getenv("GOOGLE_CLOUD_CLIENT_ID"),
-    "auth_uri": os.getenv("GOOGLE_CLOUD_AUTH_URI"),
-    "token_uri": os.getenv("GOOGLE_CLOUD_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("GOOGLE_CLOUD_AUTH_PROVIDER_X509_CERT_URL"),
-    "client_x509_cert_url": os.getenv("GOOGLE_CLOUD_CLIENT_X509_CERT_URL")
-}
-credentials = service_account.Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=SCOPES)
-drive_service = build('drive', 'v3', credentials=credentials)
 
+# keys vault_with_location() adds, all read from the vault's field and warehouse
+LOCATION_FIELDS = {'warehouse_name', 'field_id', 'field_name'}
+
+
+def vault_with_location(vault, fields=None):
+    """
+    Vault dictionary with its warehouse and field names, using "staged"
+    for vaults that are not in a field
+    """
+    vault_dict = vault.to_dict(fields)
+    if fields is None or fields & LOCATION_FIELDS:
+        field = vault.field
+        warehouse = field.warehouse if field else None
+        vault_dict['warehouse_name'] = warehouse.name if warehouse else None
+        vault_dict['field_id'] = "staged" if vault.field_id is None else vault.field_id
+        vault_dict['field_name'] = field.name if field else "staged"
+        if fields is not None:
+            vault_dict = {key: value for key, value in vault_dict.items() if key in fields}
+    return vault_dict
+
+
+def filter_vaults(vaults, args):
+    """
+    Apply the company, warehouse and customer (name prefix) filters of a
+    vault list request
+    """
+    company_id = args.integer('company')
+    warehouse_id = args.integer('warehouse')
+    if company_id is not None:
+        vaults = vaults.filter(Vault.company_id == company_id)
+    if warehouse_id is not None:
+        vaults = vaults.filter(Vault.field.has(Field.warehouse_id == warehouse_id))
+    if args.args.get('customer'):
+        vaults = vaults.filter(Vault.customer.has(name_prefix(Customer.name, args.args['customer'])))
+    return vaults
+
+
+def unique_filename(attachment):
+    """
+    Storage name for an uploaded file that won't collide with other uploads
+    """
+    return str(uuid.uuid4()) + secure_filename(attachment.filename)
 
 
 @vault_routes.route('/upload', methods=['POST'])
 def upload_file():
-    """Handles file uploads and sends to Google Drive"""
+    """
+    Accepts a file upload for a vault and queues it for Google Drive.
+    Returns the pending attachment right away; poll
+    /api/attachments/<id>/status until it is ready.
+    """
     try:
         attachment = request.files.get('attachment')
         vault_id = request.form.get('vault_id')
@@ -53,57 +87,19 @@ def upload_file():
         if not attachment or not vault_id:
             return jsonify({'error': 'Missing file or vault ID'}), 400
 
-        print("Starting file upload to Google Drive...")
-
-        # Save the file temporarily
-        file_path = os.path.join('/tmp', secure_filename(attachment.filename))
-        attachment.save(file_path)
-        print(f"File saved to {file_path}")
-
-        # Google Drive Upload
-        file_metadata = {
-            'name': attachment.filename,
-            'parents': [os.getenv("GOOGLE_DRIVE_FOLDER_ID")]
-        }
-        media = MediaFileUpload(file_path, mimetype=attachment.content_type)
-
-        # Handle broken pipe by retrying
-        retry_attempts = 3
-        for attempt in range(retry_attempts):
-            try:
-                file = drive_service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id'
-                ).execute()
-
-                file_id = file.get('id')
-                print(f"File uploaded successfully: {file_id}")
-                break
-            except Exception as e:
-                print(f"Upload attempt {attempt + 1} failed: {e}")
-                if attempt == retry_attempts - 1:
-                    raise e
-
-        # Clean up
-        os.remove(file_path)
-        print(f"File removed from local storage: {file_path}")
-
-        # Store attachment in DB
-        file_url = f'https://drive.google.com/file/d/{file_id}/view'
-        new_attachment = Attachment(
-            vault_id=vault_id,
-            file_name=attachment.filename,
-            unique_name=attachment.filename,
-            file_url=file_url,
-        )
-
-        db.session.add(new_attachment)
+        vault = Vault.query.get(vault_id)
+        if not vault:
+            return jsonify({'error': 'Vault not found'}), 404
+
+        upload = queue_attachment(vault, attachment, unique_filename(attachment))
+        changes.fields_changed(lookup.get(Field, vault.field_id))
         db.session.commit()
+        upload.start()
 
-        return jsonify({'message': 'File uploaded successfully', 'attachment': new_attachment.to_dict()}), 200
+        return jsonify({'message': 'File upload queued', 'attachment': upload.attachment.to_dict()}), 202
 
     except Exception as e:
+        db.session.rollback()
         print(f"Error uploading file: {e}")
         return jsonify({'error': f"Error uploading file: {e}"}), 500
     
@@ -119,27 +115,8 @@ def add_vault():
             customer_name = form.data['customer_name'].upper()
             order_name = form.data['order_name']
 
-            existent_customer = Customer.query.filter_by(name=customer_name).first() if customer_name else None
-            existent_order = Order.query.filter_by(name=order_name).first() if order_name else None
-
             company_id = request.form.get('company_id')
 
-            # --- PATCH: Check field capacity before adding vault ---
-            field = Field.query.get(form.data['field_id'])
-            if not field:
-                return jsonify({'error': 'Field not found'}), 404
-
-            # Get field capacity (from model: field_capacity or capacity)
-            field_capacity = getattr(field, 'capacity', None) or getattr(field, 'field_capacity', None) or getattr(field, 'fieldcapacity', None) or getattr(field, 'field_capacity', None)
-            # Fallback to warehouse.field_capacity if not set on field
-            if not field_capacity and hasattr(field, 'warehouse') and hasattr(field.warehouse, 'field_capacity'):
-                field_capacity = field.warehouse.field_capacity
-
-            vault_count = field.vaults.count() if hasattr(field.vaults, 'count') else len(field.vaults)
-            # If field is full or vault count matches capacity, block addition
-            if field.full or (field_capacity and vault_count >= field_capacity):
-                return jsonify({'error': 'Field is full. Cannot add more vaults.'}), 400
-
             # Only allow a name for EMPTY T2, not for EMPTY LIFTVAN or EMPTY COUCHBOX
             if customer_name == "EMPTY T2":
                 vault_name = form.data['vault_id'] if form.data['vault_id'] else None
@@ -148,103 +125,44 @@ def add_vault():
             else:
                 vault_name = form.data['vault_id']
 
-            new_vault = Vault(
-                name=vault_name,
-                customer_id=existent_customer.id if existent_customer else None,
-                field_id=form.data['field_id'],
-                order_id=existent_order.id if existent_order else None,
-                position=form.data['position'],
-                note=form.data['note'],
-                empty=form.data['empty'],
-                type=form.data['type'],
-                company_id=company_id if company_id else None,
-            )
-            
-            db.session.add(new_vault)
-            db.session.commit()
-
-            if not existent_customer:
-                if customer_name:
-                    new_customer = Customer(name=customer_name)
-                    db.session.add(new_customer) 
-                    db.session.commit()                   
-                    new_vault.customer_id = new_customer.id
-                    db.session.commit()
-
-            if not existent_order:
-                if order_name:
-                    new_order = Order(name=order_name)
-                    db.session.add(new_order)
-                    db.session.commit()
-                    new_order.order_vaults.append(new_vault)
-                    db.session.commit()
-
-            field = Field.query.get(new_vault.field_id)
-
-            # TODO check conditionally if production or local, if local field.vaults.count() == 1
-            if field.type == "couchbox" and field.vaults.count() == 3:
-                field.full = True
+            # Customer, order, vault and attachment are one unit of work:
+            # nothing is flushed until the single commit below
+            with db.session.no_autoflush:
+                customer = Customer.get_or_create(customer_name) if customer_name else None
+                order = Order.get_or_create(order_name) if order_name else None
+
+                try:
+                    new_vault, field = add_vault_to_field(
+                        form.data['field_id'],
+                        name=vault_name,
+                        customer=customer,
+                        order=order,
+                        position=form.data['position'],
+                        note=form.data['note'],
+                        empty=form.data['empty'],
+                        type=form.data['type'],
+                        company_id=company_id if company_id else None,
+                    )
+                except FieldNotFoundError:
+                    db.session.rollback()
+                    return jsonify({'error': 'Field not found'}), 404
+                except FieldFullError:
+                    db.session.rollback()
+                    return jsonify({'error': 'Field is full. Cannot add more vaults.'}), 400
 
             # Handle file upload
             attachment = request.files.get('attachment')
-            
-            print("Attachment:", attachment)
-
-            if attachment:
-                # Generate a unique file name
-                unique_filename = str(uuid.uuid4()) + secure_filename(attachment.filename)
-                file_path = os.path.join('/tmp', unique_filename)
-                attachment.save(file_path)
-                print(f"File saved to {file_path}")
-
-                # Google Drive Upload
-                file_metadata = {
-                    'name': unique_filename,
-                    'parents': [os.getenv("GOOGLE_DRIVE_FOLDER_ID")]
-                }
-                media = MediaFileUpload(file_path, mimetype=attachment.content_type)
-
-                # Handle broken pipe by retrying
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    try:
-                        file = drive_service.files().create(
-                            body=file_metadata,
-                            media_body=media,
-                            fields='id'
-                        ).execute()
-
-                        file_id = file.get('id')
-                        print(f"File uploaded successfully: {file_id}")
-                        break
-                    except Exception as e:
-                        print(f"Upload attempt {attempt + 1} failed: {e}")
-                        if attempt == retry_attempts - 1:
-                            raise e
-
-                # Clean up
-                os.remove(file_path)
-                print(f"File removed from local storage: {file_path}")
-
-                # Store attachment in DB
-                file_url = f'https://drive.google.com/file/d/{file_id}/view'
-                new_attachment = Attachment(
-                    vault_id=new_vault.id,
-                    file_name=attachment.filename,
-                    unique_name=unique_filename,
-                    file_url=file_url,
-                )
-                db.session.add(new_attachment)
-                db.session.commit()
+            upload = queue_attachment(new_vault, attachment, unique_filename(attachment)) if attachment else None
 
-            # Retrieve the customer name for the response
-            customer_name = Customer.query.get(new_vault.customer_id).name if new_vault.customer_id else None
-            dict_new_vault = new_vault.to_dict()
-            dict_new_vault["customer_name"] = customer_name
+            changes.fields_changed(field)
+            db.session.commit()
+            if upload:
+                upload.start()
 
-            return {"vault": dict_new_vault, "fieldId": field.id}
+            return {"vault": new_vault.to_dict(), "fieldId": field.id}
 
     except Exception as e:
+        db.session.rollback()
         print(f"Error in add_vault route: {e}")
         return jsonify({'error': str(e)}), 500
 
@@ -262,8 +180,10 @@ def move_vault():
     vault = Vault.query.get(vault_id)
     
     if vault:
+        old_field = lookup.get(Field, vault.field_id)
         vault.field_id = field_id
         vault.position = position
+        changes.fields_changed(lookup.get(Field, field_id), old_field)
         db.session.commit()
         return jsonify({
             "vaultId": vault_id,
@@ -279,21 +199,37 @@ def move_vault():
 # @login_required
 def get_all_vaults():
     """
-    Query for all vaults and return them in a list of vault dictionaries
+    Query for all vaults and return them in a list of vault dictionaries.
+    With ?format=ndjson the vaults are streamed one JSON object per line
+    from a server-side cursor instead of being built up in memory.
+    Optional filters: company, warehouse and customer (name prefix); see
+    ListArgs for limit, after and fields.
     """
-    vaults = Vault.query.all()
-    vaults_with_warehouse = []
-    for vault in vaults:
-        field = Field.query.get(vault.field_id)
-        warehouse_id = field.warehouse_id if field else None
-        warehouse = Warehouse.query.get(warehouse_id) if warehouse_id else None
-        vault_dict = vault.to_dict()
-        vault_dict['warehouse_name'] = warehouse.name if warehouse else None
-        vault_dict['field_id'] = "staged" if vault.field_id is None else vault.field_id
-        vault_dict['field_name'] = field.name if field else "staged"
-        vaults_with_warehouse.append(vault_dict)
-        
-    return jsonify(vaults_with_warehouse)
+    try:
+        args = list_args()
+        fields = args.fields
+        # the location keys need the field and warehouse loaded
+        loads = fields | {'warehouse_id'} if fields is not None and fields & LOCATION_FIELDS else fields
+        vaults = filter_vaults(Vault.query_with_details(loads), args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('format') == 'ndjson' and args.limit is None:
+        if args.after is not None:
+            vaults = vaults.filter(Vault.id > args.after)
+        vaults = vaults.order_by(Vault.id)
+
+        def generate():
+            for vault in vaults.yield_per(EXPORT_BATCH_SIZE):
+                yield current_app.json.dumps(vault_with_location(vault, fields)) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    vaults, next_cursor = paginate(vaults, Vault.id, args)
+    if request.args.get('format') == 'ndjson':
+        body = ''.join(current_app.json.dumps(vault_with_location(vault, fields)) + '\n' for vault in vaults)
+        return with_cursor(Response(body, mimetype='application/x-ndjson'), next_cursor)
+    return with_cursor(jsonify([vault_with_location(vault, fields) for vault in vaults]), next_cursor)
 
 @vault_routes.route('/<int:id>', methods=['GET', 'PUT'])
 # @login_required
@@ -321,6 +257,7 @@ def manage_vault(id):
                 vault.position = None
                 field = Field.query.get(field_id)
 
+                changes.fields_changed(field)
                 db.session.commit()
                 return {'vault': vault.to_dict(), 'field': field.to_dict()}
             
@@ -357,18 +294,18 @@ def manage_vault(id):
                 else:
                     vault.order_id = existent_order.id
 
-            db.session.commit()
-
             # Handle file uploads
-            for key, value in request.files.items():
-                if key.startswith('attachment'):
-                    attachment = value
-
-                    response = upload_file()
-                    if response.status_code != 200:
-                        return response
+            uploads = [
+                queue_attachment(vault, attachment, unique_filename(attachment))
+                for key, attachment in request.files.items()
+                if key.startswith('attachment')
+            ]
 
+            changes.fields_changed(lookup.get(Field, vault.field_id))
             db.session.commit()
+            for upload in uploads:
+                upload.start()
+
             return vault.to_dict()
         else:
             return jsonify({'errors': validation_errors_to_error_messages(form.errors)}), 400
@@ -380,7 +317,7 @@ def delete_vault(id):
     """
     Delete a vault by id and all its attachments
     """
-    vault = Vault.query.get(id)
+    vault = lookup.get(Vault, id)
     
     if not vault:
         return {'errors': 'Vault not found'}, 404
@@ -400,7 +337,7 @@ def delete_vault(id):
             print(f"Error deleting vault from stage: {e}")
             return jsonify({'error': str(e)}), 500
     
-    field = Field.query.get(vault.field_id)
+    field = lookup.get(Field, vault.field_id)
 
     if field:
         field.full = False
@@ -409,8 +346,8 @@ def delete_vault(id):
             field.full = False
         db.session.commit()
         
-    customer = Customer.query.get(vault.customer_id)
-    order = Order.query.get(vault.order_id)   
+    customer = lookup.get(Customer, vault.customer_id)
+    order = lookup.get(Order, vault.order_id)
 
     try:
         # Delete all attachments
@@ -427,12 +364,12 @@ def delete_vault(id):
             db.session.delete(order)
                         
         db.session.delete(vault)
+        version = changes.fields_changed(field)
         db.session.commit()
         
-        warehouse = Warehouse.query.get(field.warehouse_id)
-        
         print(f"Vault {id} deleted successfully")
-        return jsonify({'warehouse': warehouse.to_dict(), 'field': field.to_dict(), 'vaultId': id})
+        # only the emptied field changed, send it rather than the whole warehouse
+        return jsonify({'warehouseId': field.warehouse_id, 'version': version, 'field': field.to_dict(), 'vaultId': id})
     except Exception as e:
         print(f"Error deleting vault: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,9 +1,17 @@
-from flask import Blueprint, jsonify, request
+import time
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
-from app.models import Warehouse, Field, Order, Vault, db
+from app.models import Customer, Occupancy, Warehouse, WarehouseChange, Field, Order, Vault, db
+from app.services import changes, lookup, occupancy, placement, snapshots
+from app.services.events import get_broker, warehouse_channel
+from app.services.snapshots import SNAPSHOT_TABLES, snapshot_key
+from app.services.versions import make_etag, not_modified, table_versions, tag
 
 warehouse_routes = Blueprint('warehouse', __name__)
 
+# seconds between keep-alive comments on an idle event stream
+EVENT_KEEPALIVE = 15
+
 
 # fetch current field
 @warehouse_routes.route('/<int:warehouse_id>/<int:field_id>')
@@ -22,19 +30,21 @@ def delete_warehouse(warehouse_id):
         return jsonify({'error': 'Warehouse not found'}), 404
 
     if warehouse.warehouse_fields:
+        field_ids = [field.id for field in warehouse.warehouse_fields]
+        vaults = Vault.query.filter(Vault.field_id.in_(field_ids)).all()
+        orders = lookup.prefetch(Order, [vault.order_id for vault in vaults])
+        for vault in vaults:
+            order_to_delete = orders.get(vault.order_id)
+            if order_to_delete:
+                db.session.delete(order_to_delete)
+            db.session.delete(vault)
         for field in warehouse.warehouse_fields:
-            field_to_delete = Field.query.get(field.id)
-            for vault in field_to_delete.vaults:
-                vault_to_delete = Vault.query.get(vault.id)
-                if vault_to_delete.order_id:
-                    order_to_delete = Order.query.get(vault_to_delete.order_id)
-                    if order_to_delete:
-                        db.session.delete(order_to_delete)
-                db.session.delete(vault_to_delete)
-            db.session.delete(field_to_delete)
+            db.session.delete(field)
     else:
         print("No fields found for this warehouse.")
 
+    WarehouseChange.query.filter_by(warehouse_id=warehouse_id).delete(synchronize_session=False)
+    Occupancy.query.filter_by(warehouse_id=warehouse_id).delete(synchronize_session=False)
     db.session.delete(warehouse)
     db.session.commit()
     
@@ -46,12 +56,75 @@ def get_warehouse_info(warehouse_id):
     """
     Retrieve information about the warehouse
     """
-    warehouse = Warehouse.query.get(warehouse_id)
+    version = db.session.query(Warehouse.version).filter(Warehouse.id == warehouse_id).scalar()
 
-    if not warehouse:
+    if version is None:
+        return {'errors': 'Warehouse not found'}, 404
+
+    etag = snapshot_key(warehouse_id, version, table_versions(*SNAPSHOT_TABLES))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    warehouse_info = snapshots.warehouse_snapshot(warehouse_id, etag)
+    if warehouse_info is None:
+        return {'errors': 'Warehouse not found'}, 404
+    return tag({'warehouse_info': warehouse_info}, etag)
+
+
+@warehouse_routes.route('/<int:warehouse_id>/occupancy', methods=['GET'])
+def get_warehouse_occupancy(warehouse_id):
+    """
+    Used and free capacity per field, rack and shelf, from the occupancy
+    summary rather than the vault and pallet rows
+    """
+    version = db.session.query(Warehouse.version).filter(Warehouse.id == warehouse_id).scalar()
+
+    if version is None:
+        return {'errors': 'Warehouse not found'}, 404
+
+    # the summary only changes along with the warehouse version
+    etag = make_etag('occupancy', warehouse_id, version)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    return tag(occupancy.summary(warehouse_id), etag)
+
+
+@warehouse_routes.route('/<int:warehouse_id>/placement', methods=['GET'])
+def suggest_placement(warehouse_id):
+    """
+    Fields to put a received vault in, best first: ?type= is vault or
+    couchbox, ?customer= the customer's name, to keep their vaults together
+    """
+    type = request.args.get('type', 'vault')
+    if type not in placement.FIELD_TYPES:
+        return jsonify({'error': f"type must be one of {', '.join(placement.FIELD_TYPES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', 5))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= placement.MAX_SUGGESTIONS:
+        return jsonify({'error': f'limit must be between 1 and {placement.MAX_SUGGESTIONS}'}), 400
+
+    if not db.session.query(Warehouse.id).filter(Warehouse.id == warehouse_id).scalar():
         return {'errors': 'Warehouse not found'}, 404
 
-    return {'warehouse_info': warehouse.to_dict()}
+    # names are stored both as typed and upper-cased, so one customer can
+    # be several rows; keep all of their vaults together
+    customer_ids = []
+    customer_name = request.args.get('customer', '').strip()
+    if customer_name:
+        customer_ids = [id for (id,) in db.session.query(Customer.id).filter(
+            db.func.upper(Customer.name) == customer_name.upper()
+        ).order_by(Customer.id)]
+
+    return jsonify({
+        'warehouseId': warehouse_id,
+        'customerIds': customer_ids,
+        'fields': placement.suggest(warehouse_id, type, customer_ids, limit),
+    })
 
 
 @warehouse_routes.route('/add-warehouse', methods=['POST'])
@@ -83,28 +156,15 @@ def add_warehouse():
             company_id=company_id
         )
         db.session.add(warehouse)
+        db.session.flush()
+
+        # Create all fields in one insert, DO NOT set capacity on Field
+        Field.bulk_create_grid(warehouse.id, cols=cols, rows=rows)
+        occupancy.refresh(warehouse.id)
         db.session.commit()
 
-        # Fetch warehouse with associated rows and fields
-        warehouse = Warehouse.query.filter_by(name=name).first()
-        warehouse_id = warehouse.id
-
-        # Create columns and fields, DO NOT set capacity on Field
-        for i in range(1, cols + 1):
-            col_char = chr(64 + i)
-            for field_num in range(1, rows + 1):
-                field_name = f"{col_char}{field_num}"
-                field = Field(
-                    name=field_name,
-                    warehouse_id=warehouse_id,
-                    full=False,
-                    type='vault'
-                    # Do NOT set capacity here
-                )
-                db.session.add(field)
-                db.session.commit()
-
-        return jsonify(warehouse.to_dict()), 201
+        # a new warehouse has no vaults, skip loading them field by field
+        return jsonify(warehouse.to_dict(vaults_by_field={})), 201
 
     except Exception as e:
         db.session.rollback()
@@ -130,8 +190,9 @@ def edit_field_capacity(warehouse_id):
 
     try:
         warehouse.field_capacity = new_field_capacity
+        changes.record(warehouse.id)
         db.session.commit()
-        return jsonify({'message': 'Field capacity updated successfully', 'warehouse': warehouse.to_dict()}), 200
+        return jsonify({'message': 'Field capacity updated successfully', 'warehouse': warehouse.header_dict()}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -159,8 +220,9 @@ def edit_warehouse_dimensions(warehouse_id):
             warehouse.length = length
         if width is not None:
             warehouse.width = width
+        changes.record(warehouse.id)
         db.session.commit()
-        return jsonify({'message': 'Warehouse dimensions updated successfully', 'warehouse': warehouse.to_dict()}), 200
+        return jsonify({'message': 'Warehouse dimensions updated successfully', 'warehouse': warehouse.header_dict()}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -184,6 +246,7 @@ def update_field_grid(warehouse_id):
 
     try:
         warehouse.fieldgrid_location = new_position
+        changes.record(warehouse.id)
         db.session.commit()
         return jsonify({'message': 'Field grid position updated successfully', 'fieldgridLocation': new_position}), 200
     except Exception as e:
@@ -191,16 +254,89 @@ def update_field_grid(warehouse_id):
         return jsonify({'error': str(e)}), 500
 
 
+@warehouse_routes.route('/<int:warehouse_id>/changes', methods=['GET'])
+def get_warehouse_changes(warehouse_id):
+    """
+    Fields, racks and warehouse attributes changed after version ?since=,
+    for clients that already hold the warehouse at that version
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since must be a warehouse version'}), 400
+
+    warehouse = Warehouse.query.get(warehouse_id)
+    if not warehouse:
+        return jsonify({'error': 'Warehouse not found'}), 404
+
+    return jsonify(changes.changes_since(warehouse, since))
+
+
+@warehouse_routes.route('/<int:warehouse_id>/events', methods=['GET'])
+def warehouse_events(warehouse_id):
+    """
+    Server-sent events for a warehouse: a "hello" event with its current
+    version, then a "change" event per committed change (same entries as
+    the change feed). Each event's id is the warehouse version after it.
+    The stream ends after EVENT_STREAM_MAX_AGE seconds and the browser
+    reconnects. Unless WAREHOUSE_EVENTS is 'stream' the answer is 204,
+    which tells the browser not to reconnect and the page to poll the
+    change feed instead.
+    """
+    if current_app.config['WAREHOUSE_EVENTS'] != 'stream':
+        return '', 204
+
+    # subscribe before reading the version so nothing falls in between;
+    # it is queried fresh, a warehouse already in the session may be stale
+    subscription = get_broker().subscribe(warehouse_channel(warehouse_id))
+    version = db.session.query(Warehouse.version).filter_by(id=warehouse_id).scalar()
+    # don't hold a pooled connection for the life of the stream
+    db.session.remove()
+    if version is None:
+        subscription.close()
+        return jsonify({'error': 'Warehouse not found'}), 404
+
+    def format_event(message, version=None):
+        lines = [f"event: {message['type']}"]
+        if version is not None:
+            lines.append(f'id: {version}')
+        lines.append(f'data: {current_app.json.dumps(message)}')
+        return '\n'.join(lines) + '\n\n'
+
+    # streams are recycled so a worker thread is never held for good
+    closes_at = time.monotonic() + current_app.config['EVENT_STREAM_MAX_AGE']
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            yield format_event({'type': 'hello', 'warehouseId': warehouse_id, 'version': version}, version)
+            while True:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                message = subscription.get(timeout=min(EVENT_KEEPALIVE, remaining))
+                if message is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield format_event(message, message.get('version'))
+        finally:
+            subscription.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # ask proxies (nginx) not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @warehouse_routes.route('/company/<int:company_id>', methods=['GET'])
 def get_warehouses_by_company(company_id):
-    warehouses = Warehouse.query.filter_by(company_id=company_id).all()
-    if not warehouses:
-        return jsonify([]), 200
+    return jsonify(snapshots.company_snapshots(company_id))
 
-    sorted_warehouses = []
-    for warehouse in warehouses:
-        warehouse_dict = warehouse.to_dict()
-        sorted_warehouses.append(warehouse_dict)
 
-    return jsonify(sorted_warehouses)
+@warehouse_routes.route('/snapshot-cache', methods=['GET'])
+def snapshot_cache_stats():
+    """
+    Hit and miss counts of this process's warehouse snapshot cache
+    """
+    return jsonify(snapshots.get_cache().stats())
 
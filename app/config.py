@@ -10,4 +10,29 @@ class Config:
     # so the connection uri must be updated here (for production)
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         'DATABASE_URL').replace('postgres://', 'postgresql://')
-    SQLALCHEMY_ECHO = True
\ No newline at end of file
+    SQLALCHEMY_ECHO = True
+    # where attachment files are stored: 'drive', 's3', 'local', or 'memory' for tests
+    ATTACHMENT_STORAGE = os.environ.get('ATTACHMENT_STORAGE', 'drive')
+    # directory used by the 'local' storage backend
+    ATTACHMENT_STORAGE_PATH = os.environ.get('ATTACHMENT_STORAGE_PATH', 'attachments')
+    # how open warehouse pages follow other operators' changes: 'poll' (the
+    # page reads the change feed every few seconds) or 'stream' (server-sent
+    # events). A stream holds a worker thread for as long as the page is open,
+    # so 'stream' needs threaded workers (gunicorn --worker-class gthread) and,
+    # with more than one worker process, EVENT_BROKER=redis
+    WAREHOUSE_EVENTS = os.environ.get('WAREHOUSE_EVENTS', 'poll')
+    # seconds an event stream stays open before the browser is made to reconnect
+    EVENT_STREAM_MAX_AGE = int(os.environ.get('EVENT_STREAM_MAX_AGE', 300))
+    # pub/sub for live warehouse events: 'local' (in process) or 'redis'
+    EVENT_BROKER = os.environ.get('EVENT_BROKER', 'local')
+    # used by the 'redis' event broker
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    # serialized warehouses kept in each process's snapshot cache
+    SNAPSHOT_CACHE_SIZE = int(os.environ.get('SNAPSHOT_CACHE_SIZE', 256))
+    # optional cache shared by all workers behind the in-process one: '' (none) or 'redis'
+    SNAPSHOT_CACHE_SHARED = os.environ.get('SNAPSHOT_CACHE_SHARED', '')
+    # seconds a snapshot is kept in the shared cache
+    SNAPSHOT_CACHE_TTL = int(os.environ.get('SNAPSHOT_CACHE_TTL', 24 * 60 * 60))
+    # type-ahead search: 'database' (pg_trgm indexes), 'memory' (in-process
+    # indexes), or '' to use 'database' on Postgres and 'memory' otherwise
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', '')
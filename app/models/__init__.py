@@ -9,4 +9,7 @@ from .attachment import Attachment
 from .company import Company
 from .rack import Rack
 from .shelf import Shelf
-from .pallet import Pallet
\ No newline at end of file
+from .pallet import Pallet
+from .warehouse_change import WarehouseChange
+from .table_version import TableVersion
+from .occupancy import Occupancy
\ No newline at end of file
@@ -2,7 +2,12 @@ from .db import db, environment, SCHEMA, add_prefix_for_prod
 
 class Attachment(db.Model):
     __tablename__ = 'attachments'
-    
+
+    # upload status values
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+
     if environment == "production":
         __table_args__ = {'schema': SCHEMA}
 
@@ -12,6 +17,7 @@ class Attachment(db.Model):
     file_url = db.Column(db.String, nullable=False)
     file_name = db.Column(db.String, nullable=False)
     unique_name = db.Column(db.String, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=READY, server_default=READY)
 
     vault_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('vaults.id'), ondelete='CASCADE'))
     vault = db.relationship('Vault', back_populates='attachments')
@@ -23,4 +29,5 @@ class Attachment(db.Model):
             'file_url': self.file_url,
             'file_name': self.file_name,
             'unique_name': self.unique_name,
+            'status': self.status,
         }
\ No newline at end of file
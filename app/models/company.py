@@ -1,4 +1,4 @@
-from .db import db, environment, SCHEMA, add_prefix_for_prod
+from .db import db, environment, SCHEMA, add_prefix_for_prod, select_fields
 from flask_login import UserMixin
 
 
@@ -23,11 +23,19 @@ class Company(db.Model, UserMixin):
     # warehouses - one to many
     company_warehouses = db.relationship('Warehouse', back_populates='company', foreign_keys='Warehouse.company_id')
 
-    def to_dict(self):
-        return {
+    # to_dict() keys listing related ids, and the relationship behind each
+    RELATED_IDS = {
+        'orders': 'company_orders',
+        'users': 'company_users',
+        'warehouses': 'company_warehouses',
+    }
+
+    def to_dict(self, fields=None):
+        company = {
             'id': self.id,
             'name': self.name,
-            'orders': [order.id for order in self.company_orders], 
-            'users': [user.id for user in self.company_users], 
-            'warehouses': [warehouse.id for warehouse in self.company_warehouses], 
-        }
\ No newline at end of file
+        }
+        for key, relationship in self.RELATED_IDS.items():
+            if fields is None or key in fields:
+                company[key] = [related.id for related in getattr(self, relationship)]
+        return select_fields(company, fields)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .db import db, environment, SCHEMA, add_prefix_for_prod
+from .db import db, environment, SCHEMA, add_prefix_for_prod, select_fields
 from flask_login import UserMixin
 
 
@@ -13,10 +13,30 @@ class Customer(db.Model, UserMixin):
     vaults = db.relationship('Vault', back_populates='customer')
     pallets = db.relationship('Pallet', back_populates='customer')
 
-    def to_dict(self):
-        return {
+    @classmethod
+    def get_or_create(cls, name):
+        """
+        Return the customer with this name, adding a new one to the session
+        (without flushing) if none exists yet
+        """
+        customer = cls.query.filter_by(name=name).first()
+        if not customer:
+            customer = cls(name=name)
+            db.session.add(customer)
+        return customer
+
+    def to_dict(self, fields=None):
+        # vault and pallet ids are only loaded when they are asked for
+        customer = {
             'id': self.id,
             'name': self.name,
-            'vaults': [vault.id for vault in self.vaults], 
-            'pallets': [pallet.id for pallet in self.pallets], 
-        }
\ No newline at end of file
+        }
+        if fields is None or 'vaults' in fields:
+            customer['vaults'] = [vault.id for vault in self.vaults]
+        if fields is None or 'pallets' in fields:
+            customer['pallets'] = [pallet.id for pallet in self.pallets]
+        return select_fields(customer, fields)
+
+
+# customers are matched case-insensitively with upper(name)
+db.Index('ix_customers_upper_name', db.func.upper(Customer.name))
@@ -12,4 +12,11 @@ def add_prefix_for_prod(attr):
     if environment == "production":
         return f"{SCHEMA}.{attr}"
     else:
-        return attr
\ No newline at end of file
+        return attr
+
+
+# helper for to_dict(fields=...): keep only the requested keys, or all of them
+def select_fields(values, fields):
+    if fields is None:
+        return values
+    return {key: value for key, value in values.items() if key in fields}
\ No newline at end of file
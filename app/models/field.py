@@ -1,5 +1,6 @@
 from .db import db, environment, SCHEMA, add_prefix_for_prod
 from flask_login import UserMixin
+import re
 
 
 class Field(db.Model, UserMixin):
@@ -13,19 +14,126 @@ class Field(db.Model, UserMixin):
     type = db.Column(db.String, default="vault")
     vaults = db.relationship('Vault', back_populates='field', lazy='dynamic')
     full = db.Column(db.Boolean, default=False)
+    # grid coordinates, both 1-based; name is derived from them (col 3, row 12 -> "C12")
+    row = db.Column(db.Integer)
+    col = db.Column(db.Integer)
 
-    warehouse_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('warehouses.id')))
+    warehouse_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('warehouses.id')), index=True)
     warehouse = db.relationship('Warehouse', back_populates='warehouse_fields')
 
     def generate_name(self, col_name, numerical_identifier):
         return f"{col_name}_{numerical_identifier:02d}"
 
-    def to_dict(self):
+    @staticmethod
+    def column_label(col):
+        """
+        Spreadsheet-style letters for a 1-based column: 1 -> A, 26 -> Z, 27 -> AA
+        """
+        label = ''
+        while col > 0:
+            col, remainder = divmod(col - 1, 26)
+            label = chr(65 + remainder) + label
+        return label
+
+    @staticmethod
+    def parse_name(name):
+        """
+        (col, row) for a field name like "AB12", or None if it isn't one
+        """
+        match = re.fullmatch(r'([A-Z]+)(\d+)', name or '')
+        if not match:
+            return None
+        col = 0
+        for letter in match.group(1):
+            col = col * 26 + ord(letter) - 64
+        return col, int(match.group(2))
+
+    @classmethod
+    def grid_values(cls, warehouse_id, cols, rows, first_col=1, first_row=1):
+        """
+        Column values for a block of empty vault fields, column by column.
+        Columns are lettered (1 -> A) and rows numbered, e.g. "C12".
+        """
+        return [
+            {
+                'name': f"{cls.column_label(col)}{row}",
+                'row': row,
+                'col': col,
+                'warehouse_id': warehouse_id,
+                'type': 'vault',
+                'full': False,
+            }
+            for col in range(first_col, first_col + cols)
+            for row in range(first_row, first_row + rows)
+        ]
+
+    @classmethod
+    def bulk_create_grid(cls, warehouse_id, cols, rows, first_col=1, first_row=1):
+        """
+        Insert a block of fields with a single executemany in the current
+        transaction and return their names
+        """
+        values = cls.grid_values(warehouse_id, cols, rows, first_col, first_row)
+        if values:
+            db.session.execute(cls.__table__.insert(), values)
+        return [value['name'] for value in values]
+
+    def to_dict(self, vaults=None):
+        # vaults is a dynamic relationship, so bulk loaders pass the
+        # already-fetched rows in instead of letting it query again
+        if vaults is None:
+            vaults = self.vaults
         return {
             'id': self.id,
             'name': self.name,
             'type': self.type,
-            'vaults': [vault.to_dict() for vault in self.vaults],
+            'vaults': [vault.to_dict() for vault in vaults],
             'warehouse_id': self.warehouse_id,
             'full': self.full,
-        }
\ No newline at end of file
+            'row': self.row,
+            'col': self.col,
+        }
+
+
+class FieldGrid:
+    """
+    A warehouse's fields in a flat, row-major list addressable by 1-based
+    (row, col) in constant time. Cells without a field hold None.
+    """
+    def __init__(self, rows, cols, fields=()):
+        self.rows = rows
+        self.cols = cols
+        self.cells = [None] * (rows * cols)
+        for field in fields:
+            if self.contains(field.row, field.col):
+                self.cells[self._index(field.row, field.col)] = field
+
+    def _index(self, row, col):
+        return (row - 1) * self.cols + (col - 1)
+
+    def contains(self, row, col):
+        return row is not None and col is not None and 1 <= row <= self.rows and 1 <= col <= self.cols
+
+    def get(self, row, col):
+        if not self.contains(row, col):
+            return None
+        return self.cells[self._index(row, col)]
+
+    def block(self, rows, cols):
+        """
+        Fields in the given row and column ranges, column by column
+        """
+        return [
+            field
+            for field in (self.get(row, col) for col in cols for row in rows)
+            if field is not None
+        ]
+
+    def __iter__(self):
+        # column by column, the order grids are created and drawn in
+        return iter(self.block(range(1, self.rows + 1), range(1, self.cols + 1)))
+
+
+# field names are grid coordinates, unique within a warehouse
+db.Index('uq_fields_warehouse_id_name', Field.warehouse_id, Field.name, unique=True)
+db.Index('ix_fields_warehouse_id_col_row', Field.warehouse_id, Field.col, Field.row)
@@ -0,0 +1,51 @@
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+
+
+class Occupancy(db.Model):
+    """
+    Summary of how full one field (vaults) or shelf (pallet spots) is,
+    kept current by every change recorded to the warehouse change feed so
+    utilization can be reported without reading vault or pallet rows.
+    """
+    __tablename__ = 'occupancy'
+
+    # entities
+    FIELD = 'field'
+    SHELF = 'shelf'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    id = db.Column(db.Integer, primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('warehouses.id'), ondelete='CASCADE'), nullable=False)
+    entity = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    # the rack of a shelf, None for fields
+    rack_id = db.Column(db.Integer)
+    used = db.Column(db.Integer, nullable=False, default=0)
+    capacity = db.Column(db.Integer)
+    # a field marked full takes no more vaults whatever its count
+    full = db.Column(db.Boolean, nullable=False, default=False)
+
+    @property
+    def free(self):
+        if self.full:
+            return 0
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.used, 0)
+
+    def to_dict(self):
+        return {
+            'id': self.entity_id,
+            'used': self.used,
+            'capacity': self.capacity,
+            'free': self.free,
+            'full': self.full,
+        }
+
+
+db.Index('uq_occupancy_entity_entity_id', Occupancy.entity, Occupancy.entity_id, unique=True)
+db.Index('ix_occupancy_warehouse_id_entity', Occupancy.warehouse_id, Occupancy.entity)
+# auto-placement looks for shelves with at least n free spots
+db.Index('ix_occupancy_warehouse_id_entity_free', Occupancy.warehouse_id, Occupancy.entity, Occupancy.capacity - Occupancy.used)
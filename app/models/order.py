@@ -1,4 +1,4 @@
-from .db import db, environment, SCHEMA, add_prefix_for_prod
+from .db import db, environment, SCHEMA, add_prefix_for_prod, select_fields
 from flask_login import UserMixin
 
 
@@ -9,16 +9,30 @@ class Order(db.Model, UserMixin):
         __table_args__ = {'schema': SCHEMA}
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, index=True)
     order_vaults = db.relationship('Vault', back_populates="order")
     company_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('companies.id')))
     company = db.relationship('Company', back_populates='company_orders')
 
     
-    def to_dict(self):
-        return {
+    @classmethod
+    def get_or_create(cls, name):
+        """
+        Return the order with this name, adding a new one to the session
+        (without flushing) if none exists yet
+        """
+        order = cls.query.filter_by(name=name).first()
+        if not order:
+            order = cls(name=name)
+            db.session.add(order)
+        return order
+
+    def to_dict(self, fields=None):
+        order = {
             'id': self.id,
             'name': self.name,
-            'vaults': [vault.id for vault in self.order_vaults],
             'companyId' : self.company_id
         }
+        if fields is None or 'vaults' in fields:
+            order['vaults'] = [vault.id for vault in self.order_vaults]
+        return select_fields(order, fields)
@@ -12,10 +12,11 @@ class Pallet(db.Model):
     shelf_id = db.Column(
         db.Integer,
         db.ForeignKey(add_prefix_for_prod('shelves.id')),
-        nullable=False
+        nullable=False,
+        index=True
     )
     customer_name = db.Column(db.String(100), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('customers.id')), nullable=True)  # Add this line
+    customer_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('customers.id')), nullable=True, index=True)
     pallet_number = db.Column(db.String(50), nullable=True)
     notes = db.Column(db.Text, nullable=True)              
     file_path = db.Column(db.String(255), nullable=True)
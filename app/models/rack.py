@@ -13,7 +13,7 @@ class Rack(db.Model):
     warehouse_id = db.Column(
         db.Integer,
         db.ForeignKey(add_prefix_for_prod('warehouses.id')),
-
+        index=True
     )
     position = db.Column(JSON, default={"x": 0.0, "y": 0.0})
     orientation = db.Column(db.String(10), default="vertical")
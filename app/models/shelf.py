@@ -1,6 +1,7 @@
 from app.models.db import db, environment, SCHEMA, add_prefix_for_prod
 from app.models.rack import Rack
 from sqlalchemy.orm import validates
+from app.services import lookup
 
 class Shelf(db.Model):
     __tablename__ = 'shelves'
@@ -14,7 +15,8 @@ class Shelf(db.Model):
     rack_id = db.Column(
         db.Integer,
         db.ForeignKey(add_prefix_for_prod('racks.id')),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     # Relationship with Rack
@@ -26,7 +28,7 @@ class Shelf(db.Model):
     @validates('rack_id')
     def set_capacity_from_rack(self, key, rack_id):
         """Set the shelf's capacity to match the rack's capacity."""
-        rack = db.session.query(Rack).get(rack_id)
+        rack = lookup.get(Rack, rack_id)
         if rack:
             self.capacity = rack.capacity
         return rack_id
@@ -0,0 +1,16 @@
+from .db import db, environment, SCHEMA
+
+
+class TableVersion(db.Model):
+    """
+    A counter per table, bumped in every transaction that writes to the
+    table. Cheap to read, so list endpoints can tell whether anything
+    changed without loading the rows.
+    """
+    __tablename__ = 'table_versions'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from .db import db, environment, SCHEMA, add_prefix_for_prod
+from .db import db, environment, SCHEMA, add_prefix_for_prod, select_fields
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
@@ -28,11 +28,13 @@ class User(db.Model, UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password, password)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        user = {
             'id': self.id,
             'username': self.username,
             'email': self.email,
             'companyId': self.company_id,
-            'company' : self.company.to_dict()
         }
+        if fields is None or 'company' in fields:
+            user['company'] = self.company.to_dict()
+        return select_fields(user, fields)
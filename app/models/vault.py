@@ -1,5 +1,7 @@
-from .db import db, environment, SCHEMA, add_prefix_for_prod
+from .db import db, environment, SCHEMA, add_prefix_for_prod, select_fields
 from flask_login import UserMixin
+from sqlalchemy.orm import joinedload, selectinload
+from .field import Field
 
 
 class Vault(db.Model, UserMixin):
@@ -10,11 +12,11 @@ class Vault(db.Model, UserMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
-    field_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('fields.id'), ondelete='CASCADE'))
-    order_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('orders.id'), ondelete='CASCADE'))
+    field_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('fields.id'), ondelete='CASCADE'), index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('orders.id'), ondelete='CASCADE'), index=True)
     position = db.Column(db.String(100))
     type = db.Column(db.String)
-    customer_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('customers.id'), ondelete='CASCADE'))
+    customer_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('customers.id'), ondelete='CASCADE'), index=True)
     note = db.Column(db.Text)
     empty = db.Column(db.Boolean)
     warehouse_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('warehouses.id')))
@@ -26,21 +28,68 @@ class Vault(db.Model, UserMixin):
     attachments = db.relationship('Attachment', back_populates='vault', cascade='all, delete-orphan')
     warehouse = db.relationship('Warehouse', back_populates='vaults')
 
-    def to_dict(self):
-        customer_name = self.customer.name if self.customer else None
+    @classmethod
+    def query_with_details(cls, fields=None):
+        """
+        Vault query that loads everything to_dict() touches in the same
+        round trip (attachments follow in one extra IN query). Given the
+        keys of a sparse to_dict(fields), only what those need is loaded.
+        """
+        loads = {
+            'customer_name': joinedload(cls.customer),
+            'order_name': joinedload(cls.order),
+            'warehouse_id': joinedload(cls.field).joinedload(Field.warehouse),
+            'attachments': selectinload(cls.attachments),
+        }
+        return cls.query.options(*(load for key, load in loads.items() if fields is None or key in fields))
+
+    @classmethod
+    def by_field(cls, field_ids):
+        """
+        Vaults in the given fields, grouped by field id, with customer,
+        order and attachments loaded for to_dict()
+        """
+        vaults_by_field = {}
+        if field_ids:
+            vaults = cls.query.filter(cls.field_id.in_(field_ids)).options(
+                joinedload(cls.customer),
+                joinedload(cls.order),
+                # joined rather than selectin, which batches 500 vault ids
+                # per query and so grows with the warehouse
+                joinedload(cls.attachments),
+            ).order_by(cls.id).all()
+            for vault in vaults:
+                vaults_by_field.setdefault(vault.field_id, []).append(vault)
+        return vaults_by_field
 
-        return {
+    def to_dict(self, fields=None):
+        vault = {
             'id': self.id,
             'name': self.name,
             'field_id': self.field_id,
             'customer_id': self.customer_id,
-            'customer_name': customer_name,
             'position': self.position,
             'order_id': self.order_id,
-            'order_name': self.order.name if self.order else None,
             'type': self.type,
             'note': self.note,
-            'attachments': [attachment.to_dict() for attachment in self.attachments],
-            'warehouse_id': self.field.warehouse_id if self.field else None,
             'company_id': self.company_id,
         }
+        # the rest come from related rows, only touched when asked for
+        if fields is None or 'customer_name' in fields:
+            vault['customer_name'] = self.customer.name if self.customer else None
+        if fields is None or 'order_name' in fields:
+            vault['order_name'] = self.order.name if self.order else None
+        if fields is None or 'attachments' in fields:
+            vault['attachments'] = [attachment.to_dict() for attachment in self.attachments]
+        if fields is None or 'warehouse_id' in fields:
+            vault['warehouse_id'] = self.field.warehouse_id if self.field else None
+        return select_fields(vault, fields)
+
+
+# staged vaults (not in any field), looked up per company by the stage panel
+db.Index(
+    'ix_vaults_staged_company_id',
+    Vault.company_id, Vault.id,
+    postgresql_where=Vault.field_id.is_(None),
+    sqlite_where=Vault.field_id.is_(None),
+)
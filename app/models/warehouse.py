@@ -2,7 +2,11 @@ from .db import db, environment, SCHEMA, add_prefix_for_prod
 from flask_login import UserMixin
 import json
 from sqlalchemy.dialects.postgresql import JSON  # Import JSON type for PostgreSQL
-from .field import Field  # <-- Add this import at the top of the file
+from .field import Field, FieldGrid
+from .vault import Vault
+from .rack import Rack
+from .shelf import Shelf
+from sqlalchemy.orm import joinedload, selectinload
 
 
 class Warehouse(db.Model):
@@ -20,6 +24,8 @@ class Warehouse(db.Model):
     width = db.Column(db.Float, nullable=True)
     fieldgrid_location = db.Column(JSON, default={"x": 0.0, "y": 0.0})  # Field grid position as JSON
     address = db.Column(db.String)
+    # bumped by every change recorded in the warehouse's change feed
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     company_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('companies.id')))
     company = db.relationship('Company', back_populates='company_warehouses')
 
@@ -32,6 +38,15 @@ class Warehouse(db.Model):
         """Initialize the field grid as a 2D array with empty cells."""
         return [["" for _ in range(self.cols)] for _ in range(self.rows)]
 
+    def field_grid(self, fields=None):
+        """
+        The warehouse's fields as a FieldGrid. Loads them in one query
+        unless fields are passed in.
+        """
+        if fields is None:
+            fields = Field.query.filter(Field.warehouse_id == self.id).all()
+        return FieldGrid(self.rows, self.cols, fields)
+
     def validate_rack_position(self, rack):
         """Validate if a rack can be placed in the warehouse."""
         rack_x = rack.position.get("x", 0)
@@ -60,7 +75,53 @@ class Warehouse(db.Model):
 
         return within_bounds and not overlaps_field_grid
 
-    def to_dict(self):
+    @classmethod
+    def snapshots(cls, *criterion):
+        """
+        Serialize the warehouses matching criterion, ordered by id, in a
+        fixed number of queries.
+
+        Produces the same shape as to_dict(), but loads the whole tree
+        (company, fields, vaults with customer/order/attachments, racks,
+        shelves and pallets) up front instead of lazy-loading per row.
+        """
+        warehouses = cls.query.filter(*criterion).order_by(cls.id).options(
+            joinedload(cls.company),
+            selectinload(cls.warehouse_fields),
+            selectinload(cls.racks).selectinload(Rack.shelves).selectinload(Shelf.pallets),
+        ).all()
+        if not warehouses:
+            return []
+
+        field_ids = [field.id for warehouse in warehouses for field in warehouse.warehouse_fields]
+        vaults_by_field = Vault.by_field(field_ids)
+
+        return [warehouse.to_dict(vaults_by_field=vaults_by_field) for warehouse in warehouses]
+
+    def header_dict(self):
+        """
+        The warehouse's own attributes, without its fields and racks
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'rows': self.rows,
+            'cols': self.cols,
+            'fieldCapacity': self.field_capacity,
+            'warehouseCapacity': self.rows * self.cols * self.field_capacity,
+            'companyId': self.company_id,
+            'length': self.length,
+            'width': self.width,
+            'fieldgridLocation': self.fieldgrid_location,
+            'version': self.version,
+        }
+
+    def to_dict(self, vaults_by_field=None):
+        if vaults_by_field is None:
+            fields = {field.id: field.to_dict() for field in self.warehouse_fields}
+        else:
+            fields = {field.id: field.to_dict(vaults=vaults_by_field.get(field.id, [])) for field in self.warehouse_fields}
+
         # Only use self.warehouse_fields to avoid duplicates
         return {
             'id': self.id,
@@ -69,11 +130,12 @@ class Warehouse(db.Model):
             'cols': self.cols,
             'fieldCapacity': self.field_capacity,
             'warehouseCapacity': self.rows * self.cols * self.field_capacity,
-            'fields': {field.id: field.to_dict() for field in self.warehouse_fields},
+            'fields': fields,
             'companyId': self.company_id,
             'companyName': self.company.name,
             'racks': [rack.to_dict() for rack in self.racks],
             'length': self.length,
             'width': self.width,
-            'fieldgridLocation': self.fieldgrid_location
+            'fieldgridLocation': self.fieldgrid_location,
+            'version': self.version,
         }
\ No newline at end of file
@@ -0,0 +1,44 @@
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+
+
+class WarehouseChange(db.Model):
+    """
+    One entry of a warehouse's change feed: an entity that was updated or
+    deleted in the transaction that moved the warehouse to `version`.
+    Clients that know a version ask for everything after it instead of
+    reloading the warehouse. Vaults are described by the field holding
+    them and pallets by their rack, the units the frontend stores.
+    """
+    __tablename__ = 'warehouse_changes'
+
+    # entities
+    WAREHOUSE = 'warehouse'
+    FIELD = 'field'
+    RACK = 'rack'
+
+    # actions
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    # too much changed to describe, clients reload the warehouse
+    RESET = 'reset'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    id = db.Column(db.Integer, primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('warehouses.id'), ondelete='CASCADE'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer)
+    action = db.Column(db.String(10), nullable=False)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'entity': self.entity,
+            'entityId': self.entity_id,
+            'action': self.action,
+        }
+
+
+db.Index('ix_warehouse_changes_warehouse_id_version', WarehouseChange.warehouse_id, WarehouseChange.version)
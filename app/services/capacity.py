@@ -0,0 +1,54 @@
+from app.models import db, Field, Vault, Warehouse
+
+# vaults a couchbox holds when its warehouse sets no field capacity
+COUCHBOX_CAPACITY = 3
+
+
+class FieldNotFoundError(Exception):
+    """Raised when a vault is added to a field that does not exist."""
+
+
+class FieldFullError(Exception):
+    """Raised when a vault is added to a field that has no room left."""
+
+
+def lock_field(field_id):
+    """
+    Load a field together with its warehouse's field capacity, holding a
+    row lock (SELECT ... FOR UPDATE) on the field until the transaction ends.
+    SQLite has no row locks and ignores FOR UPDATE, so there a no-op write
+    to the field takes the database write lock instead.
+    """
+    if db.session.get_bind(mapper=Field).dialect.name == 'sqlite':
+        db.session.execute(Field.__table__.update().where(Field.id == field_id).values(id=Field.id))
+    row = db.session.query(Field, Warehouse.field_capacity) \
+        .outerjoin(Warehouse, Field.warehouse_id == Warehouse.id) \
+        .filter(Field.id == field_id) \
+        .with_for_update(of=Field) \
+        .first()
+    if row is None:
+        raise FieldNotFoundError(field_id)
+    return row
+
+
+def add_vault_to_field(field_id, **vault_attrs):
+    """
+    Check a field's occupancy and add a vault to it in the current transaction.
+
+    The field row stays locked until the caller commits, so concurrent adds
+    to the same field are serialized and cannot overfill it. The count runs
+    after the lock is taken so it sees vaults committed by the previous holder.
+    """
+    field, field_capacity = lock_field(field_id)
+
+    vault_count = Vault.query.filter_by(field_id=field.id).count()
+    if field.full or (field_capacity and vault_count >= field_capacity):
+        raise FieldFullError(field_id)
+
+    vault = Vault(field_id=field.id, **vault_attrs)
+    db.session.add(vault)
+
+    if field.type and field.type.startswith('couchbox') and vault_count + 1 >= (field_capacity or COUCHBOX_CAPACITY):
+        field.full = True
+
+    return vault, field
@@ -0,0 +1,159 @@
+import os
+from flask import g
+from sqlalchemy.orm import selectinload
+from app.models import db, Field, Rack, Shelf, Vault, Warehouse, WarehouseChange
+from app.services import lookup, occupancy
+from app.services.events import publish_after_commit
+
+# versions of history kept per warehouse, clients further behind reload
+RETAINED_VERSIONS = int(os.getenv('WAREHOUSE_CHANGES_RETAINED', 1000))
+# how often (in versions) older history is pruned
+PRUNE_EVERY = 100
+
+
+def record(warehouse_id, upserted=(), deleted=(), reset=False):
+    """
+    Bump a warehouse's version and log what changed, in the current
+    transaction so the log commits or rolls back with the change itself.
+    upserted and deleted are (entity, id) pairs; reset tells clients to
+    reload the whole warehouse. Returns the new version, which is also
+    reported to the client in the X-Warehouse-Version response header and,
+    once the transaction commits, published to the warehouse's live events.
+    """
+    if warehouse_id is None:
+        return None
+
+    # the UPDATE row-locks the warehouse, so concurrent writers get
+    # consecutive versions
+    Warehouse.query.filter(Warehouse.id == warehouse_id) \
+        .update({Warehouse.version: Warehouse.version + 1}, synchronize_session=False)
+    version = db.session.query(Warehouse.version).filter(Warehouse.id == warehouse_id).scalar()
+
+    entries = [(WarehouseChange.WAREHOUSE, warehouse_id, WarehouseChange.RESET)] if reset else []
+    entries += [(entity, entity_id, WarehouseChange.UPSERT) for entity, entity_id in dict.fromkeys(upserted)]
+    entries += [(entity, entity_id, WarehouseChange.DELETE) for entity, entity_id in dict.fromkeys(deleted)]
+    if not entries:
+        # nothing more specific, the warehouse's own attributes changed
+        entries = [(WarehouseChange.WAREHOUSE, warehouse_id, WarehouseChange.UPSERT)]
+    db.session.execute(WarehouseChange.__table__.insert(), [
+        {'warehouse_id': warehouse_id, 'version': version, 'entity': entity, 'entity_id': entity_id, 'action': action}
+        for entity, entity_id, action in entries
+    ])
+    occupancy.changed(warehouse_id, entries)
+
+    if version % PRUNE_EVERY == 0:
+        WarehouseChange.query.filter(
+            WarehouseChange.warehouse_id == warehouse_id,
+            WarehouseChange.version <= version - RETAINED_VERSIONS,
+        ).delete(synchronize_session=False)
+
+    g.setdefault('warehouse_versions', {})[warehouse_id] = version
+    publish_after_commit(db.session, warehouse_id, {
+        'type': 'change',
+        'warehouseId': warehouse_id,
+        'version': version,
+        'changes': [{'entity': entity, 'entityId': entity_id, 'action': action} for entity, entity_id, action in entries],
+    })
+    return version
+
+
+def recorded_versions():
+    """
+    warehouse id -> new version for every change recorded in this request
+    """
+    return g.get('warehouse_versions', {})
+
+
+def fields_changed(*fields):
+    """
+    Record upserts of fields, e.g. after vaults were added to, edited in or
+    taken out of them. Fields may span warehouses; returns the new version
+    of the first field's warehouse.
+    """
+    by_warehouse = {}
+    for field in fields:
+        if field:
+            by_warehouse.setdefault(field.warehouse_id, []).append((WarehouseChange.FIELD, field.id))
+    versions = [record(warehouse_id, upserted=upserted) for warehouse_id, upserted in by_warehouse.items()]
+    return versions[0] if versions else None
+
+
+def rack_changed(rack, deleted=False):
+    """
+    Record an upsert, or the deletion, of a rack
+    """
+    change = [(WarehouseChange.RACK, rack.id)]
+    if deleted:
+        return record(rack.warehouse_id, deleted=change)
+    return record(rack.warehouse_id, upserted=change)
+
+
+def shelf_changed(shelf_id):
+    """
+    Record an upsert of the rack holding a shelf, after its pallets changed
+    """
+    shelf = lookup.get(Shelf, shelf_id)
+    rack = lookup.get(Rack, shelf.rack_id) if shelf else None
+    return rack_changed(rack) if rack else None
+
+
+def changes_since(warehouse, since):
+    """
+    Everything that changed in a warehouse after version `since`, as
+    current field, rack and warehouse dictionaries plus deleted ids.
+    reset is set when the log can't answer (too old, or a change too big
+    to describe) and the client should reload the warehouse instead.
+    """
+    delta = {
+        'warehouseId': warehouse.id,
+        'version': warehouse.version,
+        'reset': False,
+        'warehouse': None,
+        'fields': [],
+        'deletedFields': [],
+        'racks': [],
+        'deletedRacks': [],
+    }
+    if since == warehouse.version:
+        return delta
+
+    entries = WarehouseChange.query.filter(
+        WarehouseChange.warehouse_id == warehouse.id,
+        WarehouseChange.version > since,
+    ).order_by(WarehouseChange.version, WarehouseChange.id).all()
+
+    # the log holds every version after since only if since + 1 is in it
+    oldest = min((entry.version for entry in entries), default=None)
+    if since > warehouse.version or oldest != since + 1 \
+            or any(entry.action == WarehouseChange.RESET for entry in entries):
+        delta['reset'] = True
+        return delta
+
+    # the latest action per entity wins
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.action
+
+    def ids(entity, action):
+        return [entity_id for (e, entity_id), a in latest.items() if e == entity and a == action]
+
+    if ids(WarehouseChange.WAREHOUSE, WarehouseChange.UPSERT):
+        delta['warehouse'] = warehouse.header_dict()
+
+    field_ids = ids(WarehouseChange.FIELD, WarehouseChange.UPSERT)
+    if field_ids:
+        fields = Field.query.filter(Field.id.in_(field_ids), Field.warehouse_id == warehouse.id).all()
+        vaults_by_field = Vault.by_field([field.id for field in fields])
+        delta['fields'] = [field.to_dict(vaults=vaults_by_field.get(field.id, [])) for field in fields]
+    found = {field['id'] for field in delta['fields']}
+    delta['deletedFields'] = ids(WarehouseChange.FIELD, WarehouseChange.DELETE) + [i for i in field_ids if i not in found]
+
+    rack_ids = ids(WarehouseChange.RACK, WarehouseChange.UPSERT)
+    if rack_ids:
+        racks = Rack.query.filter(Rack.id.in_(rack_ids), Rack.warehouse_id == warehouse.id) \
+            .options(selectinload(Rack.shelves).selectinload(Shelf.pallets)).all()
+        delta['racks'] = [rack.to_dict() for rack in racks]
+    found = {rack['id'] for rack in delta['racks']}
+    delta['deletedRacks'] = ids(WarehouseChange.RACK, WarehouseChange.DELETE) + [i for i in rack_ids if i not in found]
+
+    return delta
@@ -0,0 +1,149 @@
+import json
+import queue
+import threading
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# events buffered per subscriber; one that falls further behind is told to resync
+SUBSCRIBER_BUFFER = 256
+
+
+def warehouse_channel(warehouse_id):
+    return f'warehouse:{warehouse_id}'
+
+
+class Subscription:
+    """
+    A subscriber's view of one channel. get() returns the next event, or
+    None after timeout seconds without one. An event of type "resync"
+    means events were dropped and the subscriber should catch up from the
+    warehouse change feed.
+    """
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.overflowed = False
+
+    def deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        if self.overflowed:
+            self.overflowed = False
+            # drain what is queued, the change feed covers it
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'resync'}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. Only reaches subscribers connected to the same
+    process, so it suits a single worker; use the redis broker otherwise.
+    """
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Fans events out through Redis pub/sub so every worker process sees
+    them. Each process keeps one Redis subscription and hands messages to
+    its own subscribers like the local broker does.
+    """
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self.redis = redis.Redis.from_url(current_app.config['REDIS_URL'])
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe(**{'warehouse:*': self._receive})
+        self.thread = self.pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _receive(self, message):
+        channel = message['channel'].decode()
+        super().publish(channel, json.loads(message['data']))
+
+    def publish(self, channel, message):
+        self.redis.publish(channel, json.dumps(message))
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'redis': RedisBroker,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Event broker for this process, picked by the EVENT_BROKER setting and
+    created on first use
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = BROKERS[current_app.config['EVENT_BROKER']]()
+    return _broker
+
+
+def publish_after_commit(session, warehouse_id, message):
+    """
+    Queue an event for a warehouse's subscribers, sent only if and when
+    the session's current transaction commits
+    """
+    session.info.setdefault('pending_events', []).append((warehouse_channel(warehouse_id), message))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending(session):
+    pending = session.info.pop('pending_events', [])
+    if not pending:
+        return
+    try:
+        broker = get_broker()
+        for channel, message in pending:
+            broker.publish(channel, message)
+    except Exception as e:
+        # subscribers can always catch up from the change feed
+        print(f"Error publishing warehouse events: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('pending_events', None)
@@ -0,0 +1,110 @@
+from sqlalchemy import String, case, cast, exists, func, literal
+from app.models import db, Field, Vault
+
+# prefix that moves renamed fields out of the way of the unique
+# (warehouse_id, name) index until every field in the shift has moved
+RENAME_PREFIX = '~'
+
+
+class FieldsOccupiedError(Exception):
+    """Raised when a resize would delete fields that still hold vaults."""
+
+
+class GridSizeError(Exception):
+    """Raised when a resize count is not positive or would empty the grid."""
+
+
+def _warehouse_fields(warehouse_id):
+    return Field.query.filter(Field.warehouse_id == warehouse_id)
+
+
+def shift_columns(warehouse_id, first_col, last_col, offset):
+    """
+    Move columns first_col..last_col of a warehouse by offset columns in
+    two UPDATE statements, whatever the grid size
+    """
+    if first_col > last_col or offset == 0:
+        return
+
+    labels = {col: Field.column_label(col + offset) for col in range(first_col, last_col + 1)}
+    _warehouse_fields(warehouse_id) \
+        .filter(Field.col.between(first_col, last_col)) \
+        .update(
+            {
+                Field.col: Field.col + offset,
+                Field.name: literal(RENAME_PREFIX, String).concat(case(labels, value=Field.col)).concat(cast(Field.row, String)),
+            },
+            synchronize_session=False,
+        )
+    _warehouse_fields(warehouse_id) \
+        .filter(Field.name.like(f'{RENAME_PREFIX}%')) \
+        .update({Field.name: func.substr(Field.name, len(RENAME_PREFIX) + 1)}, synchronize_session=False)
+
+
+def delete_fields(warehouse_id, *criteria):
+    """
+    Delete the warehouse's fields matching criteria with one DELETE,
+    after a single EXISTS check that none of them hold vaults
+    """
+    occupied = db.session.query(
+        exists()
+        .where(Vault.field_id == Field.id)
+        .where(Field.warehouse_id == warehouse_id, *criteria)
+    ).scalar()
+    if occupied:
+        raise FieldsOccupiedError(warehouse_id)
+
+    _warehouse_fields(warehouse_id).filter(*criteria).delete(synchronize_session=False)
+
+
+def grow(warehouse, direction, count):
+    """
+    Add count columns on the left or right, or count rows at the bottom,
+    of a warehouse's field grid. Returns the (rows, cols) ranges of the
+    new fields.
+    """
+    if count is None or count < 1:
+        raise GridSizeError('count must be at least 1')
+
+    if direction == 'left':
+        shift_columns(warehouse.id, 1, warehouse.cols, count)
+        Field.bulk_create_grid(warehouse.id, cols=count, rows=warehouse.rows)
+        new_block = range(1, warehouse.rows + 1), range(1, count + 1)
+        warehouse.cols += count
+    elif direction == 'right':
+        Field.bulk_create_grid(warehouse.id, cols=count, rows=warehouse.rows, first_col=warehouse.cols + 1)
+        new_block = range(1, warehouse.rows + 1), range(warehouse.cols + 1, warehouse.cols + count + 1)
+        warehouse.cols += count
+    elif direction == 'bottom':
+        Field.bulk_create_grid(warehouse.id, cols=warehouse.cols, rows=count, first_row=warehouse.rows + 1)
+        new_block = range(warehouse.rows + 1, warehouse.rows + count + 1), range(1, warehouse.cols + 1)
+        warehouse.rows += count
+    else:
+        raise ValueError(direction)
+    return new_block
+
+
+def shrink(warehouse, direction, count):
+    """
+    Remove count columns from the left or right, or count rows from the
+    bottom, of a warehouse's field grid. Raises GridSizeError unless at
+    least one column (or row) is removed and one is left, and
+    FieldsOccupiedError if any of those fields hold vaults, both before
+    changing anything.
+    """
+    size = warehouse.rows if direction == 'bottom' else warehouse.cols
+    if count is None or not 0 < count < size:
+        raise GridSizeError(f'count must be between 1 and {size - 1}')
+
+    if direction == 'left':
+        delete_fields(warehouse.id, Field.col <= count)
+        shift_columns(warehouse.id, count + 1, warehouse.cols, -count)
+        warehouse.cols -= count
+    elif direction == 'right':
+        delete_fields(warehouse.id, Field.col > warehouse.cols - count)
+        warehouse.cols -= count
+    elif direction == 'bottom':
+        delete_fields(warehouse.id, Field.row > warehouse.rows - count)
+        warehouse.rows -= count
+    else:
+        raise ValueError(direction)
@@ -0,0 +1,65 @@
+from flask import g
+from app.models.db import db
+
+
+def _cache():
+    # rows resolved during this request, keyed by (model, id). Holding them
+    # here keeps them alive; the session's identity map only keeps weak refs.
+    if 'lookup_cache' not in g:
+        g.lookup_cache = {}
+        g.lookup_stats = {'hits': 0, 'misses': 0, 'queries': 0}
+    return g.lookup_cache
+
+
+def lookup_stats():
+    """
+    Counters for the current request: hits served from memory, misses that
+    had to be loaded, and the number of SELECTs issued to load them
+    """
+    _cache()
+    return dict(g.lookup_stats)
+
+
+def _from_session(model, id):
+    key = db.session.identity_key(model, id)
+    return db.session.identity_map.get(key)
+
+
+def prefetch(model, ids):
+    """
+    Load many rows of one model by primary key with a single IN query,
+    skipping any already loaded in this request, and return them as
+    a dict of id -> row (ids that don't exist are left out)
+    """
+    cache = _cache()
+    stats = g.lookup_stats
+    ids = {id for id in ids if id is not None}
+
+    missing = []
+    for id in ids:
+        if (model, id) in cache:
+            stats['hits'] += 1
+            continue
+        row = _from_session(model, id)
+        if row is not None:
+            stats['hits'] += 1
+            cache[(model, id)] = row
+        else:
+            stats['misses'] += 1
+            missing.append(id)
+
+    if missing:
+        stats['queries'] += 1
+        for row in model.query.filter(model.id.in_(missing)):
+            cache[(model, row.id)] = row
+
+    return {id: cache[(model, id)] for id in ids if (model, id) in cache}
+
+
+def get(model, id):
+    """
+    Row by primary key, loaded at most once per request
+    """
+    if id is None:
+        return None
+    return prefetch(model, [id]).get(id)
@@ -0,0 +1,150 @@
+from sqlalchemy import case, cast, func, literal, null, select
+from app.models import db, Field, Occupancy, Pallet, Rack, Shelf, Vault, Warehouse, WarehouseChange
+
+COLUMNS = ['warehouse_id', 'entity', 'entity_id', 'rack_id', 'used', 'capacity', 'full']
+
+
+def remove_rows(entity, warehouse_id, *criterion):
+    """
+    Drop a warehouse's summary rows of one entity, only those matching
+    criterion if given
+    """
+    table = Occupancy.__table__
+    db.session.execute(table.delete().where(table.c.warehouse_id == warehouse_id, table.c.entity == entity, *criterion))
+
+
+def replace_rows(entity, warehouse_id, rows, *criterion):
+    """
+    Swap summary rows for the rows selected by `rows`, in two set-based
+    statements
+    """
+    remove_rows(entity, warehouse_id, *criterion)
+    db.session.execute(Occupancy.__table__.insert().from_select(COLUMNS, rows))
+
+
+def refresh_fields(warehouse_id, field_ids=None):
+    """
+    Recount the vaults in a warehouse's fields, or only in field_ids.
+    Deleted fields lose their rows.
+    """
+    if field_ids is not None and not field_ids:
+        return
+    rows = select(
+        Field.warehouse_id,
+        literal(Occupancy.FIELD),
+        Field.id,
+        cast(null(), db.Integer),
+        func.count(Vault.id),
+        Warehouse.field_capacity,
+        func.coalesce(Field.full, False),
+    ).select_from(Field).join(Warehouse, Warehouse.id == Field.warehouse_id) \
+        .outerjoin(Vault, Vault.field_id == Field.id) \
+        .where(Field.warehouse_id == warehouse_id) \
+        .group_by(Field.id, Field.warehouse_id, Warehouse.field_capacity, Field.full)
+    if field_ids is None:
+        replace_rows(Occupancy.FIELD, warehouse_id, rows)
+    else:
+        replace_rows(Occupancy.FIELD, warehouse_id, rows.where(Field.id.in_(field_ids)), Occupancy.entity_id.in_(field_ids))
+
+
+def refresh_racks(warehouse_id, rack_ids=None):
+    """
+    Recount the pallet spots taken on the shelves of a warehouse's racks,
+    or only of rack_ids. Shelves of deleted racks lose their rows.
+    """
+    if rack_ids is not None and not rack_ids:
+        return
+    # a pallet without a spot count takes one spot
+    spots = case((Pallet.id.isnot(None), func.coalesce(Pallet.shelf_spots, 1)), else_=0)
+    rows = select(
+        Rack.warehouse_id,
+        literal(Occupancy.SHELF),
+        Shelf.id,
+        Shelf.rack_id,
+        func.coalesce(func.sum(spots), 0),
+        Shelf.capacity,
+        literal(False),
+    ).select_from(Shelf).join(Rack, Rack.id == Shelf.rack_id) \
+        .outerjoin(Pallet, Pallet.shelf_id == Shelf.id) \
+        .where(Rack.warehouse_id == warehouse_id) \
+        .group_by(Shelf.id, Shelf.rack_id, Rack.warehouse_id, Shelf.capacity)
+    if rack_ids is None:
+        replace_rows(Occupancy.SHELF, warehouse_id, rows)
+    else:
+        replace_rows(Occupancy.SHELF, warehouse_id, rows.where(Rack.id.in_(rack_ids)), Occupancy.rack_id.in_(rack_ids))
+
+
+def refresh(warehouse_id):
+    """
+    Rebuild a warehouse's whole summary
+    """
+    refresh_fields(warehouse_id)
+    refresh_racks(warehouse_id)
+
+
+def changed(warehouse_id, entries):
+    """
+    Bring the summary up to date with changes being recorded to the feed,
+    as (entity, id, action) entries. Called by changes.record in the same
+    transaction, so the summary commits or rolls back with the change.
+    """
+    def ids(entity, action):
+        return [entity_id for e, entity_id, a in entries if e == entity and a == action]
+
+    # pending inserts and deletes must reach the database to be counted
+    db.session.flush()
+
+    # deletions are recorded before the row goes, so only drop their rows
+    deleted_fields = ids(WarehouseChange.FIELD, WarehouseChange.DELETE)
+    if deleted_fields:
+        remove_rows(Occupancy.FIELD, warehouse_id, Occupancy.entity_id.in_(deleted_fields))
+    deleted_racks = ids(WarehouseChange.RACK, WarehouseChange.DELETE)
+    if deleted_racks:
+        remove_rows(Occupancy.SHELF, warehouse_id, Occupancy.rack_id.in_(deleted_racks))
+
+    if any(entity == WarehouseChange.WAREHOUSE for entity, entity_id, action in entries):
+        # new field capacity, resized or reset grid: every field may differ
+        refresh_fields(warehouse_id)
+    else:
+        refresh_fields(warehouse_id, ids(WarehouseChange.FIELD, WarehouseChange.UPSERT))
+
+    if ids(WarehouseChange.WAREHOUSE, WarehouseChange.RESET):
+        refresh_racks(warehouse_id)
+    else:
+        refresh_racks(warehouse_id, ids(WarehouseChange.RACK, WarehouseChange.UPSERT))
+
+
+def summary(warehouse_id):
+    """
+    Used and free capacity per field, shelf and rack of a warehouse, with
+    totals, read from the summary rows alone
+    """
+    rows = Occupancy.query.filter(Occupancy.warehouse_id == warehouse_id) \
+        .order_by(Occupancy.entity, Occupancy.rack_id, Occupancy.entity_id).all()
+
+    def totals(rows):
+        free = [row.free for row in rows]
+        return {
+            'used': sum(row.used for row in rows),
+            'capacity': sum(row.capacity or 0 for row in rows),
+            'free': sum(f for f in free if f is not None),
+        }
+
+    fields = [row for row in rows if row.entity == Occupancy.FIELD]
+    shelves = [row for row in rows if row.entity == Occupancy.SHELF]
+
+    racks = {}
+    for row in shelves:
+        racks.setdefault(row.rack_id, []).append(row)
+
+    return {
+        'warehouseId': warehouse_id,
+        'fields': {**totals(fields), 'fields': [row.to_dict() for row in fields]},
+        'racks': {
+            **totals(shelves),
+            'racks': [
+                {'id': rack_id, **totals(rack_shelves), 'shelves': [row.to_dict() for row in rack_shelves]}
+                for rack_id, rack_shelves in racks.items()
+            ],
+        },
+    }
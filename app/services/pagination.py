@@ -0,0 +1,91 @@
+from flask import current_app, request
+from sqlalchemy import func
+
+# largest page a client can ask for with ?limit=
+MAX_PAGE_SIZE = 500
+
+
+class ListArgs:
+    """
+    Paging, filter and sparse fieldset arguments of a list request.
+
+    limit turns paging on; pages are keyset on id, each one starting after
+    the id given in after= (the previous page's next cursor). fields= is a
+    comma separated list of keys to return, which also skips loading the
+    relationships behind the keys that are left out. Without these
+    arguments a list endpoint returns everything, as it always has.
+    """
+    def __init__(self, args):
+        self.args = args
+        self.limit = self.integer('limit')
+        self.after = self.integer('after')
+        if self.limit is not None and not 1 <= self.limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+        fields = args.get('fields')
+        self.fields = {field.strip() for field in fields.split(',') if field.strip()} if fields else None
+
+    def integer(self, name):
+        value = self.args.get(name)
+        if value is None or value == '':
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f'{name} must be an integer')
+
+    def wants(self, *keys):
+        """
+        Whether any of these keys will be in the response
+        """
+        return self.fields is None or any(key in self.fields for key in keys)
+
+
+def list_args():
+    """
+    ListArgs of the current request; raises ValueError on a bad argument
+    """
+    return ListArgs(request.args)
+
+
+def escape_like(text):
+    """
+    Text with LIKE wildcards escaped, for patterns using escape='\\'
+    """
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def name_prefix(column, prefix):
+    """
+    Case-insensitive "starts with" filter, matching how names are
+    compared elsewhere (upper(name))
+    """
+    return func.upper(column).like(escape_like(prefix.upper()) + '%', escape='\\')
+
+
+def paginate(query, id_column, args):
+    """
+    Rows of a query ordered by id, one page of them if args.limit is set.
+    Returns (rows, next cursor), the cursor None on the last page.
+    """
+    if args.after is not None:
+        query = query.filter(id_column > args.after)
+    query = query.order_by(id_column)
+    if args.limit is None:
+        return query.all(), None
+
+    rows = query.limit(args.limit + 1).all()
+    if len(rows) > args.limit:
+        rows = rows[:args.limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def with_cursor(response, next_cursor):
+    """
+    Response with the next page's cursor in X-Next-Cursor, so list bodies
+    keep their shape; no header on the last page
+    """
+    response = current_app.make_response(response)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
@@ -0,0 +1,79 @@
+from sqlalchemy import case, func, or_
+from app.models import db, Field, Occupancy, Vault
+
+# most fields a suggestion lists
+MAX_SUGGESTIONS = 20
+
+# field types each kind of vault may go in. A couchbox takes the top half
+# of a couchbox pair; the bottom half (couchbox-B) is covered by it and
+# never holds vaults of its own.
+FIELD_TYPES = {
+    'vault': ('vault',),
+    'couchbox': ('couchbox-T', 'couchbox'),
+}
+
+
+def customer_fields(warehouse_id, customer_ids):
+    """
+    (field id, row, col, vault count) of the fields of a warehouse holding
+    a customer's vaults, most vaults first. A customer can be several rows
+    whose names differ only in case, so it is given as a list of ids.
+    """
+    vaults = func.count(Vault.id)
+    return db.session.query(Field.id, Field.row, Field.col, vaults) \
+        .select_from(Vault).join(Field, Field.id == Vault.field_id) \
+        .filter(Vault.customer_id.in_(customer_ids), Field.warehouse_id == warehouse_id) \
+        .group_by(Field.id, Field.row, Field.col) \
+        .order_by(vaults.desc(), Field.id).all()
+
+
+def suggest(warehouse_id, type='vault', customer_ids=None, limit=5):
+    """
+    Fields of a warehouse that can take another vault of this type, best
+    first. Fields already holding the customer's vaults come first, then
+    the ones nearest to where most of them are, then the ones with the
+    most free spots. Free spots come from the occupancy summary, so no
+    vault rows are counted; fields marked full are skipped.
+    """
+    free = Occupancy.capacity - Occupancy.used
+    field_types = FIELD_TYPES[type]
+    type_filter = Field.type.in_(field_types)
+    if 'vault' in field_types:
+        type_filter = or_(type_filter, Field.type.is_(None))
+
+    query = db.session.query(Field, free, Occupancy.used) \
+        .select_from(Occupancy).join(Field, Field.id == Occupancy.entity_id) \
+        .filter(
+            Occupancy.warehouse_id == warehouse_id,
+            Occupancy.entity == Occupancy.FIELD,
+            Occupancy.full.is_(False),
+            # fields of a warehouse without a field capacity have no limit
+            or_(Occupancy.capacity.is_(None), free >= 1),
+            type_filter,
+        )
+
+    order = []
+    held = {}
+    if customer_ids:
+        rows = customer_fields(warehouse_id, customer_ids)
+        held = {field_id: count for field_id, row, col, count in rows}
+        if rows:
+            field_id, row, col, count = rows[0]
+            order.append(case((Field.id.in_(list(held)), 0), else_=1))
+            if row is not None and col is not None:
+                order.append(func.abs(Field.row - row) + func.abs(Field.col - col))
+    order += [free.desc(), Field.col, Field.row]
+
+    return [
+        {
+            'fieldId': field.id,
+            'name': field.name,
+            'type': field.type,
+            'row': field.row,
+            'col': field.col,
+            'used': used,
+            'free': free_spots,
+            'customerVaults': held.get(field.id, 0),
+        }
+        for field, free_spots, used in query.order_by(*order).limit(limit)
+    ]
@@ -0,0 +1,340 @@
+import heapq
+import threading
+from flask import current_app
+from sqlalchemy import and_, case, cast, false, func, literal, null, or_, select
+from app.models import Customer, Field, Order, Pallet, Rack, Shelf, Vault, Warehouse, db
+from app.services.pagination import escape_like
+from app.services.versions import table_versions
+
+# what type-ahead searches, and the name column matched for each
+SEARCHABLE = {
+    'customer': (Customer, Customer.name),
+    'order': (Order, Order.name),
+    'vault': (Vault, Vault.name),
+    'pallet': (Pallet, Pallet.pallet_number),
+}
+
+
+def rank(name, text):
+    # names starting with the text first, then shorter (closer) ones
+    return (not name.lower().startswith(text), len(name), name)
+
+
+def scope(type, warehouse_ids, staged_company_id=None):
+    """
+    Criterion for the rows of a type with a location in these warehouses:
+    vaults in their fields, pallets on their racks, customers and orders
+    with either. Vaults staged by staged_company_id count too, if given.
+    """
+    in_fields = Vault.field_id.in_(select(Field.id).where(Field.warehouse_id.in_(warehouse_ids)))
+    on_racks = Pallet.shelf_id.in_(
+        select(Shelf.id).join(Rack, Rack.id == Shelf.rack_id).where(Rack.warehouse_id.in_(warehouse_ids))
+    )
+    if type == 'customer':
+        return or_(Customer.vaults.any(in_fields), Customer.pallets.any(on_racks))
+    if type == 'order':
+        return Order.order_vaults.any(in_fields)
+    if type == 'vault':
+        staged = false() if staged_company_id is None else and_(Vault.field_id.is_(None), Vault.company_id == staged_company_id)
+        return or_(in_fields, staged)
+    return on_racks
+
+
+class DatabaseSearch:
+    """
+    Substring matching in the database. On Postgres the ILIKE is served by
+    the pg_trgm GIN indexes on each name column.
+    """
+    def match(self, type, text, limit, criterion=None):
+        model, column = SEARCHABLE[type]
+        escaped = escape_like(text)
+        query = db.session.query(model.id, column).filter(
+            column.ilike(f'%{escaped}%', escape='\\')
+        )
+        if criterion is not None:
+            query = query.filter(criterion)
+        return query.order_by(
+            case((column.ilike(f'{escaped}%', escape='\\'), 0), else_=1),
+            func.length(column),
+            column,
+        ).limit(limit).all()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Lowercased names by id and the ids of the names containing each
+    trigram, so a substring search only checks names sharing all of the
+    text's trigrams.
+    """
+    def __init__(self, rows=()):
+        self.names = {}
+        self.lowered = {}
+        self.grams = {}
+        for id, name in rows:
+            if name:
+                self.add(id, name)
+
+    def add(self, id, name):
+        self.names[id] = name
+        self.lowered[id] = lowered = name.lower()
+        for gram in trigrams(lowered):
+            self.grams.setdefault(gram, set()).add(id)
+
+    def remove(self, id):
+        if id not in self.names:
+            return
+        del self.names[id]
+        for gram in trigrams(self.lowered.pop(id)):
+            ids = self.grams[gram]
+            ids.discard(id)
+            if not ids:
+                del self.grams[gram]
+
+    def update(self, rows):
+        """
+        Bring the index in line with a table's current (id, name) rows,
+        re-indexing only the names added, renamed or removed since
+        """
+        seen = set()
+        for id, name in rows:
+            if not name:
+                continue
+            seen.add(id)
+            if self.names.get(id) != name:
+                self.remove(id)
+                self.add(id, name)
+        for id in self.names.keys() - seen:
+            self.remove(id)
+
+    def match(self, text, limit):
+        grams = sorted((self.grams.get(gram, set()) for gram in trigrams(text)), key=len)
+        if grams:
+            candidates = grams[0]
+            for ids in grams[1:]:
+                if not candidates:
+                    break
+                candidates = candidates & ids
+        else:
+            # shorter than a trigram, check every name
+            candidates = self.names.keys()
+        hits = [(id, self.names[id]) for id in candidates if text in self.lowered[id]]
+        return heapq.nsmallest(limit, hits, key=lambda hit: rank(hit[1], text))
+
+
+# ids checked against a search's scope per query
+SCOPE_BATCH = 500
+
+
+class MemorySearch:
+    """
+    In-process trigram indexes for databases without pg_trgm (SQLite in
+    development). When a table's version moves, the first search after
+    re-reads its names and re-indexes only the ones that changed. Indexes
+    are updated in place, so matching holds the same lock.
+    """
+    def __init__(self):
+        self.indexes = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, type):
+        model, column = SEARCHABLE[type]
+        version = table_versions(model.__tablename__)[0]
+        if self.versions.get(type) != version:
+            rows = db.session.query(model.id, column).filter(column.isnot(None)).all()
+            self.indexes.setdefault(type, TrigramIndex()).update(rows)
+            self.versions[type] = version
+        return self.indexes[type]
+
+    def match(self, type, text, limit, criterion=None):
+        # only the best hits are checked against the criterion in the
+        # database, four times as many again while too few of them pass,
+        # rather than loading every id in scope for each keystroke
+        model, column = SEARCHABLE[type]
+        wanted = limit
+        while True:
+            with self.lock:
+                hits = self.refresh(type).match(text.lower(), wanted)
+            if criterion is None:
+                return hits
+            passing = set()
+            for start in range(0, len(hits), SCOPE_BATCH):
+                ids = [id for id, name in hits[start:start + SCOPE_BATCH]]
+                passing.update(id for (id,) in db.session.query(model.id).filter(model.id.in_(ids), criterion))
+            found = [hit for hit in hits if hit[0] in passing]
+            if len(found) >= limit or len(hits) < wanted:
+                return found[:limit]
+            wanted *= 4
+
+
+BACKENDS = {
+    'database': DatabaseSearch,
+    'memory': MemorySearch,
+}
+
+_search = None
+_search_lock = threading.Lock()
+
+
+def get_search():
+    """
+    Search backend for this process, picked by the SEARCH_BACKEND setting
+    or, if that is empty, by the database: 'database' on Postgres, else
+    'memory'
+    """
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                backend = current_app.config['SEARCH_BACKEND']
+                if not backend:
+                    backend = 'database' if db.engine.dialect.name == 'postgresql' else 'memory'
+                _search = BACKENDS[backend]()
+    return _search
+
+
+def field_locations(owner_column, criterion):
+    """
+    Distinct fields holding the vaults matching criterion
+    """
+    rows = db.session.query(
+        owner_column, Field.warehouse_id, Field.id, Field.name,
+    ).select_from(Vault).join(Field, Field.id == Vault.field_id).filter(criterion).distinct()
+    return [(owner, {'warehouseId': warehouse_id, 'fieldId': field_id, 'fieldName': name}) for owner, warehouse_id, field_id, name in rows]
+
+
+def rack_locations(owner_column, criterion):
+    """
+    Rack, shelf and slot of every pallet matching criterion
+    """
+    rows = db.session.query(
+        owner_column, Rack.warehouse_id, Rack.id, Rack.name, Shelf.id, Pallet.id, Pallet.slot_index,
+    ).select_from(Pallet).join(Shelf, Shelf.id == Pallet.shelf_id).join(Rack, Rack.id == Shelf.rack_id).filter(criterion)
+    return [
+        (owner, {'warehouseId': warehouse_id, 'rackId': rack_id, 'rackName': rack_name, 'shelfId': shelf_id, 'palletId': pallet_id, 'slotIndex': slot_index})
+        for owner, warehouse_id, rack_id, rack_name, shelf_id, pallet_id, slot_index in rows
+    ]
+
+
+def locations(type, ids, company_id=None):
+    """
+    Where the matched rows are, by id: fields for vaults, racks and
+    shelves for pallets. Staged vaults, only the company's if given, have
+    a location with no warehouse.
+    """
+    found = []
+    if type == 'customer':
+        found += field_locations(Vault.customer_id, Vault.customer_id.in_(ids))
+        found += rack_locations(Pallet.customer_id, Pallet.customer_id.in_(ids))
+    elif type == 'order':
+        found += field_locations(Vault.order_id, Vault.order_id.in_(ids))
+    elif type == 'vault':
+        found += field_locations(Vault.id, Vault.id.in_(ids))
+        staged = db.session.query(Vault.id).filter(Vault.id.in_(ids), Vault.field_id.is_(None))
+        if company_id is not None:
+            staged = staged.filter(Vault.company_id == company_id)
+        found += [(id, {'warehouseId': None, 'staged': True}) for (id,) in staged]
+    elif type == 'pallet':
+        found += rack_locations(Pallet.id, Pallet.id.in_(ids))
+
+    by_id = {}
+    for id, location in found:
+        by_id.setdefault(id, []).append(location)
+    return by_id
+
+
+def search(text, types=None, company_id=None, warehouse_id=None, limit=20):
+    """
+    Type-ahead search of names containing text, ranked with names that
+    start with it first. Each hit lists its locations, only those in the
+    company's warehouses (or the one warehouse) if given; hits with no
+    location there are left out.
+    """
+    if warehouse_id is not None:
+        warehouse_ids = {warehouse_id}
+    elif company_id is not None:
+        warehouse_ids = {id for (id,) in db.session.query(Warehouse.id).filter(Warehouse.company_id == company_id)}
+    else:
+        warehouse_ids = None
+
+    backend = get_search()
+    # staged vaults have no warehouse, they only count for a company-wide search
+    staged_company_id = company_id if warehouse_id is None else None
+    hits = []
+    for type in types or SEARCHABLE:
+        # scoped in the match itself, so other companies' names can't crowd
+        # out the caller's
+        criterion = None if warehouse_ids is None else scope(type, list(warehouse_ids), staged_company_id)
+        matches = backend.match(type, text, limit, criterion)
+        if not matches:
+            continue
+        by_id = locations(type, [id for id, name in matches], company_id)
+        for id, name in matches:
+            found = by_id.get(id, [])
+            if warehouse_ids is not None:
+                found = [
+                    location for location in found
+                    if location['warehouseId'] in warehouse_ids or (location.get('staged') and warehouse_id is None)
+                ]
+                if not found:
+                    continue
+            hits.append({'type': type, 'id': id, 'name': name, 'locations': found})
+
+    lowered = text.lower()
+    return heapq.nsmallest(limit, hits, key=lambda hit: rank(hit['name'], lowered))
+
+
+def location_counts(type, id, company_id=None):
+    """
+    How many of a customer's or order's vaults are in each field, and of
+    a customer's pallets on each shelf slot, grouped by warehouse and
+    only in the company's warehouses if given. One aggregate query over
+    the vault (and pallet) owner indexes; nothing is loaded or serialized
+    per vault.
+    """
+    owners = {
+        'customer': (Vault.customer_id, Pallet.customer_id),
+        'order': (Vault.order_id, None),
+    }
+    vault_owner, pallet_owner = owners[type]
+
+    query = db.session.query(
+        literal('field').label('kind'),
+        Field.warehouse_id.label('warehouse_id'),
+        Field.id.label('place_id'),
+        Field.name.label('place_name'),
+        cast(null(), db.Integer).label('shelf_id'),
+        cast(null(), db.Integer).label('slot_index'),
+        func.count(Vault.id).label('hits'),
+    ).select_from(Vault).join(Field, Field.id == Vault.field_id).filter(vault_owner == id)
+    if company_id is not None:
+        query = query.join(Warehouse, Warehouse.id == Field.warehouse_id).filter(Warehouse.company_id == company_id)
+    query = query.group_by(Field.warehouse_id, Field.id, Field.name)
+
+    if pallet_owner is not None:
+        pallets = db.session.query(
+            literal('shelf').label('kind'),
+            Rack.warehouse_id.label('warehouse_id'),
+            Rack.id.label('place_id'),
+            Rack.name.label('place_name'),
+            Shelf.id.label('shelf_id'),
+            Pallet.slot_index.label('slot_index'),
+            func.count(Pallet.id).label('hits'),
+        ).select_from(Pallet).join(Shelf, Shelf.id == Pallet.shelf_id).join(Rack, Rack.id == Shelf.rack_id).filter(pallet_owner == id)
+        if company_id is not None:
+            pallets = pallets.join(Warehouse, Warehouse.id == Rack.warehouse_id).filter(Warehouse.company_id == company_id)
+        query = query.union_all(pallets.group_by(Rack.warehouse_id, Rack.id, Rack.name, Shelf.id, Pallet.slot_index))
+
+    warehouses = {}
+    for kind, warehouse_id, place_id, place_name, shelf_id, slot_index, count in sorted(query.all(), key=lambda row: (row[1], row[0], row[2], row[4] or 0, row[5] or 0)):
+        warehouse = warehouses.setdefault(warehouse_id, {'warehouseId': warehouse_id, 'count': 0, 'fields': [], 'shelves': []})
+        warehouse['count'] += count
+        if kind == 'field':
+            warehouse['fields'].append({'fieldId': place_id, 'fieldName': place_name, 'count': count})
+        else:
+            warehouse['shelves'].append({'rackId': place_id, 'rackName': place_name, 'shelfId': shelf_id, 'slotIndex': slot_index, 'count': count})
+    return list(warehouses.values())
@@ -0,0 +1,178 @@
+from app.models import db, Occupancy, Pallet, Shelf
+
+# candidate shelves checked per query when auto-placing
+CANDIDATE_BATCH = 20
+
+FIRST_FIT = 'first'
+BEST_FIT = 'best'
+STRATEGIES = (FIRST_FIT, BEST_FIT)
+
+
+class ShelfNotFoundError(Exception):
+    """Raised when a pallet is placed on a shelf that does not exist."""
+
+
+class SlotConflictError(Exception):
+    """Raised when a pallet would overlap another one or run off the shelf."""
+
+
+class NoRoomError(Exception):
+    """Raised when no shelf has enough free spots in a row for a pallet."""
+
+
+class ShelfSlots:
+    """
+    The spots of one shelf as a bitmap, bit i set when spot i is taken.
+    A pallet of n spots at slot s takes bits s to s + n - 1. Pallets saved
+    without a slot hold spots too, just not particular ones; they are
+    counted in unplaced and leave that much less room, as the occupancy
+    summary counts them.
+    """
+    def __init__(self, capacity, bitmap=0, unplaced=0):
+        self.capacity = capacity
+        self.bitmap = bitmap
+        self.unplaced = unplaced
+
+    @classmethod
+    def from_pallets(cls, capacity, pallets):
+        """
+        Bitmap of (slot_index, shelf_spots) pairs
+        """
+        slots = cls(capacity)
+        for slot_index, spots in pallets:
+            if slot_index is None:
+                slots.unplaced += spots or 1
+            else:
+                slots.bitmap |= cls.mask(slot_index, spots or 1)
+        return slots
+
+    @staticmethod
+    def mask(start, spots):
+        return ((1 << spots) - 1) << start
+
+    def free_spots(self):
+        return self.capacity - bin(self.bitmap).count('1') - self.unplaced
+
+    def fits(self, start, spots):
+        return (
+            0 <= start and start + spots <= self.capacity
+            and not self.bitmap & self.mask(start, spots)
+            and spots <= self.free_spots()
+        )
+
+    def free_runs(self):
+        """
+        (start, length) of every run of free spots, left to right
+        """
+        start = None
+        for spot in range(self.capacity + 1):
+            taken = spot == self.capacity or self.bitmap >> spot & 1
+            if taken and start is not None:
+                yield start, spot - start
+                start = None
+            elif not taken and start is None:
+                start = spot
+
+    def find(self, spots, strategy=FIRST_FIT):
+        """
+        Slot for a pallet of this many spots: the leftmost run that holds
+        it (first fit) or the shortest one (best fit). None if none does.
+        """
+        if spots > self.free_spots():
+            return None
+        runs = [(start, length) for start, length in self.free_runs() if length >= spots]
+        if not runs:
+            return None
+        if strategy == BEST_FIT:
+            return min(runs, key=lambda run: (run[1], run[0]))[0]
+        return runs[0][0]
+
+    def occupy(self, start, spots):
+        if not self.fits(start, spots):
+            raise SlotConflictError(start)
+        self.bitmap |= self.mask(start, spots)
+
+
+def shelf_slots(shelf_ids, exclude_pallet_id=None):
+    """
+    ShelfSlots by shelf id for several shelves, from one pallet query
+    """
+    shelves = db.session.query(Shelf.id, Shelf.capacity).filter(Shelf.id.in_(shelf_ids)).all()
+    pallets = db.session.query(Pallet.shelf_id, Pallet.slot_index, Pallet.shelf_spots).filter(Pallet.shelf_id.in_(shelf_ids))
+    if exclude_pallet_id is not None:
+        pallets = pallets.filter(Pallet.id != exclude_pallet_id)
+
+    by_shelf = {}
+    for shelf_id, slot_index, spots in pallets:
+        by_shelf.setdefault(shelf_id, []).append((slot_index, spots))
+    return {shelf_id: ShelfSlots.from_pallets(capacity, by_shelf.get(shelf_id, [])) for shelf_id, capacity in shelves}
+
+
+def lock_shelf(shelf_id):
+    """
+    Load a shelf holding a row lock (SELECT ... FOR UPDATE) until the
+    transaction ends, so placements on it are serialized
+    """
+    shelf = Shelf.query.filter(Shelf.id == shelf_id).with_for_update().first()
+    if shelf is None:
+        raise ShelfNotFoundError(shelf_id)
+    return shelf
+
+
+def reserve(shelf_id, spots, slot_index=None, strategy=FIRST_FIT, exclude_pallet_id=None):
+    """
+    Pick and check the slot for a pallet on a shelf in the current
+    transaction: slot_index if given, else one found by strategy. The
+    shelf stays locked until the caller commits, so two pallets can't be
+    given overlapping spots. exclude_pallet_id is a pallet being resized
+    in place. Returns (shelf, slot index).
+    """
+    shelf = lock_shelf(shelf_id)
+    slots = shelf_slots([shelf.id], exclude_pallet_id)[shelf.id]
+
+    if slot_index is None:
+        slot_index = slots.find(spots, strategy)
+        if slot_index is None:
+            raise NoRoomError(shelf_id)
+    elif not slots.fits(slot_index, spots):
+        raise SlotConflictError(slot_index)
+    return shelf, slot_index
+
+
+def auto_place(warehouse_id, spots, rack_id=None, strategy=FIRST_FIT):
+    """
+    Choose a shelf and slot for a pallet anywhere in a warehouse, or on
+    one rack, and reserve it as reserve() does. Candidates come from the
+    occupancy summary, indexed on free spots, so shelves without enough
+    room are never read; the first candidate with a long enough free run
+    wins. First fit goes through shelves in rack order, best fit tries the
+    fullest shelves that still have room first.
+    """
+    free = Occupancy.capacity - Occupancy.used
+    candidates = db.session.query(Occupancy.entity_id).filter(
+        Occupancy.warehouse_id == warehouse_id,
+        Occupancy.entity == Occupancy.SHELF,
+        free >= spots,
+    )
+    if rack_id is not None:
+        candidates = candidates.filter(Occupancy.rack_id == rack_id)
+    if strategy == BEST_FIT:
+        candidates = candidates.order_by(free, Occupancy.rack_id, Occupancy.entity_id)
+    else:
+        candidates = candidates.order_by(Occupancy.rack_id, Occupancy.entity_id)
+
+    offset = 0
+    while True:
+        shelf_ids = [shelf_id for (shelf_id,) in candidates.offset(offset).limit(CANDIDATE_BATCH)]
+        if not shelf_ids:
+            raise NoRoomError(warehouse_id)
+        offset += len(shelf_ids)
+
+        slots = shelf_slots(shelf_ids)
+        for shelf_id in shelf_ids:
+            if shelf_id in slots and slots[shelf_id].find(spots, strategy) is not None:
+                try:
+                    # check again under the lock, another placement may have won
+                    return reserve(shelf_id, spots, strategy=strategy)
+                except (NoRoomError, ShelfNotFoundError):
+                    continue
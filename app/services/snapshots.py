@@ -0,0 +1,191 @@
+import json
+import threading
+from collections import OrderedDict
+from flask import current_app
+from app.models import Warehouse, db
+from app.services.versions import make_etag, table_versions
+
+# besides the warehouse's own version, a snapshot shows company, customer
+# and order names and attachments, which change without bumping the warehouse
+SNAPSHOT_TABLES = ('companies', 'customers', 'orders', 'attachments')
+
+
+def snapshot_key(warehouse_id, version, stamps):
+    """
+    Cache key and ETag of a warehouse snapshot. Every write that shows up
+    in the snapshot moves one of its parts, so a key never goes stale and
+    entries for old versions simply age out.
+    """
+    return make_etag('warehouse', warehouse_id, version, *stamps)
+
+
+class LRUCache:
+    """
+    Bounded in-process cache that evicts the least recently used entry.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisCache:
+    """
+    Snapshots shared by every worker process, stored as JSON under
+    snapshot:<key> and expired after SNAPSHOT_CACHE_TTL seconds.
+    """
+    def __init__(self):
+        import redis
+
+        self.redis = redis.Redis.from_url(current_app.config['REDIS_URL'])
+        self.ttl = current_app.config['SNAPSHOT_CACHE_TTL']
+
+    def get_many(self, keys):
+        values = self.redis.mget([f'snapshot:{key}' for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set(self, key, value):
+        self.redis.set(f'snapshot:{key}', current_app.json.dumps(value), ex=self.ttl)
+
+
+SHARED_BACKENDS = {
+    'redis': RedisCache,
+}
+
+
+class SnapshotCache:
+    """
+    Serialized warehouses by snapshot key: an LRU in each process, in
+    front of an optional shared cache. Counts hits and misses.
+    """
+    def __init__(self, size, shared=None):
+        self.local = LRUCache(size)
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+        local_hits = len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            try:
+                shared = self.shared.get_many(missing)
+            except Exception as e:
+                # the database is always there to fall back on
+                print(f"Error reading shared snapshot cache: {e}")
+                shared = {}
+            for key, value in shared.items():
+                self.local.set(key, value)
+            found.update(shared)
+
+        with self.lock:
+            self.hits += local_hits
+            self.shared_hits += len(found) - local_hits
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f"Error writing shared snapshot cache: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self.local),
+                'maxSize': self.local.size,
+                'shared': self.shared is not None,
+                'hits': self.hits,
+                'sharedHits': self.shared_hits,
+                'misses': self.misses,
+                'hitRate': (self.hits + self.shared_hits) / lookups if lookups else None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Snapshot cache for this process, sized by SNAPSHOT_CACHE_SIZE and backed
+    by the SNAPSHOT_CACHE_SHARED backend if one is set, created on first use
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = current_app.config['SNAPSHOT_CACHE_SHARED']
+                shared = SHARED_BACKENDS[backend]() if backend else None
+                _cache = SnapshotCache(current_app.config['SNAPSHOT_CACHE_SIZE'], shared)
+    return _cache
+
+
+def snapshots(keys_by_id):
+    """
+    Snapshots for {warehouse id: snapshot key}, in the order given. Cached
+    ones are reused as they are; the rest are loaded together and cached.
+    A warehouse deleted in the meantime is left out.
+
+    Keys must be read before the data: a snapshot loaded afterwards is then
+    at least as new as its key says, never older.
+    """
+    cache = get_cache()
+    found = cache.get_many(list(keys_by_id.values()))
+
+    missing = [warehouse_id for warehouse_id, key in keys_by_id.items() if key not in found]
+    if missing:
+        for snapshot in Warehouse.snapshots(Warehouse.id.in_(missing)):
+            key = keys_by_id[snapshot['id']]
+            cache.set(key, snapshot)
+            found[key] = snapshot
+
+    return [found[key] for key in keys_by_id.values() if key in found]
+
+
+def warehouse_snapshot(warehouse_id, key):
+    """
+    One warehouse's snapshot, or None if it no longer exists
+    """
+    found = snapshots({warehouse_id: key})
+    return found[0] if found else None
+
+
+def company_snapshots(company_id):
+    """
+    Snapshots of every warehouse of a company, ordered by id
+    """
+    versions = db.session.query(Warehouse.id, Warehouse.version).filter(Warehouse.company_id == company_id).order_by(Warehouse.id).all()
+    if not versions:
+        return []
+    stamps = table_versions(*SNAPSHOT_TABLES)
+    return snapshots({warehouse_id: snapshot_key(warehouse_id, version, stamps) for warehouse_id, version in versions})
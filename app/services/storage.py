@@ -0,0 +1,210 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from flask import current_app
+
+
+class StorageBackend:
+    """
+    Where attachment files live. upload() returns the URL stored on the
+    Attachment, delete() removes a file given that URL and its unique name.
+    Backends are created once per process and shared by all requests and
+    upload workers, so they must be thread safe. Their client libraries
+    are imported when a backend is first created, not at app import.
+    """
+    def upload(self, stream, name, mimetype):
+        raise NotImplementedError
+
+    def delete(self, file_url, name):
+        raise NotImplementedError
+
+
+class DriveStorage(StorageBackend):
+    """
+    Stores attachment files in the shared Google Drive folder.
+    """
+    scopes = ['https://www.googleapis.com/auth/drive.file']
+    retry_attempts = 3
+    # resumable upload chunk size, must be a multiple of 256 KB
+    chunk_size = 8 * 1024 * 1024
+
+    def __init__(self):
+        from google.oauth2 import service_account
+
+        private_key = os.getenv("GOOGLE_CLOUD_PRIVATE_KEY")
+        if private_key is None:
+            raise RuntimeError("GOOGLE_CLOUD_PRIVATE_KEY environment variable is not set")
+        service_account_info = {
+            "type": os.getenv("GOOGLE_CLOUD_TYPE"),
+            "project_id": os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
+            "private_key_id": os.getenv("GOOGLE_CLOUD_PRIVATE_KEY_ID"),
+            "private_key": private_key.replace("\\n", "\n"),
+            "client_email": os.getenv("GOOGLE_CLOUD_CLIENT_EMAIL"),
+            "client_id": os.getenv("GOOGLE_CLOUD_CLIENT_ID"),
+            "auth_uri": os.getenv("GOOGLE_CLOUD_AUTH_URI"),
+            "token_uri": os.getenv("GOOGLE_CLOUD_TOKEN_URI"),
+            "auth_provider_x509_cert_url": os.getenv("GOOGLE_CLOUD_AUTH_PROVIDER_X509_CERT_URL"),
+            "client_x509_cert_url": os.getenv("GOOGLE_CLOUD_CLIENT_X509_CERT_URL")
+        }
+        self.credentials = service_account.Credentials.from_service_account_info(service_account_info, scopes=self.scopes)
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        # the Drive client's http transport is not thread safe, so each
+        # thread builds one on first use and keeps reusing it
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            from googleapiclient.discovery import build
+
+            # use the discovery document bundled with the client library
+            # instead of fetching it over the network
+            service = self._local.service = build(
+                'drive', 'v3',
+                credentials=self.credentials,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+        return service
+
+    def upload(self, stream, name, mimetype):
+        """
+        Upload a file object in resumable chunks and return its Drive view URL.
+        A failed chunk is retried from where Drive left off, not from the start.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+
+        file_metadata = {
+            'name': name,
+            'parents': [os.getenv("GOOGLE_DRIVE_FOLDER_ID")]
+        }
+        media = MediaIoBaseUpload(stream, mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+        request = self.service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id'
+        )
+
+        file = None
+        failures = 0
+        while file is None:
+            try:
+                _, file = request.next_chunk()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"Upload chunk attempt {failures} failed: {e}")
+                if failures == self.retry_attempts:
+                    raise e
+
+        return f"https://drive.google.com/file/d/{file['id']}/view"
+
+    def delete(self, file_url, name):
+        # https://drive.google.com/file/d/<file id>/view
+        file_id = file_url.rstrip('/').split('/')[-2]
+        self.service.files().delete(fileId=file_id).execute()
+
+
+class S3Storage(StorageBackend):
+    """
+    Stores attachment files under attachments/ in the configured S3 bucket.
+    """
+    def __init__(self):
+        import boto3
+
+        self.bucket = os.getenv('AWS_BUCKET_NAME')
+        # boto3 clients are thread safe and pool their connections
+        self.client = boto3.client(
+            's3',
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        )
+
+    def upload(self, stream, name, mimetype):
+        key = f'attachments/{name}'
+        self.client.upload_fileobj(stream, self.bucket, key, ExtraArgs={'ContentType': mimetype})
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def delete(self, file_url, name):
+        self.client.delete_object(Bucket=self.bucket, Key=f'attachments/{name}')
+
+
+class LocalStorage(StorageBackend):
+    """
+    Content-addressed storage on the local disk: each file is kept once
+    under the sha256 of its contents and served by the attachments blueprint.
+    """
+    copy_buffer_size = 1024 * 1024
+
+    def __init__(self):
+        self.root = os.path.abspath(current_app.config['ATTACHMENT_STORAGE_PATH'])
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def upload(self, stream, name, mimetype):
+        digest = hashlib.sha256()
+        # hash while copying, then move the file into place under its digest
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as tmp:
+            for chunk in iter(lambda: stream.read(self.copy_buffer_size), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        digest = digest.hexdigest()
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(tmp.name)
+        else:
+            shutil.move(tmp.name, path)
+
+        return f"/api/attachments/files/{digest}"
+
+    def delete(self, file_url, name):
+        path = self.path_for(file_url.rstrip('/').split('/')[-1])
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class MemoryStorage(StorageBackend):
+    """
+    In-process stand-in for Drive, used by tests and local development.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def upload(self, stream, name, mimetype):
+        file_id = uuid.uuid4().hex
+        self.files[file_id] = {'name': name, 'mimetype': mimetype, 'data': stream.read()}
+        return f"memory://{file_id}"
+
+    def delete(self, file_url, name):
+        self.files.pop(file_url[len("memory://"):], None)
+
+
+BACKENDS = {
+    'drive': DriveStorage,
+    's3': S3Storage,
+    'local': LocalStorage,
+    'memory': MemoryStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    Attachment storage for this process, picked by the ATTACHMENT_STORAGE
+    setting and created on first use
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = BACKENDS[current_app.config['ATTACHMENT_STORAGE']]()
+    return _storage
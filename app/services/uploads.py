@@ -0,0 +1,78 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.models import db, Attachment
+from .storage import get_storage
+from . import changes
+
+# Drive uploads are network bound, a few threads per worker keep them
+# off the request threads without flooding the API
+UPLOAD_WORKERS = int(os.getenv('ATTACHMENT_UPLOAD_WORKERS', 4))
+
+executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='attachment-upload')
+
+
+class PendingUpload:
+    """
+    An attachment whose file has been received but not yet stored.
+    Call start() once the pending Attachment row has been committed.
+    """
+    def __init__(self, attachment, stream, mimetype):
+        self.attachment = attachment
+        self.stream = stream
+        self.mimetype = mimetype
+
+    def start(self):
+        app = current_app._get_current_object()
+        return executor.submit(_run_upload, app, self.attachment.id, self.stream, self.attachment.unique_name, self.mimetype)
+
+
+def queue_attachment(vault, file_storage, unique_name):
+    """
+    Take over an uploaded file's stream and add a pending Attachment for it
+    to the session. The caller commits, then calls start() on the returned
+    PendingUpload to hand the stream to the upload workers.
+
+    The stream is the one werkzeug parsed the request into: in memory for
+    files under 500 KB, an unlinked temporary file for larger ones. That
+    spool is the one copy made; the upload worker reads it in chunks, so
+    memory stays flat however large the file. The file can't go straight
+    from the request to storage, since the upload finishes after the
+    request has returned and resumable uploads need to seek.
+    """
+    stream = file_storage.stream
+    # the request closes its files on teardown, leave it an empty one
+    file_storage.stream = io.BytesIO()
+
+    attachment = Attachment(
+        vault=vault,
+        file_name=file_storage.filename,
+        unique_name=unique_name,
+        file_url='',
+        status=Attachment.PENDING,
+    )
+    db.session.add(attachment)
+    return PendingUpload(attachment, stream, file_storage.content_type)
+
+
+def _run_upload(app, attachment_id, stream, name, mimetype):
+    with app.app_context():
+        try:
+            stream.seek(0)
+            file_url = get_storage().upload(stream, name, mimetype)
+            status = Attachment.READY
+        except Exception as e:
+            print(f"Error uploading attachment {attachment_id}: {e}")
+            file_url = ''
+            status = Attachment.FAILED
+        finally:
+            stream.close()
+
+        attachment = Attachment.query.get(attachment_id)
+        if attachment:
+            attachment.file_url = file_url
+            attachment.status = status
+            # let clients following the warehouse pick up the new status
+            changes.fields_changed(attachment.vault.field if attachment.vault else None)
+            db.session.commit()
@@ -0,0 +1,88 @@
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import TableVersion, db
+
+# tables whose writes are counted; list endpoints build their ETags from these
+TRACKED_TABLES = {'companies', 'customers', 'orders', 'vaults', 'attachments', 'pallets'}
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changed_tables(session, flush_context):
+    changed = {
+        obj.__tablename__
+        for obj in (*session.new, *session.deleted, *(obj for obj in session.dirty if session.is_modified(obj)))
+        if getattr(obj, '__tablename__', None) in TRACKED_TABLES
+    }
+    if changed:
+        session.info.setdefault('changed_tables', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_table_versions(session):
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    try:
+        bump_table_versions(changed)
+    except Exception as e:
+        # the ETags of these tables lag until their next write
+        print(f"Error bumping table versions: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
+
+
+def bump_table_versions(names):
+    """
+    Add one to the version of each named table, after the write has
+    committed and in a transaction of its own. The shared version rows
+    are then only locked for a moment rather than for the whole writing
+    transaction, and bumping them one at a time in name order means two
+    bumps can't deadlock. A reader that sees the new version always sees
+    the committed write behind it.
+    """
+    table = TableVersion.__table__
+    with db.engine.begin() as connection:
+        for name in sorted(names):
+            bumped = connection.execute(
+                table.update().where(table.c.name == name).values(version=table.c.version + 1)
+            ).rowcount
+            if not bumped:
+                # rows are created by the migration, this only covers fresh databases
+                connection.execute(table.insert(), {'name': name, 'version': 1})
+
+
+def table_versions(*names):
+    """
+    Current version of each named table, 0 for tables never written to
+    """
+    versions = dict(TableVersion.query.with_entities(TableVersion.name, TableVersion.version).filter(TableVersion.name.in_(names)))
+    return [versions.get(name, 0) for name in names]
+
+
+def make_etag(*parts):
+    return '-'.join(str(part) for part in parts)
+
+
+def not_modified(etag):
+    """
+    A 304 response if the client already holds this version, else None.
+    Check it before loading or serializing anything.
+    """
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        return tag(response, etag)
+    return None
+
+
+def tag(response, etag):
+    """
+    Set a strong ETag on a response and ask clients to revalidate it on every use
+    """
+    response = current_app.make_response(response)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -6,7 +6,7 @@ import { setCurrentRack } from "../store/rack";
 import LoadingSpinner from "../components/LoadingSpinner";
 import FieldGrid from "../components/Warehouse/FieldGrid";
 import FieldInfo from "../components/Warehouse/FieldInfo";
-import { getCurrentFieldThunk } from "../store/warehouse";
+import { getCurrentFieldThunk, subscribeToWarehouseThunk } from "../store/warehouse";
 import { fetchRacksThunk, addPalletThunk } from "../store/rack";
 import RackView from "../components/Warehouse/RackView";
 import PalletForm from "../components/Warehouse/RackView/PalletForm";
@@ -75,6 +75,13 @@ function WarehousePage() {
     };
   }, [dispatch, warehouseName, warehouses]);
 
+  const warehouseId = warehouse?.id;
+  useEffect(() => {
+    // live updates from other operators working this warehouse
+    if (!warehouseId) return;
+    return dispatch(subscribeToWarehouseThunk(warehouseId));
+  }, [dispatch, warehouseId]);
+
   useEffect(() => {
     // Only run if warehouse is defined and has an id
     if (warehouse && warehouse.id) {
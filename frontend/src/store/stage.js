@@ -34,19 +34,28 @@ export const setStageError = (error) => ({
 });
 
 
+// staged vaults fetched per request; the server pages them by id
+const STAGE_PAGE_SIZE = 200;
+
 export const getAllStagedVaultsThunk = (companyId) => async (dispatch, getState) => {
   dispatch(setStageLoading(true));
   dispatch(setStageError(null));
   try {
-    const response = await fetch(`/api/stage/vaults`);
-    if (response.ok) {
+    const url = companyId ? `/api/stage/vaults/${companyId}` : `/api/stage/vaults`;
+    const vaultsArr = [];
+    let after = null;
+    do {
+      const response = await fetch(`${url}?limit=${STAGE_PAGE_SIZE}${after ? `&after=${after}` : ""}`);
+      if (!response.ok) {
+        const errorText = await response.text();
+        dispatch(setStageError(errorText));
+        return;
+      }
       const data = await response.json();
-      const vaultsArr = Object.values(data);
-      dispatch(getAllStagedVaults(vaultsArr));
-    } else {
-      const errorText = await response.text();
-      dispatch(setStageError(errorText));
-    }
+      vaultsArr.push(...Object.values(data));
+      after = response.headers.get("X-Next-Cursor");
+    } while (after);
+    dispatch(getAllStagedVaults(vaultsArr));
   } catch (error) {
     dispatch(setStageError(error.message));
   } finally {
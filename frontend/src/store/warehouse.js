@@ -22,6 +22,7 @@ const UPDATE_VAULT = "warehouse/UPDATE_VAULT";
 const SET_FIELD_FULL = "warehouse/SET_FIELD_FULL";
 const EDIT_FIELD_CAPACITY = "warehouse/EDIT_FIELD_CAPACITY";
 const UPDATE_FIELD_GRID = "warehouse/UPDATE_FIELD_GRID";
+const APPLY_WAREHOUSE_CHANGES = "warehouse/APPLY_WAREHOUSE_CHANGES";
 
 export const updateVault = (payload) => ({
   type: UPDATE_VAULT,
@@ -141,6 +142,11 @@ export const updateFieldGrid = (warehouseId, fieldgridLocation) => ({
   payload: { warehouseId, fieldgridLocation },
 });
 
+export const applyWarehouseChanges = (changes) => ({
+  type: APPLY_WAREHOUSE_CHANGES,
+  changes,
+});
+
 // Action for updating warehouse after dimension edit
 export const editWarehouseDimensions = (warehouse) => ({
   type: EDIT_FIELD_CAPACITY,
@@ -165,6 +171,7 @@ export const editWarehouseDimensionsThunk = (warehouseId, { fieldCapacity, lengt
     if (res.ok) {
       const data = await res.json();
       dispatch(editWarehouseDimensions(data.warehouse));
+      dispatch(getWarehouseChangesThunk(warehouseId));
       return data;
     } else {
       const err = await res.json();
@@ -177,6 +184,66 @@ export const editWarehouseDimensionsThunk = (warehouseId, { fieldCapacity, lengt
   }
 };
 
+// Bring a loaded warehouse up to date with only what changed since its version
+export const getWarehouseChangesThunk = (warehouseId) => async (dispatch, getState) => {
+  const since = getState().warehouse.warehouses[warehouseId]?.version;
+  if (since === undefined) return null;
+
+  try {
+    const res = await fetch(`/api/warehouse/${warehouseId}/changes?since=${since}`);
+    if (res.ok) {
+      const data = await res.json();
+      if (data.reset) {
+        // the change log can't describe what happened, reload the warehouse
+        const full = await fetch(`/api/warehouse/${warehouseId}`);
+        if (!full.ok) return data;
+        const { warehouse_info } = await full.json();
+        dispatch(applyWarehouseChanges({ ...data, snapshot: warehouse_info }));
+        return data;
+      }
+      dispatch(applyWarehouseChanges(data));
+      return data;
+    } else {
+      const err = await res.json();
+      console.error("Error fetching warehouse changes:", err);
+      return err;
+    }
+  } catch (error) {
+    console.error("Error fetching warehouse changes:", error);
+    return error;
+  }
+};
+
+// milliseconds between change feed reads when the server doesn't stream events
+const CHANGES_POLL_INTERVAL = 15000;
+
+// Follow a warehouse's live events and pull in each change as it happens,
+// or poll the change feed if the server has event streams turned off.
+// Returns a function that stops listening.
+export const subscribeToWarehouseThunk = (warehouseId) => (dispatch) => {
+  const source = new EventSource(`/api/warehouse/${warehouseId}/events`);
+  const catchUp = () => dispatch(getWarehouseChangesThunk(warehouseId));
+  let poller = null;
+
+  // "hello" also arrives after every reconnect, covering anything missed
+  source.addEventListener("hello", catchUp);
+  source.addEventListener("change", catchUp);
+  source.addEventListener("resync", catchUp);
+
+  // a closed source won't reconnect: streams are off (204) or failing
+  source.addEventListener("error", () => {
+    if (source.readyState !== EventSource.CLOSED || poller) return;
+    poller = setInterval(() => {
+      if (!document.hidden) catchUp();
+    }, CHANGES_POLL_INTERVAL);
+  });
+
+  return () => {
+    source.close();
+    if (poller) clearInterval(poller);
+  };
+};
+
 export const getAllWarehousesThunk = (companyId) => async (dispatch) => {
   try {
     const response = await fetch(`/api/warehouse/company/${companyId}`);
@@ -264,6 +331,9 @@ export const deleteVaultThunk = (vaultId) => async (dispatch) => {
       dispatch(deleteVault(data));
       if (data.deleteFrom === "stage") {
         dispatch(removeVaultFromStage(vaultId));
+      } else {
+        // pick up other clients' writes along with this one
+        dispatch(getWarehouseChangesThunk(data.warehouseId));
       }
       return data;
     } else {
@@ -512,6 +582,7 @@ export const editFieldCapacityThunk = (warehouseId, fieldCapacity) => async (dis
     if (res.ok) {
       const data = await res.json();
       dispatch(editFieldCapacity(data.warehouse));
+      dispatch(getWarehouseChangesThunk(warehouseId));
       return data;
     } else {
       const err = await res.json();
@@ -843,20 +914,31 @@ const warehouseReducer = (state = initialState, action) => {
         },
       };
 
-    case DELETE_VAULT:
-      const deleteFrom = action.payload.deleteFrom;
+    case DELETE_VAULT: {
+      if (action.payload.deleteFrom === "stage") return state;
 
-      if (deleteFrom === "stage") return state;
+      // only the field the vault was in changed
+      const { warehouseId: vaultWarehouseId, field: emptiedField } = action.payload;
+      const withEmptiedField = (warehouse) => ({
+        ...warehouse,
+        fields: { ...warehouse.fields, [emptiedField.id]: emptiedField },
+      });
 
       return {
         ...state,
-        currentField: action.payload.field,
-        currentWarehouse: action.payload.warehouse,
-        warehouses: {
-          ...state.warehouses,
-          [action.payload.warehouse.id]: action.payload.warehouse,
-        }
+        currentField: emptiedField,
+        currentWarehouse:
+          state.currentWarehouse?.id === vaultWarehouseId
+            ? withEmptiedField(state.currentWarehouse)
+            : state.currentWarehouse,
+        warehouses: state.warehouses[vaultWarehouseId]
+          ? {
+              ...state.warehouses,
+              [vaultWarehouseId]: withEmptiedField(state.warehouses[vaultWarehouseId]),
+            }
+          : state.warehouses,
       };
+    }
 
     case UPDATE_FIELD_TYPE:
       const { field1, field2 } = action.fields;
@@ -1110,18 +1192,65 @@ const warehouseReducer = (state = initialState, action) => {
         },
       };
 
-    case EDIT_FIELD_CAPACITY:
+    case EDIT_FIELD_CAPACITY: {
+      // the response only has the warehouse's own attributes, keep its fields
+      // and racks. Its version may be past writes from other clients this
+      // page hasn't seen, so only the change feed moves the version.
+      const { version, ...attributes } = action.warehouse;
       return {
         ...state,
         warehouses: {
           ...state.warehouses,
-          [action.warehouse.id]: action.warehouse,
+          [attributes.id]: {
+            ...state.warehouses[attributes.id],
+            ...attributes,
+          },
         },
         currentWarehouse:
-          state.currentWarehouse?.id === action.warehouse.id
-            ? action.warehouse
+          state.currentWarehouse?.id === attributes.id
+            ? { ...state.currentWarehouse, ...attributes }
             : state.currentWarehouse,
       };
+    }
+
+    case APPLY_WAREHOUSE_CHANGES: {
+      const { changes } = action;
+      const applyChanges = (warehouse) => {
+        if (changes.snapshot) return { ...warehouse, ...changes.snapshot };
+
+        const fields = { ...warehouse.fields };
+        changes.fields.forEach((field) => {
+          fields[field.id] = field;
+        });
+        changes.deletedFields.forEach((fieldId) => {
+          delete fields[fieldId];
+        });
+
+        const changedRacks = Object.fromEntries(changes.racks.map((rack) => [rack.id, rack]));
+        const racks = warehouse.racks
+          .filter((rack) => !changes.deletedRacks.includes(rack.id))
+          .map((rack) => changedRacks[rack.id] || rack);
+        changes.racks.forEach((rack) => {
+          if (!racks.some((existing) => existing.id === rack.id)) racks.push(rack);
+        });
+
+        return { ...warehouse, ...changes.warehouse, fields, racks, version: changes.version };
+      };
+
+      return {
+        ...state,
+        warehouses: state.warehouses[changes.warehouseId]
+          ? {
+              ...state.warehouses,
+              [changes.warehouseId]: applyChanges(state.warehouses[changes.warehouseId]),
+            }
+          : state.warehouses,
+        currentWarehouse:
+          state.currentWarehouse?.id === changes.warehouseId
+            ? applyChanges(state.currentWarehouse)
+            : state.currentWarehouse,
+      };
+    }
 
     case UPDATE_FIELD_GRID:
       return {
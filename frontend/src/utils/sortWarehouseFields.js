@@ -1,22 +1,35 @@
+// 1-based column number of spreadsheet-style letters: A -> 1, Z -> 26, AA -> 27
+const columnNumber = (letters) =>
+  letters
+    .toUpperCase()
+    .split("")
+    .reduce((col, letter) => col * 26 + letter.charCodeAt(0) - 64, 0);
+
+// Grid position of a field, from its row/col or else parsed from its name
+const fieldPosition = (field) => {
+  if (field.col != null && field.row != null) {
+    return [field.col, field.row];
+  }
+  const [, alpha, num] = field.name.match(/^([A-Za-z]+)(\d+)$/);
+  return [columnNumber(alpha), parseInt(num)];
+};
+
 export const sortWarehouseFields = (fields) => {
   let sortedFields = [];
   if (fields) {
     let fieldsArr = Object.values(fields);
 
     sortedFields = fieldsArr.sort(function (a, b) {
-      // Split the field names into alphabetical and numeric parts
-      const [, aAlpha, aNum] = a.name.match(/^([A-Za-z]+)(\d+)$/);
-      const [, bAlpha, bNum] = b.name.match(/^([A-Za-z]+)(\d+)$/);
+      const [aCol, aRow] = fieldPosition(a);
+      const [bCol, bRow] = fieldPosition(b);
 
-      // Compare alphabetical parts first
-      if (aAlpha !== bAlpha) {
-        return aAlpha.localeCompare(bAlpha);
+      // Column by column (A, B, ..., Z, AA), then row by row within a column
+      if (aCol !== bCol) {
+        return aCol - bCol;
       }
-
-      // If alphabetical parts are equal, compare numeric parts as numbers
-      return parseInt(aNum) - parseInt(bNum);
+      return aRow - bRow;
     });
   }
 
   return sortedFields;
-};
\ No newline at end of file
+};
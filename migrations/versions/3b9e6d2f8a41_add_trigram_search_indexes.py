@@ -0,0 +1,46 @@
+"""add trigram indexes for type-ahead search
+
+Revision ID: 3b9e6d2f8a41
+Revises: f2c8d5e17a94
+Create Date: 2026-10-18 23:05:12.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e6d2f8a41'
+down_revision = 'f2c8d5e17a94'
+branch_labels = None
+depends_on = None
+
+# (index, table, column) searched with ILIKE '%text%'
+TRIGRAM_INDEXES = [
+    ('ix_customers_name_trgm', 'customers', 'name'),
+    ('ix_orders_name_trgm', 'orders', 'name'),
+    ('ix_vaults_name_trgm', 'vaults', 'name'),
+    ('ix_pallets_pallet_number_trgm', 'pallets', 'pallet_number'),
+]
+
+
+def upgrade():
+    # other databases use the in-process search indexes instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, column in TRIGRAM_INDEXES:
+        op.drop_index(name, table_name=table)
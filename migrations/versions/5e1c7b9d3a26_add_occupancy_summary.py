@@ -0,0 +1,60 @@
+"""add occupancy summary
+
+Revision ID: 5e1c7b9d3a26
+Revises: 8d2f4a6c1e93
+Create Date: 2026-10-19 00:14:38.771902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1c7b9d3a26'
+down_revision = '8d2f4a6c1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('occupancy',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('rack_id', sa.Integer(), nullable=True),
+    sa.Column('used', sa.Integer(), nullable=False),
+    sa.Column('capacity', sa.Integer(), nullable=True),
+    sa.Column('full', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_occupancy_entity_entity_id', 'occupancy', ['entity', 'entity_id'], unique=True)
+    op.create_index('ix_occupancy_warehouse_id_entity', 'occupancy', ['warehouse_id', 'entity'])
+
+    # summarize what is already stored
+    op.execute("""
+        INSERT INTO occupancy (warehouse_id, entity, entity_id, rack_id, used, capacity, "full")
+        SELECT fields.warehouse_id, 'field', fields.id, NULL, COUNT(vaults.id),
+               warehouses.field_capacity, COALESCE(fields."full", FALSE)
+        FROM fields
+        JOIN warehouses ON warehouses.id = fields.warehouse_id
+        LEFT JOIN vaults ON vaults.field_id = fields.id
+        GROUP BY fields.id, fields.warehouse_id, warehouses.field_capacity, fields."full"
+    """)
+    op.execute("""
+        INSERT INTO occupancy (warehouse_id, entity, entity_id, rack_id, used, capacity, "full")
+        SELECT racks.warehouse_id, 'shelf', shelves.id, shelves.rack_id,
+               COALESCE(SUM(CASE WHEN pallets.id IS NULL THEN 0 ELSE COALESCE(pallets.shelf_spots, 1) END), 0),
+               shelves.capacity, FALSE
+        FROM shelves
+        JOIN racks ON racks.id = shelves.rack_id
+        LEFT JOIN pallets ON pallets.shelf_id = shelves.id
+        GROUP BY shelves.id, shelves.rack_id, racks.warehouse_id, shelves.capacity
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_occupancy_warehouse_id_entity', table_name='occupancy')
+    op.drop_index('uq_occupancy_entity_entity_id', table_name='occupancy')
+    op.drop_table('occupancy')
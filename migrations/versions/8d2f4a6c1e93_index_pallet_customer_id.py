@@ -0,0 +1,24 @@
+"""index pallets by customer
+
+Revision ID: 8d2f4a6c1e93
+Revises: 3b9e6d2f8a41
+Create Date: 2026-10-18 23:41:55.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f4a6c1e93'
+down_revision = '3b9e6d2f8a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_pallets_customer_id'), 'pallets', ['customer_id'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_pallets_customer_id'), table_name='pallets')
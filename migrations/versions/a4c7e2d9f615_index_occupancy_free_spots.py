@@ -0,0 +1,24 @@
+"""index occupancy free spots
+
+Revision ID: a4c7e2d9f615
+Revises: 5e1c7b9d3a26
+Create Date: 2026-10-19 02:41:06.318540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2d9f615'
+down_revision = '5e1c7b9d3a26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_occupancy_warehouse_id_entity_free', 'occupancy', ['warehouse_id', 'entity', sa.text('(capacity - used)')])
+
+
+def downgrade():
+    op.drop_index('ix_occupancy_warehouse_id_entity_free', table_name='occupancy')
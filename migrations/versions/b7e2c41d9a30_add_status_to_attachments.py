@@ -0,0 +1,26 @@
+"""add status to attachments
+
+Revision ID: b7e2c41d9a30
+Revises: 4a83a26e0aa1
+Create Date: 2026-10-18 16:02:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c41d9a30'
+down_revision = '4a83a26e0aa1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='ready'))
+
+
+def downgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_column('status')
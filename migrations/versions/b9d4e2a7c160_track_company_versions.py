@@ -0,0 +1,27 @@
+"""track company versions
+
+Revision ID: b9d4e2a7c160
+Revises: c3e8a1f05b72
+Create Date: 2026-10-19 05:41:18.306529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d4e2a7c160'
+down_revision = 'c3e8a1f05b72'
+branch_labels = None
+depends_on = None
+
+table_versions = sa.table('table_versions', sa.column('name', sa.String), sa.column('version', sa.Integer))
+
+
+def upgrade():
+    # warehouse snapshots show the company name, so company writes are counted too
+    op.bulk_insert(table_versions, [{'name': 'companies', 'version': 0}])
+
+
+def downgrade():
+    op.execute(table_versions.delete().where(table_versions.c.name == 'companies'))
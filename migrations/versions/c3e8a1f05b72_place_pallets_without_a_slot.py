@@ -0,0 +1,61 @@
+"""place pallets without a slot
+
+Revision ID: c3e8a1f05b72
+Revises: a4c7e2d9f615
+Create Date: 2026-10-19 03:27:51.904217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a1f05b72'
+down_revision = 'a4c7e2d9f615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pallets added before slots were assigned have none; give each the
+    # leftmost free run of its spots on its shelf, oldest pallet first.
+    # A pallet that no longer fits (an overfilled shelf) keeps no slot and
+    # still counts against the shelf's capacity.
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("""
+        SELECT pallets.shelf_id, shelves.capacity, pallets.id, pallets.slot_index, COALESCE(pallets.shelf_spots, 1)
+        FROM pallets
+        JOIN shelves ON shelves.id = pallets.shelf_id
+        WHERE pallets.shelf_id IN (SELECT shelf_id FROM pallets WHERE slot_index IS NULL)
+        ORDER BY pallets.shelf_id, pallets.id
+    """)).fetchall()
+
+    shelves = {}
+    for shelf_id, capacity, pallet_id, slot_index, spots in rows:
+        shelves.setdefault(shelf_id, (capacity, []))[1].append((pallet_id, slot_index, spots))
+
+    for capacity, pallets in shelves.values():
+        taken = [False] * capacity
+        for pallet_id, slot_index, spots in pallets:
+            if slot_index is not None:
+                for spot in range(slot_index, min(slot_index + spots, capacity)):
+                    taken[spot] = True
+        for pallet_id, slot_index, spots in pallets:
+            if slot_index is not None:
+                continue
+            start = next(
+                (start for start in range(capacity - spots + 1) if not any(taken[start:start + spots])),
+                None,
+            )
+            if start is None:
+                continue
+            taken[start:start + spots] = [True] * spots
+            connection.execute(
+                sa.text("UPDATE pallets SET slot_index = :slot_index WHERE id = :id"),
+                {'slot_index': start, 'id': pallet_id},
+            )
+
+
+def downgrade():
+    # which pallets had no slot isn't recorded, and the slots are valid either way
+    pass
@@ -0,0 +1,54 @@
+"""add indexes for hot lookup columns
+
+Revision ID: c5d81f0e2b47
+Revises: b7e2c41d9a30
+Create Date: 2026-10-18 17:12:40.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d81f0e2b47'
+down_revision = 'b7e2c41d9a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_fields_warehouse_id'), 'fields', ['warehouse_id'])
+    op.create_index('uq_fields_warehouse_id_name', 'fields', ['warehouse_id', 'name'], unique=True)
+
+    op.create_index(op.f('ix_vaults_field_id'), 'vaults', ['field_id'])
+    op.create_index(op.f('ix_vaults_customer_id'), 'vaults', ['customer_id'])
+    op.create_index(op.f('ix_vaults_order_id'), 'vaults', ['order_id'])
+    op.create_index(
+        'ix_vaults_staged_company_id', 'vaults', ['company_id', 'id'],
+        postgresql_where=sa.text('field_id IS NULL'),
+        sqlite_where=sa.text('field_id IS NULL'),
+    )
+
+    op.create_index(op.f('ix_pallets_shelf_id'), 'pallets', ['shelf_id'])
+    op.create_index(op.f('ix_shelves_rack_id'), 'shelves', ['rack_id'])
+    op.create_index(op.f('ix_racks_warehouse_id'), 'racks', ['warehouse_id'])
+
+    op.create_index('ix_customers_upper_name', 'customers', [sa.text('upper(name)')])
+    op.create_index(op.f('ix_orders_name'), 'orders', ['name'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_orders_name'), table_name='orders')
+    op.drop_index('ix_customers_upper_name', table_name='customers')
+
+    op.drop_index(op.f('ix_racks_warehouse_id'), table_name='racks')
+    op.drop_index(op.f('ix_shelves_rack_id'), table_name='shelves')
+    op.drop_index(op.f('ix_pallets_shelf_id'), table_name='pallets')
+
+    op.drop_index('ix_vaults_staged_company_id', table_name='vaults')
+    op.drop_index(op.f('ix_vaults_order_id'), table_name='vaults')
+    op.drop_index(op.f('ix_vaults_customer_id'), table_name='vaults')
+    op.drop_index(op.f('ix_vaults_field_id'), table_name='vaults')
+
+    op.drop_index('uq_fields_warehouse_id_name', table_name='fields')
+    op.drop_index(op.f('ix_fields_warehouse_id'), table_name='fields')
@@ -0,0 +1,59 @@
+"""add row and col grid coordinates to fields
+
+Revision ID: d1a9e4c7f302
+Revises: c5d81f0e2b47
+Create Date: 2026-10-18 19:04:13.226871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1a9e4c7f302'
+down_revision = 'c5d81f0e2b47'
+branch_labels = None
+depends_on = None
+
+
+def parse_name(name):
+    # "AB12" -> (28, 12), same rules as Field.parse_name
+    match = re.fullmatch(r'([A-Z]+)(\d+)', name or '')
+    if not match:
+        return None
+    col = 0
+    for letter in match.group(1):
+        col = col * 26 + ord(letter) - 64
+    return col, int(match.group(2))
+
+
+def upgrade():
+    with op.batch_alter_table('fields', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('col', sa.Integer(), nullable=True))
+
+    fields = sa.table('fields', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('row', sa.Integer), sa.column('col', sa.Integer))
+    connection = op.get_bind()
+    coordinates = []
+    for field_id, name in connection.execute(sa.select(fields.c.id, fields.c.name)):
+        parsed = parse_name(name)
+        if parsed:
+            coordinates.append({'field_id': field_id, 'col': parsed[0], 'row': parsed[1]})
+    if coordinates:
+        connection.execute(
+            fields.update()
+            .where(fields.c.id == sa.bindparam('field_id'))
+            .values(col=sa.bindparam('col'), row=sa.bindparam('row')),
+            coordinates,
+        )
+
+    op.create_index('ix_fields_warehouse_id_col_row', 'fields', ['warehouse_id', 'col', 'row'])
+
+
+def downgrade():
+    op.drop_index('ix_fields_warehouse_id_col_row', table_name='fields')
+
+    with op.batch_alter_table('fields', schema=None) as batch_op:
+        batch_op.drop_column('col')
+        batch_op.drop_column('row')
@@ -0,0 +1,42 @@
+"""add warehouse versions and change feed
+
+Revision ID: e4f7b2a91c58
+Revises: d1a9e4c7f302
+Create Date: 2026-10-18 20:31:52.640118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f7b2a91c58'
+down_revision = 'd1a9e4c7f302'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('warehouses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('warehouse_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_warehouse_changes_warehouse_id_version', 'warehouse_changes', ['warehouse_id', 'version'])
+
+
+def downgrade():
+    op.drop_index('ix_warehouse_changes_warehouse_id_version', table_name='warehouse_changes')
+    op.drop_table('warehouse_changes')
+
+    with op.batch_alter_table('warehouses', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,31 @@
+"""add table versions for conditional GETs
+
+Revision ID: f2c8d5e17a94
+Revises: e4f7b2a91c58
+Create Date: 2026-10-18 22:10:27.915402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d5e17a94'
+down_revision = 'e4f7b2a91c58'
+branch_labels = None
+depends_on = None
+
+TRACKED_TABLES = ['customers', 'orders', 'vaults', 'attachments', 'pallets']
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': name, 'version': 0} for name in TRACKED_TABLES])
+
+
+def downgrade():
+    op.drop_table('table_versions')
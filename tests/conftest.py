@@ -0,0 +1,69 @@
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('ATTACHMENT_STORAGE', 'memory')
+
+import pytest
+from sqlalchemy import event
+from app import app as flask_app
+from app.models import Company, User, db
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def form_client(client, monkeypatch):
+    """
+    Client for the form routes, which copy the csrf_token cookie into the
+    form; any response sets it, as it does for the frontend
+    """
+    monkeypatch.setitem(client.application.config, 'WTF_CSRF_ENABLED', True)
+    client.get('/api/vaults/all')
+    return client
+
+
+@pytest.fixture
+def user(client):
+    """
+    A user of a company, logged in on the test client
+    """
+    company = Company(name='Company')
+    db.session.add(company)
+    db.session.flush()
+    user = User(username='user', email='user@example.com', password='password', company_id=company.id)
+    db.session.add(user)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return user
+
+
+@pytest.fixture
+def queries(app):
+    """
+    Statements sent to the database while the test runs; clear() it before
+    the part being counted
+    """
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import Customer, Field, Order, Vault, Warehouse, db
+
+
+@pytest.fixture
+def commits(app):
+    """
+    Sessions committed while the test runs
+    """
+    committed = []
+
+    def record(session):
+        committed.append(session)
+
+    event.listen(Session, 'after_commit', record)
+    yield committed
+    event.remove(Session, 'after_commit', record)
+
+
+def add_field(capacity=3):
+    warehouse = Warehouse(name='W', rows=1, cols=1, field_capacity=capacity, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.flush()
+    field = Field(name='A1', row=1, col=1, warehouse_id=warehouse.id, type='vault', full=False)
+    db.session.add(field)
+    db.session.commit()
+    return field.id
+
+
+def post_vault(client, field_id, customer_name='ACME', order_name='ORDER 1'):
+    return client.post('/api/vaults/', data={
+        'customer_name': customer_name,
+        'order_name': order_name,
+        'field_id': field_id,
+        'position': 'T',
+        'vault_id': '101',
+        'type': 'vault',
+    })
+
+
+def test_add_vault_commits_once(form_client, commits):
+    field_id = add_field()
+    commits.clear()
+
+    response = post_vault(form_client, field_id)
+
+    assert response.status_code == 200
+    assert len(commits) == 1
+    vault = Vault.query.get(response.get_json()['vault']['id'])
+    assert (vault.field_id, vault.customer.name, vault.order.name) == (field_id, 'ACME', 'ORDER 1')
+
+
+def test_refused_add_leaves_nothing_behind(form_client, commits):
+    field_id = add_field(capacity=1)
+    assert post_vault(form_client, field_id).status_code == 200
+    commits.clear()
+
+    response = post_vault(form_client, field_id, customer_name='OTHER', order_name='ORDER 2')
+
+    assert response.status_code == 400
+    assert commits == []
+    assert Customer.query.filter_by(name='OTHER').first() is None
+    assert Order.query.filter_by(name='ORDER 2').first() is None
+    assert Vault.query.filter_by(field_id=field_id).count() == 1
@@ -0,0 +1,85 @@
+import threading
+import pytest
+from flask import Flask
+from app.models import Field, Vault, Warehouse, db
+from app.services.capacity import FieldFullError, add_vault_to_field
+
+
+def add_field(capacity=3, type='vault'):
+    warehouse = Warehouse(name='W', rows=1, cols=1, field_capacity=capacity, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.flush()
+    field = Field(name='A1', row=1, col=1, warehouse_id=warehouse.id, type=type, full=False)
+    db.session.add(field)
+    db.session.commit()
+    return field.id
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """
+    An app on a database file, so each thread gets its own connection
+    (the in-memory database is one connection shared by all of them)
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "capacity.db"}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_parallel_adds_do_not_overfill(file_app):
+    with file_app.app_context():
+        field_id = add_field(capacity=3)
+
+    results = []
+    start = threading.Barrier(8)
+
+    def add():
+        with file_app.app_context():
+            start.wait()
+            try:
+                add_vault_to_field(field_id, name='parallel')
+                db.session.commit()
+                results.append('added')
+            except FieldFullError:
+                db.session.rollback()
+                results.append('full')
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ['added'] * 3 + ['full'] * 5
+    with file_app.app_context():
+        assert Vault.query.filter_by(field_id=field_id).count() == 3
+
+
+def test_interleaved_add_sees_the_committed_one(app):
+    field_id = add_field(capacity=2)
+    add_vault_to_field(field_id, name='first')
+    db.session.commit()
+    add_vault_to_field(field_id, name='second')
+    db.session.commit()
+
+    with pytest.raises(FieldFullError):
+        add_vault_to_field(field_id, name='third')
+    db.session.rollback()
+    assert Vault.query.filter_by(field_id=field_id).count() == 2
+
+
+@pytest.mark.parametrize('type', ['couchbox', 'couchbox-T'])
+def test_couchbox_is_marked_full(app, type):
+    field_id = add_field(capacity=None, type=type)
+    for v in range(3):
+        vault, field = add_vault_to_field(field_id, name=str(v))
+        db.session.commit()
+    assert field.full
+
+    with pytest.raises(FieldFullError):
+        add_vault_to_field(field_id, name='fourth')
@@ -0,0 +1,89 @@
+import pytest
+from app.models import Customer, Field, Order, Pallet, Rack, Shelf, Vault, Warehouse, db
+
+# what a 304 may still read: the signed-in user, a warehouse's version
+# and the table versions; nothing that is serialized
+VERSION_READS = ('FROM users', 'warehouses.version', 'FROM table_versions')
+
+
+@pytest.fixture
+def seeded(user):
+    customer = Customer(name='ACME')
+    order = Order(name='ORDER 1', company_id=user.company_id)
+    warehouse = Warehouse(name='W', rows=2, cols=2, field_capacity=3, length=10, width=10, company_id=user.company_id)
+    db.session.add_all([customer, order, warehouse])
+    db.session.flush()
+    Field.bulk_create_grid(warehouse.id, cols=2, rows=2)
+    field = Field.query.filter_by(warehouse_id=warehouse.id, name='A1').one()
+    rack = Rack(name='R', capacity=2, warehouse_id=warehouse.id, position={'x': 1, 'y': 1}, width=1, length=1)
+    db.session.add_all([
+        Vault(name='placed', field_id=field.id, customer_id=customer.id, order_id=order.id, company_id=user.company_id),
+        Vault(name='staged', customer_id=customer.id, order_id=order.id, company_id=user.company_id),
+        rack,
+    ])
+    db.session.flush()
+    shelf = Shelf(name='S', rack_id=rack.id, capacity=2)
+    db.session.add(shelf)
+    db.session.flush()
+    db.session.add(Pallet(weight=1, shelf_id=shelf.id, customer_name='ACME', customer_id=customer.id, slot_index=0, shelf_spots=1))
+    db.session.commit()
+    return {'warehouse': warehouse.id, 'customer': customer.id, 'order': order.id, 'company': user.company_id}
+
+
+def rename_customer(ids):
+    Customer.query.get(ids['customer']).name = 'ACME RENAMED'
+
+
+def weigh_pallet(ids):
+    Pallet.query.first().weight = 2
+
+
+def stage_vault(ids):
+    db.session.add(Vault(name='staged 2', company_id=ids['company']))
+
+
+def rename_order(ids):
+    Order.query.get(ids['order']).name = 'ORDER 2'
+
+
+ROUTES = [
+    ('/api/warehouse/{warehouse}', rename_customer),
+    ('/api/racks/warehouse/{warehouse}', weigh_pallet),
+    ('/api/stage/vaults', stage_vault),
+    ('/api/stage/vaults/{company}', stage_vault),
+    ('/api/customers/', rename_customer),
+    ('/api/orders/', rename_order),
+]
+
+
+def get(client, url, etag=None):
+    db.session.expire_all()
+    return client.get(url, headers={'If-None-Match': etag} if etag else {})
+
+
+@pytest.mark.parametrize('url, write', ROUTES)
+def test_unchanged_list_is_not_serialized_again(client, seeded, queries, url, write):
+    url = url.format(**seeded)
+    first = get(client, url)
+    assert first.status_code == 200
+    etag = first.headers['ETag'].strip('"')
+
+    queries.clear()
+    again = get(client, url, etag)
+    assert again.status_code == 304
+    assert again.data == b''
+    assert len(queries) <= 2
+    assert [query for query in queries if not any(read in query for read in VERSION_READS)] == []
+
+
+@pytest.mark.parametrize('url, write', ROUTES)
+def test_write_changes_the_etag(client, seeded, url, write):
+    url = url.format(**seeded)
+    etag = get(client, url).headers['ETag'].strip('"')
+
+    write(seeded)
+    db.session.commit()
+
+    changed = get(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.headers['ETag'].strip('"') != etag
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+import pytest
+from app.models import Warehouse, db
+from app.services import changes, events
+
+# deliveries a second the local broker must reach; it does well over a
+# hundred thousand here
+DELIVERY_BUDGET = 20000
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = events.LocalBroker()
+    monkeypatch.setattr(events, '_broker', broker)
+    return broker
+
+
+@pytest.fixture
+def stream_client(client, broker, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'WAREHOUSE_EVENTS', 'stream')
+    monkeypatch.setitem(client.application.config, 'EVENT_STREAM_MAX_AGE', 5)
+    return client
+
+
+def add_warehouse():
+    warehouse = Warehouse(name='W', rows=1, cols=1, field_capacity=3, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.commit()
+    return warehouse.id
+
+
+def open_stream(client, warehouse_id):
+    response = client.get(f'/api/warehouse/{warehouse_id}/events', buffered=False)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    return response, chunks
+
+
+def read_event(chunks):
+    """
+    (event type, id, data) of the next event on a stream
+    """
+    lines = dict(line.split(': ', 1) for line in next(chunks).decode().strip().split('\n'))
+    return lines['event'], lines.get('id'), json.loads(lines['data'])
+
+
+def test_hello_reads_the_version_after_subscribing(stream_client):
+    warehouse_id = add_warehouse()
+    stale = Warehouse.query.get(warehouse_id)
+    # another worker's change; the loaded warehouse still says version 0
+    db.session.execute(Warehouse.__table__.update().where(Warehouse.id == warehouse_id).values(version=7))
+    assert stale.version == 0
+
+    response, chunks = open_stream(stream_client, warehouse_id)
+    event, id, data = read_event(chunks)
+    response.close()
+
+    assert (event, id, data['version']) == ('hello', '7', 7)
+
+
+def test_missing_warehouse_leaves_no_subscription(stream_client, broker):
+    assert stream_client.get('/api/warehouse/404/events').status_code == 404
+    assert broker.subscriptions == {}
+
+
+def test_change_fans_out_to_every_stream(stream_client, broker):
+    warehouse_id = add_warehouse()
+    app = stream_client.application
+    subscribed = threading.Barrier(4)
+    received = []
+
+    def follow():
+        # a thread per stream, as a server runs them; each stream keeps
+        # its request context pushed while it is open
+        response, chunks = open_stream(app.test_client(), warehouse_id)
+        hello = read_event(chunks)
+        subscribed.wait()
+        received.append((hello[0], read_event(chunks)))
+        response.close()
+
+    threads = [threading.Thread(target=follow) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    subscribed.wait()
+    assert len(broker.subscriptions[events.warehouse_channel(warehouse_id)]) == 3
+
+    changes.record(warehouse_id, reset=True)
+    db.session.commit()
+    for thread in threads:
+        thread.join()
+
+    assert len(received) == 3
+    for hello, (event, id, data) in received:
+        assert (hello, event, id, data['warehouseId'], data['version']) == ('hello', 'change', '1', warehouse_id, 1)
+    assert broker.subscriptions == {}
+
+
+def test_rolled_back_change_is_not_sent(app, broker):
+    warehouse_id = add_warehouse()
+    subscription = broker.subscribe(events.warehouse_channel(warehouse_id))
+
+    changes.record(warehouse_id, reset=True)
+    db.session.rollback()
+
+    assert subscription.get(timeout=0) is None
+
+
+def test_broker_throughput(broker):
+    subscribers = [broker.subscribe('warehouse:1') for _ in range(50)]
+    count = events.SUBSCRIBER_BUFFER
+
+    start = time.perf_counter()
+    for version in range(count):
+        broker.publish('warehouse:1', {'type': 'change', 'version': version})
+    elapsed = time.perf_counter() - start
+
+    assert len(subscribers) * count / elapsed > DELIVERY_BUDGET
+    for subscription in subscribers:
+        assert [subscription.get(timeout=0)['version'] for _ in range(count)] == list(range(count))
+
+
+def test_slow_subscriber_is_told_to_resync(broker):
+    fast, slow = broker.subscribe('warehouse:1'), broker.subscribe('warehouse:1')
+    for version in range(events.SUBSCRIBER_BUFFER + 1):
+        broker.publish('warehouse:1', {'type': 'change', 'version': version})
+        assert fast.get(timeout=0)['version'] == version
+
+    assert slow.get(timeout=0) == {'type': 'resync'}
+    assert slow.get(timeout=0) is None
@@ -0,0 +1,154 @@
+import time
+import pytest
+from app.models import Field, Vault, Warehouse, db
+from app.services import grid
+
+# seconds add-warehouse may take for a 100 x 100 grid, response included;
+# it takes about half of one here
+GRID_BUDGET = 2
+
+
+def add_warehouse(client, rows, cols, name='W'):
+    return client.post('/api/warehouse/add-warehouse', json={
+        'name': name, 'rows': rows, 'cols': cols, 'field_capacity': 3, 'length': 100, 'width': 100,
+    })
+
+
+def test_add_warehouse_inserts_the_grid_at_once(client, user, queries):
+    db.session.expire_all()
+    queries.clear()
+    assert add_warehouse(client, rows=5, cols=5, name='small').status_code == 201
+    small = len(queries)
+
+    db.session.expire_all()
+    queries.clear()
+    response = add_warehouse(client, rows=26, cols=50, name='large')
+    assert response.status_code == 201
+    assert len(queries) == small
+
+    warehouse = Warehouse.query.get(response.get_json()['id'])
+    assert Field.query.filter_by(warehouse_id=warehouse.id).count() == 26 * 50
+    assert Field.query.filter_by(warehouse_id=warehouse.id, name='AX26').one().col == 50
+
+
+def test_add_warehouse_time(client, user):
+    start = time.perf_counter()
+    response = add_warehouse(client, rows=100, cols=100)
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 201
+    assert len(response.get_json()['fields']) == 100 * 100
+    assert elapsed < GRID_BUDGET
+
+
+def add_grid(rows=3, cols=3):
+    warehouse = Warehouse(name='G', rows=rows, cols=cols, field_capacity=3, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.flush()
+    Field.bulk_create_grid(warehouse.id, cols=cols, rows=rows)
+    db.session.flush()
+    return warehouse
+
+
+def field_names(warehouse):
+    return {(field.name, field.row, field.col) for field in Field.query.filter_by(warehouse_id=warehouse.id)}
+
+
+def grid_names(rows, cols):
+    return {(f'{Field.column_label(col)}{row}', row, col) for col in range(1, cols + 1) for row in range(1, rows + 1)}
+
+
+def add_vault(warehouse, name):
+    field = Field.query.filter_by(warehouse_id=warehouse.id, name=name).one()
+    db.session.add(Vault(name='V', field_id=field.id))
+    db.session.flush()
+    return field.id
+
+
+@pytest.mark.parametrize('direction, rows, cols, new_block', [
+    ('right', 3, 5, (range(1, 4), range(4, 6))),
+    ('bottom', 5, 3, (range(4, 6), range(1, 4))),
+    ('left', 3, 5, (range(1, 4), range(1, 3))),
+])
+def test_grow(app, direction, rows, cols, new_block):
+    warehouse = add_grid()
+
+    assert grid.grow(warehouse, direction, 2) == new_block
+    assert (warehouse.rows, warehouse.cols) == (rows, cols)
+    assert field_names(warehouse) == grid_names(rows, cols)
+
+
+def test_grow_left_renames_the_fields_it_moves(app):
+    warehouse = add_grid()
+    field_id = add_vault(warehouse, 'A2')
+
+    grid.grow(warehouse, 'left', 2)
+    db.session.expire_all()
+
+    field = Field.query.get(field_id)
+    assert (field.name, field.row, field.col) == ('C2', 2, 3)
+
+
+@pytest.mark.parametrize('direction, rows, cols', [
+    ('right', 3, 1),
+    ('bottom', 1, 3),
+    ('left', 3, 1),
+])
+def test_shrink(app, direction, rows, cols):
+    warehouse = add_grid()
+
+    grid.shrink(warehouse, direction, 2)
+    assert (warehouse.rows, warehouse.cols) == (rows, cols)
+    assert field_names(warehouse) == grid_names(rows, cols)
+
+
+def test_shrink_left_renames_the_fields_it_moves(app):
+    warehouse = add_grid(cols=4)
+    field_id = add_vault(warehouse, 'D2')
+
+    grid.shrink(warehouse, 'left', 2)
+    db.session.expire_all()
+
+    field = Field.query.get(field_id)
+    assert (field.name, field.row, field.col) == ('B2', 2, 2)
+
+
+def test_shrink_over_vaults_changes_nothing(app):
+    warehouse = add_grid()
+    add_vault(warehouse, 'C1')
+
+    with pytest.raises(grid.FieldsOccupiedError):
+        grid.shrink(warehouse, 'right', 1)
+    assert warehouse.cols == 3
+    assert field_names(warehouse) == grid_names(3, 3)
+
+
+@pytest.mark.parametrize('resize, direction, count', [
+    (grid.shrink, 'right', 3),
+    (grid.shrink, 'left', 100),
+    (grid.shrink, 'bottom', 3),
+    (grid.shrink, 'right', 0),
+    (grid.grow, 'right', 0),
+    (grid.grow, 'left', -1),
+])
+def test_resize_count_bounds(app, resize, direction, count):
+    warehouse = add_grid()
+
+    with pytest.raises(grid.GridSizeError):
+        resize(warehouse, direction, count)
+    assert (warehouse.rows, warehouse.cols) == (3, 3)
+    assert field_names(warehouse) == grid_names(3, 3)
+
+
+def test_resize_routes_refuse_bad_counts(form_client):
+    warehouse = add_grid()
+    db.session.commit()
+
+    shrink = form_client.delete('/api/fields/', data={'warehouse_id': warehouse.id, 'direction': 'right', 'count': 100})
+    grow = form_client.post('/api/fields/', data={'warehouse_id': warehouse.id, 'direction': 'bottom', 'count': 0})
+
+    assert (shrink.status_code, grow.status_code) == (400, 400)
+    assert shrink.get_json() == {'error': 'count must be between 1 and 2'}
+    assert grow.get_json() == {'error': 'count must be at least 1'}
+    db.session.expire_all()
+    assert (warehouse.rows, warehouse.cols) == (3, 3)
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import pytest
+from sqlalchemy import func
+from sqlalchemy.dialects import sqlite
+from app.models import Customer, Field, Order, Pallet, Rack, Shelf, Vault
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the revision adding the hot lookup indexes, and the one before it
+INDEX_REVISION = 'c5d81f0e2b47'
+BEFORE_INDEXES = 'b7e2c41d9a30'
+HOT_INDEXES = {
+    'ix_fields_warehouse_id', 'uq_fields_warehouse_id_name',
+    'ix_vaults_field_id', 'ix_vaults_customer_id', 'ix_vaults_order_id', 'ix_vaults_staged_company_id',
+    'ix_pallets_shelf_id', 'ix_shelves_rack_id', 'ix_racks_warehouse_id',
+    'ix_customers_upper_name', 'ix_orders_name',
+}
+
+
+def flask_db(path, *args):
+    """
+    Run `flask db <args>` against the SQLite database file at path
+    """
+    env = {
+        'PATH': os.environ.get('PATH', ''),
+        'FLASK_APP': 'app',
+        'DATABASE_URL': f'sqlite:///{path}',
+        'SECRET_KEY': 'test',
+        'ATTACHMENT_STORAGE': 'memory',
+    }
+    result = subprocess.run(
+        [sys.executable, '-m', 'flask', 'db', *args],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def indexes(path):
+    with sqlite3.connect(path) as connection:
+        return {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+@pytest.fixture(scope='module')
+def migrated(tmp_path_factory):
+    """
+    A database built by running every migration, as production's was
+    """
+    path = tmp_path_factory.mktemp('migrated') / 'app.db'
+    flask_db(path, 'upgrade')
+    return path
+
+
+def test_index_migration_up_and_down(tmp_path):
+    path = tmp_path / 'app.db'
+    flask_db(path, 'upgrade', INDEX_REVISION)
+    assert HOT_INDEXES <= indexes(path)
+
+    flask_db(path, 'downgrade', BEFORE_INDEXES)
+    assert not HOT_INDEXES & indexes(path)
+
+    flask_db(path, 'upgrade')
+    assert HOT_INDEXES <= indexes(path)
+
+
+def query_plan(path, query):
+    sql = str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+    with sqlite3.connect(path) as connection:
+        return [detail for id, parent, unused, detail in connection.execute('EXPLAIN QUERY PLAN ' + sql)]
+
+
+@pytest.mark.parametrize('lookup, table, index', [
+    (lambda: Field.query.filter_by(warehouse_id=1), 'fields', 'ix_fields_warehouse_id'),
+    (lambda: Vault.query.filter(Vault.field_id.in_([1, 2, 3])), 'vaults', 'ix_vaults_field_id'),
+    (lambda: Vault.query.filter(Vault.field_id.is_(None), Vault.company_id == 1), 'vaults', 'ix_vaults_staged_company_id'),
+    (lambda: Vault.query.filter_by(customer_id=1), 'vaults', 'ix_vaults_customer_id'),
+    (lambda: Vault.query.filter_by(order_id=1), 'vaults', 'ix_vaults_order_id'),
+    (lambda: Pallet.query.filter_by(shelf_id=1), 'pallets', 'ix_pallets_shelf_id'),
+    (lambda: Shelf.query.filter_by(rack_id=1), 'shelves', 'ix_shelves_rack_id'),
+    (lambda: Rack.query.filter_by(warehouse_id=1), 'racks', 'ix_racks_warehouse_id'),
+    (lambda: Customer.query.filter(func.upper(Customer.name) == 'ACME'), 'customers', 'ix_customers_upper_name'),
+    (lambda: Order.query.filter_by(name='ORDER 1'), 'orders', 'ix_orders_name'),
+])
+def test_hot_lookups_use_an_index(app, migrated, lookup, table, index):
+    plan = query_plan(migrated, lookup())
+
+    assert not [detail for detail in plan if detail.startswith(f'SCAN {table}')], plan
+    assert [detail for detail in plan if detail.startswith(f'SEARCH {table} USING') and index in detail], plan
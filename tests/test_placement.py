@@ -0,0 +1,49 @@
+from app.models import Customer, Field, Vault, Warehouse, db
+from app.services import occupancy
+
+
+def add_warehouse():
+    warehouse = Warehouse(name='W', rows=3, cols=3, field_capacity=3, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.flush()
+    db.session.execute(Field.__table__.insert(), Field.grid_values(warehouse.id, 3, 3))
+    db.session.flush()
+    fields = {field.name: field for field in Field.query.filter_by(warehouse_id=warehouse.id)}
+    return warehouse, fields
+
+
+def test_customer_names_differing_in_case(client):
+    warehouse, fields = add_warehouse()
+    typed = Customer(name='Acme')
+    upper = Customer(name='ACME')
+    db.session.add_all([typed, upper])
+    db.session.flush()
+    db.session.add(Vault(name='1', field_id=fields['B2'].id, customer_id=typed.id, type='vault'))
+    db.session.add(Vault(name='2', field_id=fields['B2'].id, customer_id=upper.id, type='vault'))
+    db.session.flush()
+    occupancy.refresh(warehouse.id)
+    db.session.commit()
+
+    response = client.get(f'/api/warehouse/{warehouse.id}/placement?customer=acme')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['customerIds'] == [typed.id, upper.id]
+    best = data['fields'][0]
+    assert (best['name'], best['customerVaults'], best['free']) == ('B2', 2, 1)
+
+
+def test_full_fields_and_couchbox_bottoms_are_skipped(client):
+    warehouse, fields = add_warehouse()
+    fields['A1'].full = True
+    fields['A2'].type = 'couchbox-T'
+    fields['A3'].type = 'couchbox-B'
+    db.session.flush()
+    occupancy.refresh(warehouse.id)
+    db.session.commit()
+
+    names = [field['name'] for field in client.get(f'/api/warehouse/{warehouse.id}/placement?limit=20').get_json()['fields']]
+    assert 'A1' not in names and 'A2' not in names and 'A3' not in names
+    assert len(names) == 6
+
+    couchboxes = client.get(f'/api/warehouse/{warehouse.id}/placement?type=couchbox').get_json()['fields']
+    assert [field['name'] for field in couchboxes] == ['A2']
@@ -0,0 +1,65 @@
+import time
+import pytest
+from app.models import Company, Field, Vault, Warehouse, db
+from app.services import search
+
+# seconds a type-ahead request may take over 100,000 vaults once the
+# index is built; under a tenth of one here
+SEARCH_BUDGET = 0.25
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    # the in-process indexes would otherwise outlive each test's database
+    monkeypatch.setattr(search, '_search', None)
+
+
+def add_warehouse(company_id, name='W'):
+    warehouse = Warehouse(name=name, rows=10, cols=10, field_capacity=3, length=10, width=10, company_id=company_id)
+    db.session.add(warehouse)
+    db.session.flush()
+    Field.bulk_create_grid(warehouse.id, cols=10, rows=10)
+    return warehouse, [field.id for field in Field.query.filter_by(warehouse_id=warehouse.id).order_by(Field.id)]
+
+
+def add_vaults(company_id, field_ids, names):
+    db.session.execute(Vault.__table__.insert(), [
+        {'name': name, 'field_id': field_ids[i % len(field_ids)], 'company_id': company_id}
+        for i, name in enumerate(names)
+    ])
+
+
+def test_other_companies_do_not_crowd_out_hits(client, user):
+    other = Company(name='Other')
+    db.session.add(other)
+    db.session.flush()
+    own_warehouse, own_fields = add_warehouse(user.company_id)
+    other_warehouse, other_fields = add_warehouse(other.id, name='Other W')
+    # other companies' names rank first, and outnumber a page many times over
+    add_vaults(other.id, other_fields, [f'T{i}' for i in range(500)])
+    add_vaults(user.company_id, own_fields, [f'OWN T{i}' for i in range(3)])
+    db.session.commit()
+
+    response = client.get('/api/search/?q=t&type=vault&limit=5')
+
+    results = response.get_json()['results']
+    assert [hit['name'] for hit in results] == ['OWN T0', 'OWN T1', 'OWN T2']
+    assert results[0]['locations'][0]['warehouseId'] == own_warehouse.id
+
+
+def test_search_latency(client, user):
+    warehouse, field_ids = add_warehouse(user.company_id)
+    add_vaults(user.company_id, field_ids, [f'VAULT {i:06d}' for i in range(100000)])
+    db.session.commit()
+    # the first search builds the index
+    assert client.get('/api/search/?q=vault&type=vault').status_code == 200
+
+    for text in ['123', '0999', 'vault 0', '45678', 'none such']:
+        start = time.perf_counter()
+        response = client.get(f'/api/search/?q={text}')
+        elapsed = time.perf_counter() - start
+
+        assert response.status_code == 200
+        assert elapsed < SEARCH_BUDGET, text
+    assert [hit['name'] for hit in response.get_json()['results']] == []
+    assert client.get('/api/search/?q=45678').get_json()['results'][0]['name'] == 'VAULT 045678'
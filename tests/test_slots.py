@@ -0,0 +1,56 @@
+from app.models import Pallet, Rack, Shelf, Warehouse, db
+from app.services.slots import FIRST_FIT, BEST_FIT, ShelfSlots
+
+
+def test_pallets_without_a_slot_take_room():
+    slots = ShelfSlots.from_pallets(3, [(None, 1), (0, 1)])
+    assert slots.free_spots() == 1
+    assert slots.find(1) == 1
+    assert slots.find(2) is None
+    assert not slots.fits(1, 2)
+
+
+def test_first_and_best_fit():
+    # spots 0 and 3 taken: runs of 2 at 1 and of 1 at 4
+    slots = ShelfSlots.from_pallets(5, [(0, 1), (3, 1)])
+    assert slots.find(1, FIRST_FIT) == 1
+    assert slots.find(1, BEST_FIT) == 4
+    assert slots.find(3) is None
+
+
+def add_shelf(capacity, pallets):
+    warehouse = Warehouse(name='W', rows=1, cols=1, field_capacity=3, length=10, width=10)
+    db.session.add(warehouse)
+    db.session.flush()
+    rack = Rack(name='R', capacity=capacity, warehouse_id=warehouse.id, position={'x': 1, 'y': 1}, width=1, length=1)
+    db.session.add(rack)
+    db.session.flush()
+    shelf = Shelf(name='S', rack_id=rack.id, capacity=capacity)
+    db.session.add(shelf)
+    db.session.flush()
+    for slot_index, spots in pallets:
+        db.session.add(Pallet(weight=1, shelf_id=shelf.id, customer_name='C', slot_index=slot_index, shelf_spots=spots))
+    db.session.commit()
+    return shelf.id
+
+
+def test_shelf_full_of_pallets_without_a_slot(client):
+    shelf_id = add_shelf(2, [(None, None), (None, None)])
+
+    response = client.post(f'/api/pallets/shelf/{shelf_id}/add', json={'customer_name': 'C', 'pallet_number': '3'})
+    assert response.status_code == 400
+
+    response = client.post('/api/racks/pallets', json={'shelf_id': shelf_id, 'customer_name': 'C', 'name': 'P', 'weight': 1})
+    assert response.status_code == 409
+    assert Pallet.query.filter_by(shelf_id=shelf_id).count() == 2
+
+
+def test_room_left_beside_pallets_without_a_slot(client):
+    shelf_id = add_shelf(3, [(None, None), (0, 1)])
+
+    response = client.post(f'/api/pallets/shelf/{shelf_id}/add', json={'customer_name': 'C', 'pallet_number': '3'})
+    assert response.status_code == 201
+    assert response.get_json()['pallets'][-1]['slotIndex'] == 1
+
+    response = client.post(f'/api/pallets/shelf/{shelf_id}/add', json={'customer_name': 'C', 'pallet_number': '4'})
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from app.services import storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds a bare `import app` may take; it is under one here, the rest is
+# headroom for slow machines. Building a Drive client at import blew it.
+IMPORT_BUDGET = 5
+
+
+def import_app():
+    """
+    `python -X importtime -c "import app"` in a fresh interpreter with the
+    production storage setting and no Google credentials. Returns the
+    modules imported and the total import time in seconds.
+    """
+    env = {
+        'PATH': os.environ.get('PATH', ''),
+        'DATABASE_URL': 'sqlite://',
+        'SECRET_KEY': 'test',
+        'ATTACHMENT_STORAGE': 'drive',
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    # import time: self [us] | cumulative | imported package
+    rows = [line.split('|') for line in result.stderr.splitlines() if line.startswith('import time:') and '|' in line]
+    modules = {module.strip(): int(cumulative) for self_time, cumulative, module in rows[1:]}
+    return modules, modules['app'] / 1e6
+
+
+def test_import_builds_no_storage_client():
+    modules, seconds = import_app()
+
+    assert not [module for module in modules if module.startswith(('google', 'boto3'))]
+    assert seconds < IMPORT_BUDGET
+
+
+def test_storage_is_created_once_and_shared(app, monkeypatch):
+    monkeypatch.setattr(storage, '_storage', None)
+
+    first = storage.get_storage()
+    assert isinstance(first, storage.MemoryStorage)
+    assert storage.get_storage() is first
@@ -0,0 +1,54 @@
+import io
+import os
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from app.models import Attachment, Vault, db
+from app.services import storage, uploads
+
+MB = 1024 * 1024
+
+
+class ScannedDocument(io.RawIOBase):
+    """
+    A large file read in chunks without ever being held in memory whole
+    """
+    def __init__(self, size):
+        self.left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.left)
+        buffer[:count] = b'x' * count
+        self.left -= count
+        return count
+
+
+def test_large_upload_memory_stays_flat(client, monkeypatch, tmp_path):
+    monkeypatch.setitem(client.application.config, 'ATTACHMENT_STORAGE_PATH', str(tmp_path))
+    monkeypatch.setattr(storage, '_storage', storage.LocalStorage())
+    # one worker, shut down below to wait for the upload
+    monkeypatch.setattr(uploads, 'executor', ThreadPoolExecutor(max_workers=1))
+    vault = Vault(name='V')
+    db.session.add(vault)
+    db.session.commit()
+
+    tracemalloc.start()
+    try:
+        response = client.post('/api/vaults/upload', data={
+            'vault_id': vault.id,
+            'attachment': (io.BufferedReader(ScannedDocument(200 * MB)), 'scan.pdf', 'application/pdf'),
+        })
+        uploads.executor.shutdown(wait=True)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert response.status_code == 202
+    db.session.expire_all()
+    attachment = Attachment.query.get(response.get_json()['attachment']['id'])
+    assert attachment.status == Attachment.READY
+    digest = attachment.file_url.rsplit('/', 1)[-1]
+    assert os.path.getsize(storage.get_storage().path_for(digest)) == 200 * MB
+    assert peak < 20 * MB
@@ -0,0 +1,44 @@
+import gc
+import tracemalloc
+from app.models import Customer, Order, Vault, db
+
+
+def add_vaults(count):
+    customer = Customer(name=f'CUSTOMER {count}')
+    order = Order(name=f'ORDER {count}')
+    db.session.add_all([customer, order])
+    db.session.flush()
+    db.session.execute(Vault.__table__.insert(), [
+        {'name': f'{count}-{v}', 'customer_id': customer.id, 'order_id': order.id, 'note': 'x' * 200}
+        for v in range(count)
+    ])
+    db.session.commit()
+
+
+def stream_peak(client):
+    """
+    (lines streamed, peak memory in bytes) of an ndjson export read chunk
+    by chunk, the way a client on a slow connection would
+    """
+    db.session.remove()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        response = client.get('/api/vaults/all?format=ndjson', buffered=False)
+        lines = sum(chunk.count(b'\n') for chunk in response.response)
+        response.close()
+        return lines, tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def test_ndjson_export_memory_does_not_grow(client):
+    add_vaults(500)
+    small_lines, small_peak = stream_peak(client)
+    add_vaults(4500)
+    large_lines, large_peak = stream_peak(client)
+
+    assert (small_lines, large_lines) == (500, 5000)
+    # ten times the vaults, but still one batch of them in memory at a time
+    assert large_peak < small_peak * 1.5
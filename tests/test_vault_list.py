@@ -0,0 +1,62 @@
+from app.models import Attachment, Customer, Field, Order, Vault, Warehouse, db
+
+
+def add_vaults(count, staged=1):
+    warehouse = Warehouse(name=f'W{count}', rows=3, cols=3, field_capacity=3, length=10, width=10)
+    customer = Customer(name=f'CUSTOMER {count}')
+    order = Order(name=f'ORDER {count}')
+    db.session.add_all([warehouse, customer, order])
+    db.session.flush()
+    Field.bulk_create_grid(warehouse.id, 3, 3)
+    fields = Field.query.filter_by(warehouse_id=warehouse.id).order_by(Field.id).all()
+    for v in range(count):
+        # the last `staged` vaults are in no field
+        field_id = fields[v % len(fields)].id if v < count - staged else None
+        vault = Vault(name=f'{count}-{v}', field_id=field_id, customer_id=customer.id, order_id=order.id)
+        db.session.add(vault)
+        db.session.flush()
+        db.session.add(Attachment(vault_id=vault.id, file_url='url', file_name='file', unique_name=f'u{vault.id}'))
+    db.session.commit()
+    return warehouse.id
+
+
+def list_queries(client, queries, url):
+    db.session.expire_all()
+    queries.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    return response, len(queries)
+
+
+def test_vault_list_query_count_does_not_grow(client, queries):
+    small = add_vaults(5)
+    large = add_vaults(120)
+
+    small_response, small_count = list_queries(client, queries, f'/api/vaults/all?warehouse={small}')
+    large_response, large_count = list_queries(client, queries, f'/api/vaults/all?warehouse={large}')
+
+    assert len(large_response.get_json()) == 119
+    # one joined query for the vaults, customers, orders, fields and
+    # warehouses, one IN query for the attachments
+    assert small_count == large_count == 2
+
+
+def test_vault_list_keeps_its_shape(client):
+    add_vaults(10, staged=2)
+
+    vaults = client.get('/api/vaults/all').get_json()
+    assert len(vaults) == 10
+    placed, staged = vaults[0], vaults[-1]
+    assert placed['customer_name'] == 'CUSTOMER 10' and placed['order_name'] == 'ORDER 10'
+    assert placed['warehouse_name'] == 'W10' and placed['field_name'] == 'A1'
+    assert placed['attachments'][0]['file_name'] == 'file'
+    assert (staged['field_id'], staged['field_name'], staged['warehouse_name']) == ('staged', 'staged', None)
+
+
+def test_sparse_vault_list(client, queries):
+    add_vaults(10)
+
+    response, count = list_queries(client, queries, '/api/vaults/all?fields=id,name,field_name')
+    assert set(response.get_json()[0]) == {'id', 'name', 'field_name'}
+    # no attachments asked for, so no IN query for them
+    assert count == 1
@@ -0,0 +1,81 @@
+from app.models import Attachment, Company, Customer, Field, Order, Pallet, Rack, Shelf, Vault, Warehouse, db
+from app.services import snapshots
+
+
+def seed_company(warehouses, cols, vaults_per_field, name='Company'):
+    company = Company(name=name)
+    db.session.add(company)
+    db.session.flush()
+    customer = Customer(name=f'{name} CUSTOMER')
+    order = Order(name=f'{name} ORDER', company_id=company.id)
+    db.session.add_all([customer, order])
+    db.session.flush()
+
+    for w in range(warehouses):
+        warehouse = Warehouse(name=f'{name} {w}', rows=9, cols=cols, field_capacity=3, length=100, width=100, company_id=company.id)
+        db.session.add(warehouse)
+        db.session.flush()
+        Field.bulk_create_grid(warehouse.id, cols, 9)
+        for field in Field.query.filter_by(warehouse_id=warehouse.id):
+            for v in range(vaults_per_field):
+                vault = Vault(name=f'{field.id}-{v}', field_id=field.id, customer_id=customer.id, order_id=order.id, company_id=company.id)
+                db.session.add(vault)
+                db.session.flush()
+                db.session.add(Attachment(vault_id=vault.id, file_url='url', file_name='file', unique_name=f'u{vault.id}'))
+        rack = Rack(name='R', capacity=4, warehouse_id=warehouse.id, position={'x': 1, 'y': 1}, width=1, length=1)
+        db.session.add(rack)
+        db.session.flush()
+        for s in range(cols):
+            shelf = Shelf(name=f'S{s}', rack_id=rack.id, capacity=4)
+            db.session.add(shelf)
+            db.session.flush()
+            db.session.add(Pallet(weight=1, shelf_id=shelf.id, customer_name='CUSTOMER', customer_id=customer.id, slot_index=0, shelf_spots=1))
+    db.session.commit()
+    return company.id
+
+
+def snapshot_queries(queries, company_id):
+    db.session.expire_all()
+    queries.clear()
+    snapshots = Warehouse.snapshots(Warehouse.company_id == company_id)
+    return snapshots, len(queries)
+
+
+def test_snapshot_query_count_does_not_grow(app, queries):
+    small = seed_company(warehouses=1, cols=2, vaults_per_field=1)
+    large = seed_company(warehouses=4, cols=12, vaults_per_field=3, name='Large')
+
+    small_snapshots, small_count = snapshot_queries(queries, small)
+    large_snapshots, large_count = snapshot_queries(queries, large)
+
+    assert len(small_snapshots) == 1 and len(large_snapshots) == 4
+    assert sum(len(field['vaults']) for snapshot in large_snapshots for field in snapshot['fields'].values()) == 4 * 108 * 3
+    assert large_count == small_count
+    assert large_count <= 10
+
+
+def test_snapshot_matches_to_dict(app):
+    company_id = seed_company(warehouses=2, cols=2, vaults_per_field=2)
+
+    snapshots = Warehouse.snapshots(Warehouse.company_id == company_id)
+    db.session.expire_all()
+    lazy = [warehouse.to_dict() for warehouse in Warehouse.query.filter_by(company_id=company_id).order_by(Warehouse.id)]
+
+    assert snapshots == lazy
+
+
+def test_company_rename_is_not_served_stale(client, monkeypatch):
+    monkeypatch.setattr(snapshots, '_cache', None)
+    company_id = seed_company(warehouses=1, cols=1, vaults_per_field=1)
+    warehouse_id = Warehouse.query.filter_by(company_id=company_id).one().id
+    first = client.get(f'/api/warehouse/{warehouse_id}')
+    assert first.get_json()['warehouse_info']['companyName'] == 'Company'
+    assert client.get(f'/api/warehouse/company/{company_id}').get_json()[0]['companyName'] == 'Company'
+
+    Company.query.get(company_id).name = 'Renamed'
+    db.session.commit()
+
+    again = client.get(f'/api/warehouse/{warehouse_id}', headers={'If-None-Match': first.headers['ETag'].strip('"')})
+    assert again.status_code == 200
+    assert again.get_json()['warehouse_info']['companyName'] == 'Renamed'
+    assert client.get(f'/api/warehouse/company/{company_id}').get_json()[0]['companyName'] == 'Renamed'